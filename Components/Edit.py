@@ -1,57 +1,239 @@
-from moviepy.video.io.VideoFileClip import VideoFileClip
-from moviepy.editor import VideoFileClip
 import subprocess
+import os
+import threading
+import traceback
 
 def extractAudio(video_path, audio_path="audio.wav"):
+    """
+    Extract the audio track with ffmpeg as mono 16 kHz 16-bit PCM, the format
+    Whisper and the VAD work in (ffmpeg decodes and resamples, no Python loop).
+    """
     try:
-        video_clip = VideoFileClip(video_path)
-        video_clip.audio.write_audiofile(audio_path)
-        video_clip.close()
+        subprocess.run([
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-i", video_path,
+            "-vn",
+            "-ac", "1",
+            "-ar", "16000",
+            "-c:a", "pcm_s16le",
+            audio_path
+        ], check=True, capture_output=True, text=True)
         print(f"Extracted audio to: {audio_path}")
         return audio_path
+    except subprocess.CalledProcessError as e:
+        print(f"An error occurred while extracting audio: {(e.stderr or '').strip()[-1000:]}")
+        return None
     except Exception as e:
         print(f"An error occurred while extracting audio: {e}")
         return None
 
 
-def crop_video(input_file, output_file, start_time, end_time):
-    """Crop video to specified time range with proper resource management."""
-    video = None
-    cropped_video = None
-    
+# Packets queued per input when ffmpeg reads several inputs at once; the small
+# default can block a demuxer thread on long inputs ("Thread message queue blocking")
+FFMPEG_THREAD_QUEUE_SIZE = os.getenv('FFMPEG_THREAD_QUEUE_SIZE', '512')
+
+
+def ffmpeg_input(path):
+    """-i arguments for one of several ffmpeg inputs, with a deeper input queue."""
+    return ["-thread_queue_size", FFMPEG_THREAD_QUEUE_SIZE, "-i", path]
+
+
+# Hardware H.264 encoders in order of preference, with their fastest low-latency settings
+HW_ENCODER_CANDIDATES = [
+    ("h264_nvenc", ["-preset", "p1", "-tune", "ll"]),
+    ("h264_qsv", ["-preset", "veryfast"]),
+    ("h264_vaapi", ["-vaapi_device", "/dev/dri/renderD128", "-vf", "format=nv12,hwupload"]),
+    ("h264_videotoolbox", ["-realtime", "1"]),
+]
+
+# Probed once per process: (codec, extra args), or (None, None) when only libx264 works
+_HW_ENCODER = None
+# Clips render on several threads; only the first caller runs the probe
+_HW_ENCODER_LOCK = threading.Lock()
+
+
+def _encoder_works(codec, extra_args):
+    """Run a tiny test encode; an encoder can be compiled in but have no device behind it."""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1",
+        "-c:v", codec, *extra_args,
+        "-f", "null", "-"
+    ]
     try:
-        video = VideoFileClip(input_file)
-        
-        # Ensure end_time doesn't exceed video duration
-        max_time = video.duration - 0.1  # Small buffer to avoid edge cases
-        if end_time > max_time:
-            print(f"Warning: Requested end time ({end_time}s) exceeds video duration ({video.duration}s). Capping to {max_time}s")
-            end_time = max_time
-        
-        cropped_video = video.subclip(start_time, end_time)
-        cropped_video.write_videofile(
-            output_file, 
-            codec='libx264', 
-            audio_codec='aac',
-            threads=2,
-            logger=None
+        return subprocess.run(cmd, capture_output=True, timeout=15).returncode == 0
+    except (subprocess.SubprocessError, OSError):
+        return False
+
+
+def get_hw_encoder():
+    """
+    Return (codec, extra_args) for the first working hardware H.264 encoder,
+    or (None, None) if none is available. The probe runs only once.
+    """
+    global _HW_ENCODER
+    if _HW_ENCODER is not None:
+        return _HW_ENCODER
+
+    with _HW_ENCODER_LOCK:
+        if _HW_ENCODER is None:
+            _HW_ENCODER = _probe_hw_encoder()
+    return _HW_ENCODER
+
+
+def _probe_hw_encoder():
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"],
+            capture_output=True, text=True, timeout=15
         )
-        
+        available = result.stdout
+    except (subprocess.SubprocessError, OSError) as e:
+        print(f"Warning: Could not list ffmpeg encoders ({e}), using libx264")
+        return (None, None)
+
+    for codec, extra_args in HW_ENCODER_CANDIDATES:
+        if codec in available and _encoder_works(codec, extra_args):
+            print(f"✓ Using hardware encoder: {codec}")
+            return (codec, extra_args)
+    print("No hardware encoder available, using libx264")
+    return (None, None)
+
+
+def video_encoder_args(software_args, crf=23):
+    """
+    ffmpeg video codec arguments for a clip encode: the hardware H.264 encoder when
+    one works (HW_ENCODE=0 opts out), otherwise software_args. Encoders that need
+    their own -vf upload step are skipped, since callers bring their own filters.
+    """
+    if os.getenv('HW_ENCODE', '1') != '0':
+        hw_codec, hw_args = get_hw_encoder()
+        if hw_codec and "-vf" not in hw_args:
+            args = ["-c:v", hw_codec, *hw_args]
+            if hw_codec == "h264_nvenc":
+                # Constant-quality VBR, the NVENC counterpart of libx264's crf
+                args += ["-rc", "vbr", "-cq", str(crf)]
+            return args
+    return software_args
+
+
+def run_encode(build_cmd, software_args, crf=23):
+    """
+    Run the ffmpeg command build_cmd(video_args) returns, encoding with
+    video_encoder_args(software_args, crf). A failed hardware encode (e.g. the GPU's
+    limit on concurrent encoder sessions was hit by parallel clips) is run once
+    more with software_args. Raises CalledProcessError like subprocess.run.
+    """
+    video_args = video_encoder_args(software_args, crf)
+    try:
+        return subprocess.run(build_cmd(video_args), check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        if video_args is software_args:
+            raise
+        print(f"⚠️ Hardware encode failed ({(e.stderr or '').strip()[-200:]}), retrying with libx264")
+        return subprocess.run(build_cmd(software_args), check=True, capture_output=True, text=True)
+
+
+def _keyframe_times(input_file, start_time, window=5.0):
+    """Return keyframe timestamps of the first video stream within +/- window of start_time."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-skip_frame", "nokey",
+        "-read_intervals", f"{max(0.0, start_time - window)}%{start_time + window}",
+        "-show_entries", "frame=best_effort_timestamp_time",
+        "-of", "csv=p=0",
+        input_file
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stdout.splitlines():
+        value = line.strip().rstrip(',')
+        if not value:
+            continue
+        try:
+            times.append(float(value))
+        except ValueError:
+            continue
+    return times
+
+
+def is_keyframe_aligned(input_file, start_time, tolerance=0.05):
+    """Check whether start_time falls on (or very close to) a keyframe."""
+    try:
+        return any(abs(t - start_time) <= tolerance for t in _keyframe_times(input_file, start_time))
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        print(f"Warning: Could not probe keyframes ({e}), assuming unaligned cut")
+        return False
+
+
+def _reencode_cut(input_file, output_file, start_time, end_time, preset="ultrafast", crf=23):
+    """
+    Frame-accurate cut via a re-encode (slow path). Uses a hardware encoder when
+    one is available (falling back if it fails), otherwise libx264 with the given
+    preset and crf.
+    """
+    def build_cmd(video_args):
+        return [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-ss", str(start_time),
+            "-i", input_file,
+            "-t", str(end_time - start_time),
+            *video_args,
+            "-c:a", "aac",
+            output_file
+        ]
+
+    run_encode(build_cmd, [
+        "-c:v", "libx264",
+        "-preset", preset,
+        "-tune", "fastdecode",
+        "-crf", str(crf),
+        "-threads", str(os.cpu_count() or 2),
+        "-thread_type", "frame",   # Frame threading scales better than slice threading
+    ], crf)
+
+
+def crop_video(input_file, output_file, start_time, end_time, frame_accurate=False,
+               preset="ultrafast", crf=23):
+    """
+    Cut the [start_time, end_time] range out of input_file.
+
+    Uses an ffmpeg stream copy (no decode/encode). The cut snaps to the keyframe
+    at or before start_time; pass frame_accurate=True to re-encode instead when
+    start_time is not on a keyframe. preset and crf tune the libx264 re-encode
+    when no hardware encoder is available.
+    """
+    duration = end_time - start_time
+    if duration <= 0:
+        raise ValueError(f"Invalid cut range: {start_time}s - {end_time}s")
+
+    try:
+        if frame_accurate and not is_keyframe_aligned(input_file, start_time):
+            print("Cut start is not on a keyframe, re-encoding for a frame-accurate cut...")
+            _reencode_cut(input_file, output_file, start_time, end_time, preset=preset, crf=crf)
+            return
+
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-ss", str(start_time),   # Input-side seek: jumps straight to the nearest keyframe
+            "-i", input_file,
+            "-to", str(duration),
+            "-c", "copy",
+            "-avoid_negative_ts", "make_zero",
+            output_file
+        ]
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error cropping video: ffmpeg exited with code {e.returncode}")
+        if e.stderr:
+            print(e.stderr.strip()[-1000:])
+        raise
     except Exception as e:
         print(f"❌ Error cropping video: {str(e)}")
-        import traceback
         traceback.print_exc()
         raise
-        
-    finally:
-        # Clean up resources
-        try:
-            if cropped_video:
-                cropped_video.close()
-            if video:
-                video.close()
-        except Exception as cleanup_error:
-            print(f"Warning: Error during crop cleanup: {cleanup_error}")
 
 # Example usage:
 if __name__ == "__main__":
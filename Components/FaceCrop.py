@@ -1,9 +1,73 @@
 import cv2
 import numpy as np
-from moviepy.editor import *
-from Components.Speaker import detect_faces_and_speakers, Frames
+import os
+import subprocess
+import traceback
+from Components.Speaker import detect_faces_and_speakers
+from Components.Edit import run_encode, ffmpeg_input
 global Fps
 
+def _median_face_center_x(cap, face_cascade, max_frames):
+    """Median horizontal face center over the next max_frames frames, or None if no face is seen."""
+    face_positions = []
+    for i in range(max_frames):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=8, minSize=(30, 30))
+        if len(faces) > 0:
+            # Get largest face
+            best_face = max(faces, key=lambda f: f[2] * f[3])
+            x, y, w, h = best_face
+            face_positions.append(x + w // 2)
+
+    if not face_positions:
+        return None
+    # Use median face position for stability
+    return int(sorted(face_positions)[len(face_positions) // 2])
+
+def detect_vertical_crop(input_video_path, start_time=0):
+    """
+    Compute a static face-centered 9:16 crop window for the clip starting at start_time.
+
+    Returns (x, y, width, height) for an ffmpeg crop filter, or None when no face
+    is found (screen recordings need the motion tracking in crop_to_vertical).
+    """
+    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+    cap = cv2.VideoCapture(input_video_path, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        print("Error: Could not open video.")
+        return None
+
+    try:
+        original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        # libx264 needs even dimensions
+        vertical_height = original_height - original_height % 2
+        vertical_width = int(vertical_height * 9 / 16)
+        vertical_width -= vertical_width % 2
+
+        if original_width < vertical_width:
+            print("Error: Original video width is less than the desired vertical width.")
+            return None
+
+        if start_time > 0:
+            cap.set(cv2.CAP_PROP_POS_MSEC, start_time * 1000)
+        face_x = _median_face_center_x(cap, face_cascade, 30)
+    finally:
+        cap.release()
+
+    if face_x is None:
+        return None
+
+    # Offset slightly to the right to prevent right-side cutoff
+    face_x += 60
+    x_start = max(0, min(face_x - vertical_width // 2, original_width - vertical_width))
+    return x_start, 0, vertical_width, vertical_height
+
 def crop_to_vertical(input_video_path, output_video_path):
     """Crop video to vertical 9:16 format with static face detection (no tracking)"""
     face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
@@ -28,24 +92,10 @@ def crop_to_vertical(input_video_path, output_video_path):
 
     # Detect face position in first 30 frames to determine static crop position
     print("Detecting face position for static crop...")
-    face_positions = []
-    for i in range(min(30, total_frames)):
-        ret, frame = cap.read()
-        if not ret:
-            break
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=8, minSize=(30, 30))
-        if len(faces) > 0:
-            # Get largest face
-            best_face = max(faces, key=lambda f: f[2] * f[3])
-            x, y, w, h = best_face
-            face_center_x = x + w // 2
-            face_positions.append(face_center_x)
+    avg_face_x = _median_face_center_x(cap, face_cascade, min(30, total_frames))
     
     # Calculate static crop position
-    if face_positions:
-        # Use median face position for stability
-        avg_face_x = int(sorted(face_positions)[len(face_positions) // 2])
+    if avg_face_x is not None:
         # Offset slightly to the right to prevent right-side cutoff
         avg_face_x += 60
         x_start = max(0, min(avg_face_x - vertical_width // 2, original_width - vertical_width))
@@ -169,58 +219,46 @@ def crop_to_vertical(input_video_path, output_video_path):
 
 
 
+def x264_args():
+    """
+    libx264 arguments for ffmpeg, tunable with X264_PRESET,
+    X264_THREADS (0 = let libx264 pick from the core count) and X264_CRF.
+    """
+    return [
+        "-c:v", "libx264",
+        "-preset", os.getenv('X264_PRESET', 'veryfast'),
+        "-threads", os.getenv('X264_THREADS', '0'),
+        # Constant quality instead of a fixed 3000k bitrate
+        "-crf", os.getenv('X264_CRF', '23'),
+    ]
+
 def combine_videos(video_with_audio, video_without_audio, output_filename):
     """Combine video (without audio) with audio from another video.
-    Includes proper cleanup to prevent memory leaks."""
-    clip_with_audio = None
-    clip_without_audio = None
-    combined_clip = None
-    audio = None
-    
+    ffmpeg encodes the video and muxes the audio in one pass (no frames through Python)."""
+    def build_cmd(video_args):
+        return [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            *ffmpeg_input(video_without_audio),
+            *ffmpeg_input(video_with_audio),
+            "-map", "0:v",
+            "-map", "1:a?",
+            "-shortest",  # The silent render sets the length, as with MoviePy's set_audio
+            *video_args,
+            "-c:a", "aac",
+            "-movflags", "+faststart",
+            output_filename
+        ]
     try:
-        # Load video clips
-        clip_with_audio = VideoFileClip(video_with_audio)
-        clip_without_audio = VideoFileClip(video_without_audio)
-
-        # Extract audio
-        audio = clip_with_audio.audio
-
-        # Combine video with audio
-        combined_clip = clip_without_audio.set_audio(audio)
-
-        global Fps
-        # Write output with error handling
-        combined_clip.write_videofile(
-            output_filename, 
-            codec='libx264', 
-            audio_codec='aac', 
-            fps=Fps, 
-            preset='medium', 
-            bitrate='3000k',
-            threads=2,  # Limit threads to reduce memory usage
-            logger=None  # Reduce console output
-        )
+        run_encode(build_cmd, x264_args(), crf=os.getenv('X264_CRF', '23'))
         print(f"Combined video saved successfully as {output_filename}")
     
+    except subprocess.CalledProcessError as e:
+        print(f"Error combining video and audio: {(e.stderr or '').strip()[-1000:]}")
+        raise  # Re-raise to let caller handle
     except Exception as e:
         print(f"Error combining video and audio: {str(e)}")
-        import traceback
         traceback.print_exc()
         raise  # Re-raise to let caller handle
-        
-    finally:
-        # Critical: Close all clips to free memory
-        try:
-            if combined_clip:
-                combined_clip.close()
-            if audio:
-                del audio
-            if clip_without_audio:
-                clip_without_audio.close()
-            if clip_with_audio:
-                clip_with_audio.close()
-        except Exception as cleanup_error:
-            print(f"Warning: Error during cleanup: {cleanup_error}")
 
 
 
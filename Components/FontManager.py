@@ -2,6 +2,8 @@
 Enhanced font styling and configuration module for subtitle rendering
 """
 import os
+import pickle
+import functools
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 from PIL import ImageFont
@@ -9,6 +11,30 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Common font directories across platforms
+FONT_DIRS = [
+    "/System/Library/Fonts",  # macOS
+    "/usr/share/fonts",       # Linux
+    "/Windows/Fonts",         # Windows
+    "~/.fonts",              # User fonts
+    "./fonts"                # Local fonts directory
+]
+
+# Common font files to look for
+FONT_FILES = [
+    "Arial.ttf", "arial.ttf",
+    "Franklin Gothic Medium.ttf", "FranklinGothicMedium.ttf",
+    "Helvetica.ttc", "helvetica.ttc",
+    "Roboto-Bold.ttf", "roboto-bold.ttf",
+    "OpenSans-Bold.ttf", "opensans-bold.ttf",
+    "DejaVuSans-Bold.ttf", "dejavusans-bold.ttf",
+    "Impact.ttf", "impact.ttf",
+    "Montserrat-Bold.ttf", "montserrat-bold.ttf"
+]
+
+# Discovered fonts are persisted here so later runs skip the directory scan
+FONT_CACHE_PATH = os.path.expanduser("~/.cache/zuke/font_index.pkl")
+
 @dataclass
 class FontStyle:
     """Font style configuration"""
@@ -29,40 +55,70 @@ class FontManager:
     def __init__(self):
         self.font_paths = self._discover_fonts()
         self.predefined_styles = self._create_predefined_styles()
+        
+        # Per-instance memoization; lru_cache on the methods themselves would be shared
+        # across instances and keep every FontManager alive
+        self._font_path_cache = functools.lru_cache(maxsize=256)(self._lookup_font_path)
+        self._validation_cache = functools.lru_cache(maxsize=256)(self._check_font)
     
-    def _discover_fonts(self) -> Dict[str, str]:
-        """Discover available fonts on the system"""
-        font_paths = {}
+    def _font_cache_key(self) -> tuple:
+        """Cache key: the font search lists plus the mtime of every existing font directory"""
+        dir_mtimes = []
+        for font_dir in sorted(FONT_DIRS):
+            expanded_dir = os.path.expanduser(font_dir)
+            try:
+                dir_mtimes.append((os.path.abspath(expanded_dir), os.stat(expanded_dir).st_mtime))
+            except OSError:
+                dir_mtimes.append((os.path.abspath(expanded_dir), None))
+        return (tuple(dir_mtimes), tuple(FONT_FILES))
+    
+    def _load_font_cache(self, cache_key: tuple) -> Optional[Dict[str, str]]:
+        """Return the cached font map if it was built for the same cache key"""
+        try:
+            with open(FONT_CACHE_PATH, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('key') == cache_key:
+                return cached['font_paths']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.debug(f"Ignoring unreadable font cache {FONT_CACHE_PATH}: {str(e)}")
+        return None
+    
+    def _save_font_cache(self, cache_key: tuple, font_paths: Dict[str, str]):
+        """Persist the font map atomically; failures only cost a rescan next run"""
+        try:
+            os.makedirs(os.path.dirname(FONT_CACHE_PATH), exist_ok=True)
+            tmp_path = f"{FONT_CACHE_PATH}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'key': cache_key, 'font_paths': font_paths}, f)
+            os.replace(tmp_path, FONT_CACHE_PATH)
+        except Exception as e:
+            logger.debug(f"Could not write font cache {FONT_CACHE_PATH}: {str(e)}")
+    
+    def _discover_fonts(self, use_cache: bool = True) -> Dict[str, str]:
+        """Discover available fonts on the system, reusing the on-disk index when still valid"""
+        cache_key = self._font_cache_key()
+        if use_cache:
+            cached = self._load_font_cache(cache_key)
+            if cached is not None:
+                return cached
         
-        # Common font directories across platforms
-        font_dirs = [
-            "/System/Library/Fonts",  # macOS
-            "/usr/share/fonts",       # Linux
-            "/Windows/Fonts",         # Windows
-            "~/.fonts",              # User fonts
-            "./fonts"                # Local fonts directory
-        ]
+        font_paths = {}
         
-        # Common font files to look for
-        font_files = [
-            "Arial.ttf", "arial.ttf",
-            "Franklin Gothic Medium.ttf", "FranklinGothicMedium.ttf",
-            "Helvetica.ttc", "helvetica.ttc",
-            "Roboto-Bold.ttf", "roboto-bold.ttf",
-            "OpenSans-Bold.ttf", "opensans-bold.ttf",
-            "DejaVuSans-Bold.ttf", "dejavusans-bold.ttf",
-            "Impact.ttf", "impact.ttf",
-            "Montserrat-Bold.ttf", "montserrat-bold.ttf"
-        ]
+        # One directory listing per font dir instead of a stat() per candidate file
+        wanted = {font_file.lower() for font_file in FONT_FILES}
         
-        for font_dir in font_dirs:
+        for font_dir in FONT_DIRS:
             expanded_dir = os.path.expanduser(font_dir)
-            if os.path.exists(expanded_dir):
-                for font_file in font_files:
-                    font_path = os.path.join(expanded_dir, font_file)
-                    if os.path.exists(font_path):
-                        font_name = os.path.splitext(font_file)[0].lower()
-                        font_paths[font_name] = font_path
+            try:
+                with os.scandir(expanded_dir) as entries:
+                    for entry in entries:
+                        if entry.name.lower() in wanted and entry.is_file():
+                            font_name = os.path.splitext(entry.name)[0].lower()
+                            font_paths[font_name] = entry.path
+            except OSError:
+                continue
         
         # Add fallback fonts
         if not font_paths:
@@ -72,6 +128,7 @@ class FontManager:
                 "arial": None
             }
         
+        self._save_font_cache(cache_key, font_paths)
         return font_paths
     
     def _create_predefined_styles(self) -> Dict[str, FontStyle]:
@@ -149,8 +206,19 @@ class FontManager:
     
     def get_font_path(self, font_family: str) -> Optional[str]:
         """Get the file path for a font family"""
+        return self._font_path_cache(font_family)
+    
+    def _lookup_font_path(self, font_family: str) -> Optional[str]:
         font_key = font_family.lower().replace(" ", "-")
-        return self.font_paths.get(font_key)
+        font_path = self.font_paths.get(font_key)
+        if font_path and not os.path.exists(font_path):
+            # The cached index is stale (font removed since it was built) - rescan once
+            logger.info(f"Cached font path {font_path} no longer exists, rebuilding font index")
+            self.font_paths = self._discover_fonts(use_cache=False)
+            self._font_path_cache.cache_clear()
+            self._validation_cache.cache_clear()
+            font_path = self.font_paths.get(font_key)
+        return font_path
     
     def get_available_fonts(self) -> List[str]:
         """Get list of available font families"""
@@ -188,6 +256,9 @@ class FontManager:
     
     def validate_font(self, font_family: str) -> bool:
         """Check if a font is available"""
+        return self._validation_cache(font_family)
+    
+    def _check_font(self, font_family: str) -> bool:
         font_path = self.get_font_path(font_family)
         if font_path and os.path.exists(font_path):
             try:
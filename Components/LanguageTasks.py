@@ -1,10 +1,19 @@
 from typing import List
 from pydantic import BaseModel,Field
 from dotenv import load_dotenv
+from langchain.prompts import ChatPromptTemplate
+from langchain_openai import AzureChatOpenAI
+import functools
+import httpx
+import logging
+import math
 import os
+import traceback
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Azure OpenAI configuration
 azure_openai_api_key = os.getenv("AZURE_OPENAI_API_KEY")
 azure_openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
@@ -39,21 +48,6 @@ class MultipleHighlightsResponse(BaseModel):
     """
     highlights: List[JSONResponse] = Field(description="List of selected highlights")
 
-system = """
-The input contains a timestamped transcription of a video.
-Select a 2-minute segment from the transcription that contains something interesting, useful, surprising, controversial, or thought-provoking.
-The selected text should contain only complete sentences.
-Do not cut the sentences in the middle.
-The selected text should form a complete thought.
-Return a JSON object with the following structure:
-## Output 
-{{{{
-    start: "Start time of the segment in seconds (number)",
-    content: "The transcribed text from the selected segment (clean text only, NO timestamps)",
-    end: "End time of the segment in seconds (number)"
-}}}}
-"""
-
 system_multiple = """
 The input contains a timestamped transcription of a video.
 Select {num_clips} distinct 2-minute segments from the transcription that contain something interesting, useful, surprising, controversial, or thought-provoking.
@@ -84,71 +78,90 @@ Return a JSON object with the following structure:
 # Example
 # """
 
-
-
+@functools.lru_cache(maxsize=1)
+def _get_llm():
+    """
+    Build the Azure OpenAI chat client once per process so every highlight call
+    reuses the same HTTP connection pool (no new TLS handshake per request)
+    """
+    try:
+        import h2  # noqa: F401 - httpx only speaks HTTP/2 when h2 is installed
+        http2 = True
+    except ImportError:
+        http2 = False
+
+    return AzureChatOpenAI(
+        deployment_name=azure_openai_deployment,
+        api_version=azure_openai_api_version,
+        azure_endpoint=azure_openai_endpoint,
+        api_key=azure_openai_api_key,
+        temperature=1.0,
+        http_client=httpx.Client(http2=http2),
+    )
+
+@functools.lru_cache(maxsize=16)
+def _get_highlights_chain(num_clips):
+    """
+    Build the prompt -> structured-output chain for a clip count once and reuse it.
+    The transcription is a template variable, so the chain does not depend on it.
+    """
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", system_multiple.format(num_clips=num_clips)),
+            ("user", "{Transcription}")
+        ]
+    )
+    return prompt | _get_llm().with_structured_output(MultipleHighlightsResponse, method="function_calling")
+
+# Number of LLM calls GetMultipleHighlights makes before giving up on unusable answers
+MAX_HIGHLIGHT_ATTEMPTS = 3
+
+def _parse_highlights(response, num_clips):
+    """Validate LLM highlights and convert them to {'start', 'end', 'content'} dicts"""
+    candidates = response.highlights[:num_clips]  # Limit to requested number
+    highlights = [
+        {'start': start, 'end': end, 'content': h.content}
+        for h in candidates
+        if math.isfinite(h.start) and math.isfinite(h.end)
+        for start, end in [(int(h.start), int(h.end))]
+        if 0 <= start < end
+    ]
+    
+    skipped = len(candidates) - len(highlights)
+    if skipped:
+        print(f"WARNING: Skipped {skipped} highlight(s) with invalid time ranges")
+    if logger.isEnabledFor(logging.DEBUG):
+        for h in candidates:
+            logger.debug(f"LLM highlight {h.start}s - {h.end}s: {h.content[:100]}")
+    return highlights
 
 def GetMultipleHighlights(Transcription, num_clips=3, auto_approve=False):
     """
     Get multiple highlights from transcription
     """
-    from langchain_openai import AzureChatOpenAI
-    
     try:
-        llm = AzureChatOpenAI(
-            deployment_name=azure_openai_deployment,
-            api_version=azure_openai_api_version,
-            azure_endpoint=azure_openai_endpoint,
-            api_key=azure_openai_api_key,
-            temperature=1.0,
-        )
-
-        from langchain.prompts import ChatPromptTemplate
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", system_multiple.format(num_clips=num_clips)),
-                ("user", Transcription)
-            ]
-        )
-        chain = prompt | llm.with_structured_output(MultipleHighlightsResponse, method="function_calling")
-        
-        print(f"Calling LLM for {num_clips} highlights selection...")
-        response = chain.invoke({"Transcription": Transcription})
-        
-        # Validate response
-        if not response or not hasattr(response, 'highlights'):
-            print("ERROR: LLM returned empty or invalid response")
-            return []
+        chain = _get_highlights_chain(num_clips)
         
+        # Iterative retry (no recursion, no interactive prompt): an unusable answer
+        # is asked again a bounded number of times, then surfaced to the caller
         highlights = []
-        for i, highlight in enumerate(response.highlights[:num_clips]):  # Limit to requested number
-            try:
-                start = int(highlight.start)
-                end = int(highlight.end)
-                
-                # Validate times
-                if start < 0 or end < 0:
-                    print(f"WARNING: Skipping highlight {i+1} - negative time values (Start: {start}s, End: {end}s)")
-                    continue
-                
-                if end <= start:
-                    print(f"WARNING: Skipping highlight {i+1} - invalid time range (Start: {start}s, End: {end}s)")
-                    continue
-                
-                highlights.append({
-                    'start': start,
-                    'end': end,
-                    'content': highlight.content
-                })
-                
-                print(f"\nHighlight {i+1}: {start}s - {end}s ({end-start}s duration)")
-                print(f"Content: {highlight.content[:100]}{'...' if len(highlight.content) > 100 else ''}")
-                
-            except (ValueError, TypeError) as e:
-                print(f"WARNING: Skipping highlight {i+1} - could not parse times: {e}")
-                continue
+        for attempt in range(1, MAX_HIGHLIGHT_ATTEMPTS + 1):
+            print(f"Calling LLM for {num_clips} highlights selection...")
+            response = chain.invoke({"Transcription": Transcription})
+            
+            # Validate response
+            if not response or not hasattr(response, 'highlights'):
+                print("ERROR: LLM returned empty or invalid response")
+            else:
+                highlights = _parse_highlights(response, num_clips)
+                if highlights:
+                    break
+                print("ERROR: No valid highlights found")
+            
+            if attempt < MAX_HIGHLIGHT_ATTEMPTS:
+                print(f"Retrying highlight selection (attempt {attempt + 1}/{MAX_HIGHLIGHT_ATTEMPTS})...")
         
         if not highlights:
-            print("ERROR: No valid highlights found")
             return []
         
         print(f"\n{'='*60}")
@@ -166,93 +179,19 @@ def GetMultipleHighlights(Transcription, num_clips=3, auto_approve=False):
         print(f"\nTranscription length: {len(Transcription)} characters")
         print(f"First 200 chars: {Transcription[:200]}...")
         print(f"{'='*60}\n")
-        import traceback
         traceback.print_exc()
         return []
 
 
 def GetHighlight(Transcription, auto_approve=False):
-    from langchain_openai import AzureChatOpenAI
-    
-    try:
-        llm = AzureChatOpenAI(
-            deployment_name=azure_openai_deployment,
-            api_version=azure_openai_api_version,
-            azure_endpoint=azure_openai_endpoint,
-            api_key=azure_openai_api_key,
-            temperature=1.0,
-        )
-
-        from langchain.prompts import ChatPromptTemplate
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system",system),
-                ("user",Transcription)
-            ]
-        )
-        chain = prompt |llm.with_structured_output(JSONResponse,method="function_calling")
-        
-        print("Calling LLM for highlight selection...")
-        response = chain.invoke({"Transcription":Transcription})
-        
-        # Validate response
-        if not response:
-            print("ERROR: LLM returned empty response")
-            return None, None
-        
-        if not hasattr(response, 'start') or not hasattr(response, 'end'):
-            print(f"ERROR: Invalid response structure: {response}")
-            return None, None
-        
-        try:
-            Start = int(response.start)
-            End = int(response.end)
-        except (ValueError, TypeError) as e:
-            print(f"ERROR: Could not parse start/end times from response")
-            print(f"  response.start: {response.start}")
-            print(f"  response.end: {response.end}")
-            print(f"  Error: {e}")
-            return None, None
-        
-        # Validate times
-        if Start < 0 or End < 0:
-            print(f"ERROR: Negative time values - Start: {Start}s, End: {End}s")
-            return None, None
-        
-        if End <= Start:
-            print(f"ERROR: Invalid time range - Start: {Start}s, End: {End}s (end must be > start)")
-            return None, None
-        
-        # Log the selected segment
-        print(f"\n{'='*60}")
-        print(f"SELECTED SEGMENT DETAILS:")
-        print(f"Time: {Start}s - {End}s ({End-Start}s duration)")
-        print(f"Content: {response.content}")
-        print(f"{'='*60}\n")
-        
-        if Start==End:
-            if not auto_approve:
-                Ask = input("Error - Get Highlights again (y/n) -> ").lower()
-                if Ask == "y":
-                    Start, End = GetHighlight(Transcription, auto_approve)
-                return Start, End
-            else:
-                print("⚠️ Start==End error in auto-approve mode, skipping retry")
-                return None, None
-        return Start,End
-        
-    except Exception as e:
-        print(f"\n{'='*60}")
-        print(f"ERROR IN GetHighlight FUNCTION:")
-        print(f"{'='*60}")
-        print(f"Exception type: {type(e).__name__}")
-        print(f"Exception message: {str(e)}")
-        print(f"\nTranscription length: {len(Transcription)} characters")
-        print(f"First 200 chars: {Transcription[:200]}...")
-        print(f"{'='*60}\n")
-        import traceback
-        traceback.print_exc()
+    """
+    Get a single highlight as (start, end), or (None, None) on failure.
+    Thin wrapper over GetMultipleHighlights so there is one prompt and one code path.
+    """
+    highlights = GetMultipleHighlights(Transcription, num_clips=1, auto_approve=auto_approve)
+    if not highlights:
         return None, None
+    return highlights[0]['start'], highlights[0]['end']
 
 if __name__ == "__main__":
     print(GetHighlight(User))
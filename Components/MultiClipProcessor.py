@@ -1,9 +1,64 @@
 import os
-from Components.Edit import crop_video
-from Components.FaceCrop import crop_to_vertical, combine_videos
-from Components.Subtitles import add_subtitles_to_video
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from Components.Edit import crop_video, run_encode
+from Components.FaceCrop import crop_to_vertical, combine_videos, detect_vertical_crop
+from Components.Subtitles import build_srt, burn_subtitles, subtitles_filter
 
-def create_output_variations(original_video, highlight, transcriptions, session_id, video_title, output_types):
+def _render_vertical_outputs(original_video, start, end, crop_box, outputs, srt_path=None):
+    """
+    Render the vertical variants in a single ffmpeg pass: the clip is decoded and
+    cropped once, then split into one encode per requested output.
+    
+    Args:
+        original_video: Path to the original video file
+        start, end: Clip range in seconds
+        crop_box: (x, y, width, height) from detect_vertical_crop
+        outputs: Dictionary mapping output type ('original'/'subtitled') to output filename
+        srt_path: Subtitle file burned into the 'subtitled' output (None renders it without subtitles)
+    """
+    x, y, w, h = crop_box
+    output_types = list(outputs)
+    
+    graph = [f"[0:v]crop={w}:{h}:{x}:{y},split={len(output_types)}" + "".join(f"[v{i}]" for i in range(len(output_types)))]
+    video_labels = []
+    for i, output_type in enumerate(output_types):
+        if output_type == 'subtitled' and srt_path:
+            graph.append(f"[v{i}]{subtitles_filter(srt_path)}[s{i}]")
+            video_labels.append(f"[s{i}]")
+        else:
+            video_labels.append(f"[v{i}]")
+    
+    def build_cmd(video_args):
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-ss", str(start),
+            "-t", str(end - start),
+            "-i", original_video,
+            "-filter_complex", ";".join(graph)
+        ]
+        for output_type, video_label in zip(output_types, video_labels):
+            cmd += [
+                "-map", video_label,
+                "-map", "0:a?",
+                *video_args,
+                "-c:a", "aac",
+                # Several encoders share one decode; let a slower one buffer instead of failing
+                "-max_muxing_queue_size", "1024",
+                "-movflags", "+faststart",
+                outputs[output_type]
+            ]
+        return cmd
+    
+    try:
+        run_encode(build_cmd, ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23"])
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg exited with code {e.returncode}: {(e.stderr or '').strip()[-1000:]}") from e
+
+def create_output_variations(original_video, highlight, transcriptions, session_id, video_title, output_types,
+                             temp_id=None):
     """
     Create different variations of the output video based on the requested types.
     
@@ -14,6 +69,7 @@ def create_output_variations(original_video, highlight, transcriptions, session_
         session_id: Unique session identifier
         video_title: Clean title for output filename
         output_types: List of output types to generate
+        temp_id: Suffix for temporary files (defaults to session_id); must be unique per concurrent call
         
     Returns:
         List of generated output files
@@ -25,135 +81,231 @@ def create_output_variations(original_video, highlight, transcriptions, session_
     # Ensure output directory exists
     os.makedirs('output', exist_ok=True)
     
-    # Temporary file names
-    temp_clip = f"temp_clip_{session_id}.mp4"
-    temp_cropped = f"temp_cropped_{session_id}.mp4"
-    temp_subtitled = f"temp_subtitled_{session_id}.mp4"
-    
-    try:
-        # Step 1: Extract the clip from the original video
-        print(f"Extracting clip: {start}s - {end}s ({end-start}s duration)")
-        crop_video(original_video, temp_clip, start, end)
+    # Intermediates live in a private temp directory, on RAM-backed tmpfs where available;
+    # it is removed with everything in it however this function exits. When the
+    # 'original-dimension' output may reuse temp_clip, the directory stays on the output
+    # filesystem instead, so that clip is hardlinked into place rather than copied
+    temp_id = temp_id or session_id
+    if 'original-dimension' in output_types or not os.path.isdir("/dev/shm"):
+        temp_root, temp_prefix = 'output', f".zuke_{temp_id}_"
+    else:
+        temp_root, temp_prefix = "/dev/shm", f"zuke_{temp_id}_"
+    with tempfile.TemporaryDirectory(prefix=temp_prefix, dir=temp_root) as td:
+        temp_clip = os.path.join(td, "clip.mp4")
+        temp_cropped = os.path.join(td, "cropped.mp4")
+        temp_subs = os.path.join(td, "subs.srt")
+        # Rendered next to its destination so os.replace stays a same-filesystem rename
+        temp_original_subtitled = os.path.join('output', f".temp_original_subtitled_{temp_id}.mp4")
         
-        # Step 2: Crop to vertical format (9:16) - needed for all variants except original-dimension
-        needs_cropping = any(t in output_types for t in ['original', 'subtitled'])
-        if needs_cropping:
-            print("Cropping to vertical format (9:16)...")
-            try:
-                crop_to_vertical(temp_clip, temp_cropped)
-            except Exception as e:
-                print(f"⚠️ Warning: Cropping failed: {e}")
-                print("   Continuing with other output types...")
-                # Remove outputs that require cropping
-                for out_type in ['original', 'subtitled']:
-                    if out_type in output_types:
-                        failed_outputs.append(out_type)
+        try:
+            # Step 1: Render the vertical variants straight from the source in one ffmpeg pass
+            # when a static face-centered crop works (no intermediate re-encodes)
+            # Build the subtitle file once; every subtitled variant burns in the same SRT
+            srt_path = None
+            if any(t in output_types for t in ['subtitled', 'original-subtitled']):
+                srt = build_srt(transcriptions, video_start_time=start, video_duration=end - start)
+                if srt:
+                    with open(temp_subs, 'w', encoding='utf-8') as f:
+                        f.write(srt)
+                    srt_path = temp_subs
+                else:
+                    print("No transcriptions found for this video segment")
         
-        for output_type in output_types:
-            try:
-                if output_type == 'original':
-                    if 'original' in failed_outputs:
-                        print(f"⏭️ Skipping 'original' (cropping failed)")
-                        continue
-                    # Original cropped video without subtitles
-                    output_filename = os.path.join('output', f"{video_title}_{session_id}_original.mp4")
-                    combine_videos(temp_clip, temp_cropped, output_filename)
-                    output_files.append(output_filename)
-                    print(f"✓ Created original cut: {output_filename}")
+            fused_outputs = {}
+            vertical_types = [t for t in output_types if t in ['original', 'subtitled']]
+            if vertical_types:
+                crop_box = detect_vertical_crop(original_video, start)
+                if crop_box:
+                    targets = {
+                        t: os.path.join('output', f"{video_title}_{session_id}_{t}.mp4")
+                        for t in vertical_types
+                    }
+                    try:
+                        print(f"Rendering {', '.join(vertical_types)} in a single pass (crop x={crop_box[0]})...")
+                        _render_vertical_outputs(original_video, start, end, crop_box, targets, srt_path)
+                        fused_outputs = targets
+                    except Exception as e:
+                        print(f"⚠️ Warning: Single-pass render failed: {e}")
+                        print("   Falling back to step-by-step processing...")
+                else:
+                    print("No static face crop available, using motion-tracking crop...")
+        
+            # Step 2: Crop to vertical format (9:16) - needed for vertical variants not rendered above.
+            # Only this step-by-step path needs temp_clip; the other variants read the source directly
+            needs_cropping = any(t in output_types and t not in fused_outputs for t in ['original', 'subtitled'])
+            if needs_cropping:
+                print(f"Extracting clip: {start}s - {end}s ({end-start}s duration)")
+                crop_video(original_video, temp_clip, start, end)
+            
+                print("Cropping to vertical format (9:16)...")
+                try:
+                    crop_to_vertical(temp_clip, temp_cropped)
+                except Exception as e:
+                    print(f"⚠️ Warning: Cropping failed: {e}")
+                    print("   Continuing with other output types...")
+                    # Remove outputs that require cropping
+                    for out_type in ['original', 'subtitled']:
+                        if out_type in output_types:
+                            failed_outputs.append(out_type)
+        
+            for output_type in output_types:
+                try:
+                    if output_type in fused_outputs:
+                        output_files.append(fused_outputs[output_type])
+                        print(f"✓ Created {output_type} cut: {fused_outputs[output_type]}")
                     
-                elif output_type == 'subtitled':
-                    if 'subtitled' in failed_outputs:
-                        print(f"⏭️ Skipping 'subtitled' (cropping failed)")
-                        continue
-                    # Cropped video with subtitles
-                    print("Adding subtitles to video...")
-                    add_subtitles_to_video(temp_cropped, temp_subtitled, transcriptions, video_start_time=start)
-                    output_filename = os.path.join('output', f"{video_title}_{session_id}_subtitled.mp4")
-                    combine_videos(temp_clip, temp_subtitled, output_filename)
-                    output_files.append(output_filename)
-                    print(f"✓ Created subtitled cut: {output_filename}")
+                    elif output_type == 'original':
+                        if 'original' in failed_outputs:
+                            print(f"⏭️ Skipping 'original' (cropping failed)")
+                            continue
+                        # Original cropped video without subtitles
+                        output_filename = os.path.join('output', f"{video_title}_{session_id}_original.mp4")
+                        combine_videos(temp_clip, temp_cropped, output_filename)
+                        output_files.append(output_filename)
+                        print(f"✓ Created original cut: {output_filename}")
                     
-                elif output_type == 'original-subtitled':
-                    # Full video with subtitles (uncropped aspect ratio)
-                    print("Adding subtitles to uncropped video...")
-                    temp_original_subtitled = f"temp_original_subtitled_{session_id}.mp4"
-                    add_subtitles_to_video(temp_clip, temp_original_subtitled, transcriptions, video_start_time=start)
-                    output_filename = os.path.join('output', f"{video_title}_{session_id}_original_subtitled.mp4")
-                    # For original-subtitled, we combine the original clip with subtitles (no cropping)
-                    os.rename(temp_original_subtitled, output_filename)
-                    output_files.append(output_filename)
-                    print(f"✓ Created original with subtitles: {output_filename}")
+                    elif output_type == 'subtitled':
+                        if 'subtitled' in failed_outputs:
+                            print(f"⏭️ Skipping 'subtitled' (cropping failed)")
+                            continue
+                        # Cropped video with subtitles
+                        output_filename = os.path.join('output', f"{video_title}_{session_id}_subtitled.mp4")
+                        if srt_path:
+                            # Subtitles and the clip's audio go in with one ffmpeg pass, so no
+                            # subtitled intermediate is written and read back for muxing
+                            print("Adding subtitles to video...")
+                            burn_subtitles(temp_cropped, output_filename, srt_path, audio_source=temp_clip)
+                        else:
+                            combine_videos(temp_clip, temp_cropped, output_filename)
+                        output_files.append(output_filename)
+                        print(f"✓ Created subtitled cut: {output_filename}")
                     
-                    # Clean up temp file
-                    if os.path.exists(temp_original_subtitled):
-                        os.remove(temp_original_subtitled)
+                    elif output_type == 'original-subtitled':
+                        # Full video with subtitles (uncropped aspect ratio)
+                        print("Adding subtitles to uncropped video...")
+                        if srt_path:
+                            # Accurate seek on the source so the SRT times line up exactly
+                            burn_subtitles(original_video, temp_original_subtitled, srt_path,
+                                           start_time=start, duration=end - start)
+                        else:
+                            crop_video(original_video, temp_original_subtitled, start, end)
+                        output_filename = os.path.join('output', f"{video_title}_{session_id}_original_subtitled.mp4")
+                        # For original-subtitled, we combine the original clip with subtitles (no cropping)
+                        os.replace(temp_original_subtitled, output_filename)
+                        output_files.append(output_filename)
+                        print(f"✓ Created original with subtitles: {output_filename}")
                         
-                elif output_type == 'original-dimension':
-                    # Original video dimensions without cropping or subtitles
-                    print("Creating clip with original dimensions...")
-                    output_filename = os.path.join('output', f"{video_title}_{session_id}_original_dimension.mp4")
-                    # Simply copy the temp_clip (which maintains original dimensions) to output
-                    import shutil
-                    shutil.copy2(temp_clip, output_filename)
-                    output_files.append(output_filename)
-                    print(f"✓ Created original dimension cut: {output_filename}")
+                    elif output_type == 'original-dimension':
+                        # Original video dimensions without cropping or subtitles
+                        print("Creating clip with original dimensions...")
+                        output_filename = os.path.join('output', f"{video_title}_{session_id}_original_dimension.mp4")
+                        if os.path.exists(temp_clip):
+                            # temp_clip is already a stream copy with the original dimensions, so hardlink
+                            # it into place; copy the bytes when the filesystem can't link
+                            try:
+                                os.link(temp_clip, output_filename)
+                            except OSError:
+                                shutil.copy2(temp_clip, output_filename)
+                        else:
+                            # No temp_clip was needed - stream copy the range straight to the output
+                            crop_video(original_video, output_filename, start, end)
+                        output_files.append(output_filename)
+                        print(f"✓ Created original dimension cut: {output_filename}")
                     
-            except Exception as e:
-                print(f"❌ Error creating '{output_type}' output: {e}")
-                print(f"   Continuing with remaining output types...")
-                failed_outputs.append(output_type)
-                continue
-        
-        # Report summary
-        if failed_outputs:
-            print(f"\n⚠️ Some outputs failed: {', '.join(failed_outputs)}")
-        if output_files:
-            print(f"✓ Successfully created {len(output_files)}/{len(output_types)} output variations")
+                except Exception as e:
+                    print(f"❌ Error creating '{output_type}' output: {e}")
+                    print(f"   Continuing with remaining output types...")
+                    failed_outputs.append(output_type)
+                    # A partly written original-subtitled render sits outside the temp directory
+                    try:
+                        os.remove(temp_original_subtitled)
+                    except OSError:
+                        pass
+                    continue
         
-    except Exception as e:
-        print(f"❌ Critical error in create_output_variations: {e}")
-        print(f"   Attempting to return any files that were created...")
+            # Report summary
+            if failed_outputs:
+                print(f"\n⚠️ Some outputs failed: {', '.join(failed_outputs)}")
+            if output_files:
+                print(f"✓ Successfully created {len(output_files)}/{len(output_types)} output variations")
         
-    finally:
-        # Clean up temporary files
-        for temp_file in [temp_clip, temp_cropped, temp_subtitled]:
-            if os.path.exists(temp_file):
-                try:
-                    os.remove(temp_file)
-                except Exception as e:
-                    print(f"⚠️ Warning: Could not remove temp file {temp_file}: {e}")
+        except Exception as e:
+            print(f"❌ Critical error in create_output_variations: {e}")
+            print(f"   Attempting to return any files that were created...")
     
     return output_files
 
-def process_multiple_clips(original_video, highlights, transcriptions, session_id, video_title, output_types):
+def process_multiple_clips(original_video, highlights, transcriptions, session_id, video_title, output_types,
+                           max_workers=None, cancel_event=None):
     """
-    Process multiple clips with different output variations
+    Process multiple clips with different output variations.
+    Clips are independent, so they are rendered in parallel worker threads. The
+    heavy lifting happens in ffmpeg child processes and OpenCV, which release the
+    GIL, and threads are safe to start from the API servers where the pipeline
+    itself runs on a thread next to a loaded Whisper model (forking there is not).
+    
+    Args:
+        max_workers: Number of clips rendered at once (default: half the CPU cores,
+                     since every ffmpeg child is itself multi-threaded)
+        cancel_event: threading.Event; once set, clips that haven't started are skipped
     
     Returns:
         Dictionary mapping clip numbers to their output files
     """
     all_outputs = {}
+    if not highlights:
+        return all_outputs
     
-    for i, highlight in enumerate(highlights, 1):
+    if max_workers is None:
+        max_workers = max(1, (os.cpu_count() or 2) // 2)
+    max_workers = min(len(highlights), max_workers)
+    
+    def announce(label, i, highlight):
         print(f"\n{'='*60}")
-        print(f"PROCESSING CLIP {i}/{len(highlights)}")
+        print(f"{label} CLIP {i}/{len(highlights)}")
         print(f"Time: {highlight['start']}s - {highlight['end']}s")
         print(f"{'='*60}")
-        
-        # Create clip-specific title
+    
+    def render_clip(*args):
+        if cancel_event is not None and cancel_event.is_set():
+            return []
+        return create_output_variations(*args)
+    
+    def clip_args(i, highlight):
+        # Clip-specific title and temp files so concurrent clips never collide
         clip_title = f"{video_title}_clip{i}"
-        
-        # Generate output variations for this clip
-        output_files = create_output_variations(
-            original_video, highlight, transcriptions, 
-            session_id, clip_title, output_types
-        )
-        
-        all_outputs[i] = {
-            'highlight': highlight,
-            'files': output_files
+        return (original_video, highlight, transcriptions, session_id, clip_title, output_types,
+                f"{session_id}_clip{i}")
+    
+    if max_workers == 1:
+        for i, highlight in enumerate(highlights, 1):
+            announce("PROCESSING", i, highlight)
+            output_files = render_clip(*clip_args(i, highlight))
+            all_outputs[i] = {'highlight': highlight, 'files': output_files}
+            print(f"✓ Completed clip {i}: {len(output_files)} variations created")
+        return all_outputs
+    
+    for i, highlight in enumerate(highlights, 1):
+        announce("QUEUED", i, highlight)
+    print(f"Rendering {len(highlights)} clips with {max_workers} parallel workers...")
+    
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"clip_{session_id}") as executor:
+        futures = {
+            i: executor.submit(render_clip, *clip_args(i, highlight))
+            for i, highlight in enumerate(highlights, 1)
         }
-        
-        print(f"✓ Completed clip {i}: {len(output_files)} variations created")
+        for i, highlight in enumerate(highlights, 1):
+            try:
+                output_files = futures[i].result()
+            except Exception as e:
+                print(f"❌ Clip {i} worker failed: {e}")
+                output_files = []
+            
+            all_outputs[i] = {
+                'highlight': highlight,
+                'files': output_files
+            }
+            
+            print(f"✓ Completed clip {i}: {len(output_files)} variations created")
     
-    return all_outputs
\ No newline at end of file
+    return all_outputs
@@ -1,10 +1,10 @@
 import cv2
 import numpy as np
 import webrtcvad
-import wave
-import contextlib
-from pydub import AudioSegment
 import os
+import queue
+import subprocess
+import threading
 import urllib.request
 
 # Get absolute path to models directory
@@ -14,7 +14,6 @@ MODELS_DIR = os.path.join(BASE_DIR, "models")
 # Model file paths
 prototxt_path = os.path.join(MODELS_DIR, "deploy.prototxt")
 model_path = os.path.join(MODELS_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
-temp_audio_path = os.path.join(BASE_DIR, "temp_audio.wav")
 
 def ensure_face_detection_models():
     """Download face detection models if they don't exist."""
@@ -37,10 +36,44 @@ def ensure_face_detection_models():
 # Ensure models exist before loading
 ensure_face_detection_models()
 
+def configure_dnn_backend(net):
+    """
+    Run the detector on the fastest backend this OpenCV build offers:
+    CUDA FP16 when a GPU is present, OpenVINO on CPU, else the default backend.
+    """
+    try:
+        available = set(cv2.dnn.getAvailableBackends())
+    except (AttributeError, cv2.error):
+        available = set()
+
+    try:
+        cuda_devices = cv2.cuda.getCudaEnabledDeviceCount()
+    except (AttributeError, cv2.error):
+        cuda_devices = 0
+
+    if cuda_devices > 0 and (cv2.dnn.DNN_BACKEND_CUDA, cv2.dnn.DNN_TARGET_CUDA_FP16) in available:
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA_FP16)
+        return "CUDA (FP16)"
+    if (cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE, cv2.dnn.DNN_TARGET_CPU) in available:
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE)
+        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        return "OpenVINO (CPU)"
+    return "OpenCV (CPU)"
+
 # Load DNN model
 print(f"🔄 Loading face detection model from: {model_path}")
 net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
-print("✅ Face detection model loaded")
+DNN_BACKEND = configure_dnn_backend(net)
+print(f"✅ Face detection model loaded ({DNN_BACKEND})")
+
+# When the detector runs on CUDA, frames are also downscaled on the GPU; the full-size
+# frame is uploaded once and only the 300x300 result comes back to the host
+if DNN_BACKEND.startswith("CUDA") and hasattr(cv2, "cuda_GpuMat"):
+    _gpu_frame = cv2.cuda_GpuMat()
+    _gpu_small = cv2.cuda_GpuMat()
+else:
+    _gpu_frame = _gpu_small = None
 
 # Initialize VAD
 vad = webrtcvad.Vad(2)  # Aggressiveness mode from 0 to 3
@@ -48,115 +81,235 @@ vad = webrtcvad.Vad(2)  # Aggressiveness mode from 0 to 3
 def voice_activity_detection(audio_frame, sample_rate=16000):
     return vad.is_speech(audio_frame, sample_rate)
 
-def extract_audio_from_video(video_path, audio_path):
-    audio = AudioSegment.from_file(video_path)
-    audio = audio.set_frame_rate(16000).set_channels(1)
-    audio.export(audio_path, format="wav")
+def extract_audio_from_video(video_path, sample_rate=16000):
+    """Decode the audio track to mono int16 PCM through an ffmpeg pipe (no temp WAV)."""
+    result = subprocess.run([
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", video_path,
+        "-vn",
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "-f", "s16le",
+        "-"
+    ], check=True, capture_output=True)
+    return np.frombuffer(result.stdout, dtype=np.int16)
 
-def process_audio_frame(audio_data, sample_rate=16000, frame_duration_ms=30):
-    n = int(sample_rate * frame_duration_ms / 1000) * 2  # 2 bytes per sample
-    offset = 0
-    while offset + n <= len(audio_data):
-        frame = audio_data[offset:offset + n]
-        offset += n
-        yield frame
+def process_audio_frame(pcm, sample_rate=16000, frame_duration_ms=30):
+    n = sample_rate * frame_duration_ms // 1000  # Samples per frame
+    for offset in range(0, len(pcm) - n + 1, n):
+        yield pcm[offset:offset + n].tobytes()
 
-global Frames
-Frames = []  # [x,y,w,h]
+# Frames per face-detector forward pass; detector memory grows linearly with it
+FACE_DETECTION_BATCH_SIZE = max(1, int(os.getenv('FACE_DETECTION_BATCH_SIZE', '16')))
 
-def detect_faces_and_speakers(input_video_path, output_video_path):
-    # Return Frames:
-    global Frames
-    Frames = []  # Reset frames for each call
-    
-    # Extract audio from the video
-    extract_audio_from_video(input_video_path, temp_audio_path)
+def _read_frames(cap, count):
+    """Read up to count frames from cap (fewer at the end of the video)."""
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    return frames
 
-    # Read the extracted audio
-    with contextlib.closing(wave.open(temp_audio_path, 'rb')) as wf:
-        sample_rate = wf.getframerate()
-        audio_data = wf.readframes(wf.getnframes())
+# Run the detector on every Nth frame only; frames in between reuse the last detections
+# (faces move a few pixels at most between adjacent frames)
+FACE_DETECT_STRIDE = max(1, int(os.getenv('FACE_DETECT_STRIDE', '3')))
 
-    cap = cv2.VideoCapture(input_video_path)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video_path, fourcc, 30.0, (int(cap.get(3)), int(cap.get(4))))
+# Batches buffered between the reader thread, the detector and the writer thread
+PIPELINE_QUEUE_BATCHES = 2
 
-    frame_duration_ms = 30  # 30ms frames
-    audio_generator = process_audio_frame(audio_data, sample_rate, frame_duration_ms)
+def _frame_reader(cap, batch_size, read_q, stop_event):
+    """Reader thread: decode frame batches into read_q, then put None as end-of-stream."""
+    try:
+        while not stop_event.is_set():
+            batch = _read_frames(cap, batch_size)
+            if not batch:
+                break
+            read_q.put(batch)
+    finally:
+        read_q.put(None)
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
+def _frame_writer(out, write_q):
+    """Writer thread: encode frames from write_q until the None sentinel."""
+    while True:
+        frame = write_q.get()
+        if frame is None:
             break
+        out.write(frame)
 
-        h, w = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
-        net.setInput(blob)
-        detections = net.forward()
+# Detections below this confidence are discarded
+FACE_CONFIDENCE_THRESHOLD = 0.3
 
-        audio_frame = next(audio_generator, None)
-        if audio_frame is None:
-            break
-        is_speaking_audio = voice_activity_detection(audio_frame, sample_rate)
-        MaxDif = 0
-        Add = []
-        face_found = False
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.3:  # Confidence threshold
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (x, y, x1, y1) = box.astype("int")
-                face_width = x1 - x
-                face_height = y1 - y
-
-                # Draw bounding box
-                cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
-
-                # Assuming lips are approximately at the bottom third of the face
-                lip_distance = abs((y + 2 * face_height // 3) - (y1))
-                Add.append([[x, y, x1, y1], lip_distance])
-
-                MaxDif = max(lip_distance, MaxDif)
-                face_found = True
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.3:  # Confidence threshold
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (x, y, x1, y1) = box.astype("int")
-                face_width = x1 - x
-                face_height = y1 - y
-
-                # Draw bounding box
-                cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
-
-                # Assuming lips are approximately at the bottom third of the face
-                lip_distance = abs((y + 2 * face_height // 3) - (y1))
-                # print(lip_distance)  # Commented out for cleaner logs
-
-                # Combine visual and audio cues
-                if lip_distance >= MaxDif and is_speaking_audio:  # Adjust the threshold as needed
-                    cv2.putText(frame, "Active Speaker", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                if lip_distance >= MaxDif:
-                    break
-
-        if face_found:
-            Frames.append([x, y, x1, y1])
-        else:
-            # If no face detected, append previous frame's values or None
-            if len(Frames) > 0:
-                Frames.append(Frames[-1])
-            else:
-                Frames.append(None)
+# Per-channel (BGR) mean the SSD face detector was trained with
+FACE_DETECTION_MEAN = np.array([104.0, 177.0, 123.0], dtype=np.float32).reshape(3, 1, 1)
 
-        out.write(frame)
+def _resize_for_detector(frame, resize_buf):
+    """Downscale frame to the detector's 300x300 input in resize_buf (on the GPU when available)."""
+    if _gpu_frame is not None:
+        _gpu_frame.upload(frame)
+        cv2.cuda.resize(_gpu_frame, (300, 300), dst=_gpu_small)
+        _gpu_small.download(resize_buf)
+    else:
+        cv2.resize(frame, (300, 300), dst=resize_buf)
+
+def _detect_faces_batch(frames, blob_buf, resize_buf):
+    """
+    Run the SSD face detector once over a batch of frames.
+    The input blob is built in place in blob_buf ((K, 3, 300, 300) float32) using
+    resize_buf ((300, 300, 3) uint8), so no tensor is allocated per batch.
+    Returns one (N, 7) array of confident detections per frame; column 0 is the batch index.
+    """
+    if not frames:
+        return []
+    for i, frame in enumerate(frames):
+        _resize_for_detector(frame, resize_buf)
+        # HWC uint8 -> CHW float32 minus the mean, same as blobFromImages
+        np.subtract(resize_buf.transpose(2, 0, 1), FACE_DETECTION_MEAN, out=blob_buf[i])
+    net.setInput(blob_buf[:len(frames)])
+    detections = net.forward()[0, 0]
+    # Threshold the whole batch once; most of the ~200 rows per frame are empty proposals
+    detections = detections[detections[:, 2] > FACE_CONFIDENCE_THRESHOLD]
+    return [detections[detections[:, 0] == i] for i in range(len(frames))]
+
+def _mark_speaker(frame, detections, is_speaking_audio, annotate=True):
+    """
+    Draw the detected faces on frame and label the active speaker (when annotate).
+    detections are the frame's confident rows from _detect_faces_batch.
+    Returns the speaker's [x, y, x1, y1] box, or None when no face was found.
+    """
+    h, w = frame.shape[:2]
+    boxes = (detections[:, 3:7] * np.array([w, h, w, h])).astype(int)
+    # Assuming lips are approximately at the bottom third of the face
+    face_heights = boxes[:, 3] - boxes[:, 1]
+    lip_distances = np.abs((boxes[:, 1] + 2 * face_heights // 3) - boxes[:, 3])
+    speaker_box = boxes[int(lip_distances.argmax())].tolist()
+    if not annotate:
+        return speaker_box
+
+    # Draw bounding boxes
+    for x, y, x1, y1 in boxes.tolist():
+        cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
+
+    # Combine visual and audio cues
+    if is_speaking_audio:
+        x, y = speaker_box[:2]
+        cv2.putText(frame, "Active Speaker", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return speaker_box
 
+# One [x, y, x1, y1] speaker box per video frame; a row of -1 means no face seen yet
+Frames = np.empty((0, 4), dtype=np.int32)
+
+def iter_frames_with_speaker(input_video_path, annotate=True):
+    """
+    Decode input_video_path once and yield (frame_idx, frame, speaker_box, is_speaking)
+    for every frame, so later stages can work on the same decoded frames instead of
+    opening and decoding the video again.
+    speaker_box is the active speaker's [x, y, x1, y1], or None when no face is seen.
+    With annotate, face boxes and the speaker label are drawn onto the yielded frame.
+    """
+    # Decode the audio from the video straight into memory
+    sample_rate = 16000
+    audio_data = extract_audio_from_video(input_video_path, sample_rate)
+
+    frame_duration_ms = 30  # 30ms frames
+    # Voice activity for the whole track in one pass; the frame loop only indexes it
+    vad_flags = np.fromiter(
+        (voice_activity_detection(audio_frame, sample_rate)
+         for audio_frame in process_audio_frame(audio_data, sample_rate, frame_duration_ms)),
+        dtype=bool
+    )
+
+    cap = cv2.VideoCapture(input_video_path)
+
+    # Decoding overlaps detection: a reader thread prefetches frame batches
+    # while the detector runs on the current one
+    read_q = queue.Queue(maxsize=PIPELINE_QUEUE_BATCHES)
+    stop_reading = threading.Event()
+    reader = threading.Thread(target=_frame_reader, args=(cap, FACE_DETECTION_BATCH_SIZE, read_q, stop_reading), daemon=True)
+    reader.start()
+
+    # Detector input buffers, reused for every batch
+    blob_buf = np.empty((FACE_DETECTION_BATCH_SIZE, 3, 300, 300), dtype=np.float32)
+    resize_buf = np.empty((300, 300, 3), dtype=np.uint8)
+
+    reader_done = False
+    try:
+        # Frames are run through the detector in batches; speaker logic stays per frame
+        frame_idx = 0
+        last_detections = np.empty((0, 7), dtype=np.float32)
+        while True:
+            batch = read_q.get()
+            if batch is None:
+                reader_done = True
+                break
+
+            detect_idx = [j for j in range(len(batch)) if (frame_idx + j) % FACE_DETECT_STRIDE == 0]
+            detected = dict(zip(detect_idx, _detect_faces_batch([batch[j] for j in detect_idx], blob_buf, resize_buf)))
+
+            for j, frame in enumerate(batch):
+                detections = last_detections = detected.get(j, last_detections)
+                # Video frames past the end of the audio count as silent
+                is_speaking_audio = frame_idx < len(vad_flags) and bool(vad_flags[frame_idx])
+
+                # Nothing to decode or draw on frames without a face
+                speaker_box = _mark_speaker(frame, detections, is_speaking_audio, annotate) if len(detections) else None
+                yield frame_idx, frame, speaker_box, is_speaking_audio
+                frame_idx += 1
+    finally:
+        # Stop the reader and drain read_q so it is never left blocked on a full queue
+        # (also runs when the consumer stops iterating early)
+        stop_reading.set()
+        while not reader_done:
+            reader_done = read_q.get() is None
+        reader.join()
+        cap.release()
+
+def detect_faces_and_speakers(input_video_path, output_video_path=None):
+    """
+    Fill Frames with the active speaker's box for every frame of input_video_path and,
+    when output_video_path is given, write the annotated video there.
+    """
+    global Frames
+
+    cap = cv2.VideoCapture(input_video_path)
+    # Preallocated from the container's frame count; grown if that estimate is short
+    boxes = np.full((max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))), 4), -1, dtype=np.int32)
+    frame_size = (int(cap.get(3)), int(cap.get(4)))
     cap.release()
-    out.release()
-    cv2.destroyAllWindows()
-    
-    # Clean up temp audio file
-    if os.path.exists(temp_audio_path):
-        os.remove(temp_audio_path)
+
+    # A writer thread encodes annotated frames while detection continues
+    out = None
+    write_q = queue.Queue(maxsize=PIPELINE_QUEUE_BATCHES * FACE_DETECTION_BATCH_SIZE)
+    writer = None
+    if output_video_path:
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        out = cv2.VideoWriter(output_video_path, fourcc, 30.0, frame_size)
+        writer = threading.Thread(target=_frame_writer, args=(out, write_q), daemon=True)
+        writer.start()
+
+    num_frames = 0
+    try:
+        for frame_idx, frame, speaker_box, _ in iter_frames_with_speaker(input_video_path, annotate=out is not None):
+            if frame_idx >= len(boxes):
+                boxes = np.concatenate([boxes, np.full_like(boxes, -1)])
+            if speaker_box is not None:
+                boxes[frame_idx] = speaker_box
+            elif frame_idx > 0:
+                # If no face detected, reuse the previous frame's box (-1 row until the first face)
+                boxes[frame_idx] = boxes[frame_idx - 1]
+            num_frames = frame_idx + 1
+
+            if writer:
+                write_q.put(frame)
+    finally:
+        if writer:
+            write_q.put(None)
+            writer.join()
+        if out:
+            out.release()
+
+    Frames = boxes[:num_frames]
 
 
 if __name__ == "__main__":
@@ -1,11 +1,143 @@
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
 import re
 import os
+import subprocess
+import tempfile
+import traceback
+from Components.Edit import run_encode, ffmpeg_input
+
+# libass lays SRT subtitles out on a 384x288 canvas that is scaled to the video,
+# so styles expressed in these units are resolution independent
+_SRT_PLAY_RES_Y = 288
+
+# Basic color names accepted by SUBTITLE_COLOR / SUBTITLE_STROKE_COLOR besides '#rrggbb'
+_NAMED_COLORS = {
+    'white': 'ffffff',
+    'black': '000000',
+    'yellow': 'ffff00',
+    'red': 'ff0000',
+    'green': '00ff00',
+    'blue': '0000ff',
+    'navy': '000080',
+}
+
+def _relevant_transcriptions(transcriptions, video_start_time, video_duration):
+    """Shift [text, start, end] segments to clip-relative times and drop those outside the clip."""
+    relevant = []
+    for text, start, end in transcriptions:
+        # Adjust times relative to video start
+        adjusted_start = start - video_start_time
+        adjusted_end = end - video_start_time
+        
+        # Only include if within video duration
+        if adjusted_end > 0 and adjusted_start < video_duration:
+            adjusted_start = max(0, adjusted_start)
+            adjusted_end = min(video_duration, adjusted_end)
+            relevant.append([text.strip(), adjusted_start, adjusted_end])
+    return relevant
+
+def _srt_timestamp(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+def build_srt(transcriptions, video_start_time=0, video_duration=float('inf')):
+    """
+    Render transcription segments as SRT text with times relative to video_start_time.
+    Returns an empty string when no segment falls inside the clip.
+    """
+    cues = []
+    for text, start, end in _relevant_transcriptions(transcriptions, video_start_time, video_duration):
+        if not text:
+            continue
+        cues.append(f"{len(cues) + 1}\n{_srt_timestamp(start)} --> {_srt_timestamp(end)}\n{text}\n")
+    return "\n".join(cues)
+
+def _ass_color(color):
+    """Convert '#rrggbb' or a basic color name to ASS &H00BBGGRR notation."""
+    if color.startswith('#'):
+        rgb = color[1:]
+        if len(rgb) == 3:
+            rgb = ''.join(c * 2 for c in rgb)
+    else:
+        rgb = _NAMED_COLORS.get(color.lower(), 'ffffff')
+    return f"&H00{rgb[4:6]}{rgb[2:4]}{rgb[0:2]}".upper()
+
+def subtitle_force_style():
+    """Build a libass force_style string from the same SUBTITLE_* settings the MoviePy path uses."""
+    subtitle_font = os.getenv('SUBTITLE_FONT', 'Franklin-Gothic')
+    subtitle_size_ratio = float(os.getenv('SUBTITLE_SIZE_RATIO', '0.065'))
+    subtitle_color = os.getenv('SUBTITLE_COLOR', '#2699ff')
+    subtitle_stroke_color = os.getenv('SUBTITLE_STROKE_COLOR', 'black')
+    subtitle_stroke_width = int(os.getenv('SUBTITLE_STROKE_WIDTH', '2'))
+
+    style = {
+        'FontName': subtitle_font.replace('-', ' '),
+        'FontSize': round(_SRT_PLAY_RES_Y * subtitle_size_ratio, 1),
+        'PrimaryColour': _ass_color(subtitle_color),
+        'OutlineColour': _ass_color(subtitle_stroke_color),
+        'BorderStyle': 1,
+        'Outline': round(subtitle_stroke_width * _SRT_PLAY_RES_Y / 1080, 2),  # Stroke width is in 1080p pixels
+        'Shadow': 0,
+        'Alignment': 8,  # Top-center, anchored at 75% of the height like the MoviePy overlay
+        'MarginV': int(_SRT_PLAY_RES_Y * 0.75),
+        'MarginL': 10,
+        'MarginR': 10,
+    }
+    return ','.join(f"{key}={value}" for key, value in style.items())
+
+def subtitles_filter(subtitle_path):
+    """ffmpeg filter that burns subtitle_path into the video with the configured style."""
+    escaped_path = subtitle_path.replace('\\', '/').replace("'", "'\\''")
+    return f"subtitles=filename='{escaped_path}':force_style='{subtitle_force_style()}'"
+
+def _run_ffmpeg(cmd):
+    """Run an ffmpeg command, raising RuntimeError with the tail of its stderr on failure."""
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg exited with code {e.returncode}: {(e.stderr or '').strip()[-1000:]}") from e
+
+def burn_subtitles(input_video, output_video, subtitle_path, start_time=0, duration=None, audio_source=None):
+    """
+    Burn a prebuilt subtitle file into a video with ffmpeg/libass in a single encode.
+    
+    Args:
+        input_video: Path to input video file
+        output_video: Path to output video file
+        subtitle_path: SRT file from build_srt (times relative to start_time)
+        start_time: Offset into input_video to start from (accurate seek)
+        duration: Length to render in seconds (default: until the end)
+        audio_source: Take the audio from this file instead of input_video (e.g. when
+                      input_video is a silent OpenCV render of the same clip)
+    """
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+    if start_time:
+        cmd += ["-ss", str(start_time)]
+    if duration is not None:
+        cmd += ["-t", str(duration)]
+    if audio_source:
+        cmd += [*ffmpeg_input(input_video), *ffmpeg_input(audio_source), "-shortest"]
+    else:
+        cmd += ["-i", input_video]
+    cmd += [
+        "-vf", subtitles_filter(subtitle_path),
+        "-map", "0:v",
+        "-map", "1:a?" if audio_source else "0:a?",
+    ]
+    output_args = ["-c:a", "copy", "-movflags", "+faststart", output_video]
+    try:
+        run_encode(lambda video_args: [*cmd, *video_args, *output_args],
+                   ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23"])
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg exited with code {e.returncode}: {(e.stderr or '').strip()[-1000:]}") from e
 
 def add_subtitles_to_video(input_video, output_video, transcriptions, video_start_time=0):
     """
     Add subtitles to video based on transcription segments.
-    Includes proper memory management and error handling.
+    The subtitles are burned in by ffmpeg's libass-backed subtitles filter in a
+    single encode (no per-frame compositing in Python).
     
     Args:
         input_video: Path to input video file
@@ -13,121 +145,44 @@ def add_subtitles_to_video(input_video, output_video, transcriptions, video_star
         transcriptions: List of [text, start, end] from transcribeAudio
         video_start_time: Start time offset if video was cropped
     """
-    video = None
-    final_video = None
-    text_clips = []
+    srt_path = None
     
     try:
-        video = VideoFileClip(input_video)
-        video_duration = video.duration
-        
-        # Filter transcriptions to only those within the video timeframe
-        relevant_transcriptions = []
-        for text, start, end in transcriptions:
-            # Adjust times relative to video start
-            adjusted_start = start - video_start_time
-            adjusted_end = end - video_start_time
-            
-            # Only include if within video duration
-            if adjusted_end > 0 and adjusted_start < video_duration:
-                adjusted_start = max(0, adjusted_start)
-                adjusted_end = min(video_duration, adjusted_end)
-                relevant_transcriptions.append([text.strip(), adjusted_start, adjusted_end])
+        # Segments past the end of the video are simply never shown
+        srt = build_srt(transcriptions, video_start_time=video_start_time)
         
-        if not relevant_transcriptions:
+        if not srt:
             print("No transcriptions found for this video segment")
-            video.write_videofile(
-                output_video, 
-                codec='libx264', 
-                audio_codec='aac',
-                threads=2,
-                logger=None
-            )
+            # Nothing to burn in, so the streams are copied as they are (no re-encode)
+            if os.path.abspath(input_video) != os.path.abspath(output_video):
+                _run_ffmpeg([
+                    "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+                    "-i", input_video,
+                    "-map", "0:v",
+                    "-map", "0:a?",
+                    "-c", "copy",
+                    "-movflags", "+faststart",
+                    output_video
+                ])
             return
         
-        # Get subtitle styling from environment variables with defaults
-        subtitle_font = os.getenv('SUBTITLE_FONT', 'Franklin-Gothic')
-        subtitle_size_ratio = float(os.getenv('SUBTITLE_SIZE_RATIO', '0.065'))
-        subtitle_color = os.getenv('SUBTITLE_COLOR', '#2699ff')
-        subtitle_stroke_color = os.getenv('SUBTITLE_STROKE_COLOR', 'black')
-        subtitle_stroke_width = int(os.getenv('SUBTITLE_STROKE_WIDTH', '2'))
+        fd, srt_path = tempfile.mkstemp(suffix='.srt')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(srt)
         
-        # Scale font size proportionally to video height
-        # 1080p → 70px, 720p → 47px (with default 0.065 ratio)
-        dynamic_fontsize = int(video.h * subtitle_size_ratio)
-        
-        for text, start, end in relevant_transcriptions:
-            # Clean up text
-            text = text.strip()
-            if not text:
-                continue
-                
-            try:
-                # Create text clip with configurable styling
-                txt_clip = TextClip(
-                    text,
-                    fontsize=dynamic_fontsize,
-                    color=subtitle_color,
-                    stroke_color=subtitle_stroke_color,
-                    stroke_width=subtitle_stroke_width,
-                    font=subtitle_font,
-                    method='caption',
-                    size=(video.w - 100, None)  # Leave 50px margin on each side
-                )
-                
-                # Position between middle and bottom (at 75% of video height)
-                txt_clip = txt_clip.set_position(('center', video.h * 0.75))
-                txt_clip = txt_clip.set_start(start)
-                txt_clip = txt_clip.set_duration(end - start)
-                
-                text_clips.append(txt_clip)
-            except Exception as clip_error:
-                print(f"⚠️ Warning: Failed to create subtitle clip for '{text[:30]}...': {clip_error}")
-                continue
-        
-        if not text_clips:
-            print("⚠️ Warning: No subtitle clips could be created, saving video without subtitles")
-            video.write_videofile(
-                output_video,
-                codec='libx264',
-                audio_codec='aac',
-                threads=2,
-                logger=None
-            )
-            return
-        
-        # Composite video with subtitles
-        print(f"Adding {len(text_clips)} subtitle segments to video...")
-        final_video = CompositeVideoClip([video] + text_clips)
-        
-        # Write output with memory-conscious settings
-        final_video.write_videofile(
-            output_video,
-            codec='libx264',
-            audio_codec='aac',
-            fps=video.fps,
-            preset='medium',
-            bitrate='3000k',
-            threads=2,  # Limit threads to reduce memory
-            logger=None  # Reduce console output
-        )
+        print(f"Adding {srt.count(' --> ')} subtitle segments to video...")
+        burn_subtitles(input_video, output_video, srt_path)
         
         print(f"✓ Subtitles added successfully -> {output_video}")
         
     except Exception as e:
         print(f"❌ Error adding subtitles: {str(e)}")
-        import traceback
         traceback.print_exc()
         raise
         
     finally:
-        # Critical: Clean up all clips to free memory
-        try:
-            for clip in text_clips:
-                clip.close()
-            if final_video:
-                final_video.close()
-            if video:
-                video.close()
-        except Exception as cleanup_error:
-            print(f"Warning: Error during subtitle cleanup: {cleanup_error}")
+        if srt_path and os.path.exists(srt_path):
+            try:
+                os.remove(srt_path)
+            except Exception as cleanup_error:
+                print(f"Warning: Error during subtitle cleanup: {cleanup_error}")
@@ -1,7 +1,9 @@
 from moviepy.editor import *
 from Transcription import transcribeAudio
+from concurrent.futures import ThreadPoolExecutor
 import re
 import math
+import os
 
 class EnhancedTextOverlay:
     def __init__(self, video_path="Final.mp4", output_path="test.mp4"):
@@ -25,6 +27,9 @@ class EnhancedTextOverlay:
             # 'fade_duration': 0.1,
             'animation_style': 'none'  # 'fade', 'slide', 'none'
         }
+        
+        # Rendered TextClips keyed by text and style; repeated lines reuse the image
+        self._text_clip_cache = {}
     
 
     
@@ -50,6 +55,23 @@ class EnhancedTextOverlay:
         
         return lines
     
+    def _render_text(self, text_content, config):
+        """Rasterize text once per (text, style); ImageMagick is the dominant per-segment cost"""
+        key = (text_content, config['fontsize'], config['font'], config['color'], config['max_width'])
+        txt_clip = self._text_clip_cache.get(key)
+        if txt_clip is None:
+            txt_clip = TextClip(
+                txt=text_content,
+                fontsize=config['fontsize'],
+                font=config['font'],
+                color=config['color'],
+                method='caption',
+                size=(config['max_width'],None),
+                align='center'
+            )
+            self._text_clip_cache[key] = txt_clip
+        return txt_clip
+    
     def create_text_clip(self, text, start_time, end_time, style_override=None):
         """Create a styled text clip with background and animations"""
         # Apply style overrides
@@ -65,16 +87,8 @@ class EnhancedTextOverlay:
         duration = end_time - start_time
         
         try:
-            # Create main text clip with simpler approach
-            txt_clip = TextClip(
-                txt=text_content,
-                fontsize=config['fontsize'],
-                font=config['font'],
-                color=config['color'],
-                method='caption',
-                size=(config['max_width'],None),
-                align='center'
-            )
+            # Create main text clip with simpler approach (set_* return copies, so the cached clip is untouched)
+            txt_clip = self._render_text(text_content, config)
             
             # Set timing and position
             txt_clip = txt_clip.set_start(start_time).set_duration(duration)
@@ -99,7 +113,7 @@ class EnhancedTextOverlay:
     
     def process_transcriptions(self, transcriptions):
         """Process all transcription segments and create text clips"""
-        text_clips = []
+        segments = []
         
         for i, (text, start, end) in enumerate(transcriptions):
             # Skip very short segments
@@ -117,12 +131,15 @@ class EnhancedTextOverlay:
             else:
                 style_override['color'] = 'yellow'
             
-            # Create text clip
-            clip = self.create_text_clip(text, start, end, style_override)
-            if clip:
-                text_clips.append(clip)
+            segments.append((text, start, end, style_override))
+        
+        # Create text clips in parallel: ImageMagick renders out of process, so the
+        # threads overlap; map() keeps the clips in segment order
+        max_workers = max(1, min(8, os.cpu_count() or 1, len(segments)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            clips = list(executor.map(lambda segment: self.create_text_clip(*segment), segments))
         
-        return text_clips
+        return [clip for clip in clips if clip]
     
     def create_enhanced_video(self, transcriptions=None, fps=30):
         """Create the final video with enhanced text overlays"""
@@ -172,6 +189,7 @@ class EnhancedTextOverlay:
         # Clean up
         final_video.close()
         self.video.close()
+        self._text_clip_cache.clear()
 
 def main():
     """Main function to run the enhanced text overlay"""
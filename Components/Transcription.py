@@ -1,39 +1,117 @@
 """
-Transcription module using faster-whisper (CPU-optimized)
+Transcription module using faster-whisper (CUDA when available, CPU-optimized otherwise)
 """
 
 from faster_whisper import WhisperModel
+import ctranslate2
 import os
+import threading
+
+try:
+    from faster_whisper import BatchedInferencePipeline
+except ImportError:  # faster-whisper < 1.1 has no batched pipeline
+    BatchedInferencePipeline = None
 
 # Global model instance (loaded once)
 _model = None
+_pipeline = None
+# Jobs running on server threads may ask for the model at the same time; load it only once
+_model_lock = threading.Lock()
+
+def whisper_device():
+    """
+    (device, compute_type): int8_float16 on a CUDA GPU, int8 on CPU.
+    WHISPER_COMPUTE_TYPE overrides the compute type (e.g. float16) for hosts where
+    the quantized weights cost accuracy or aren't supported.
+    """
+    device, compute_type = "cpu", "int8"
+    try:
+        if ctranslate2.get_cuda_device_count() > 0:
+            device, compute_type = "cuda", "int8_float16"
+    except Exception:
+        pass
+    return device, os.getenv("WHISPER_COMPUTE_TYPE", compute_type)
 
 def get_whisper_model(model_size: str = "base"):
     """
     Load or return cached Whisper model.
-    Uses faster-whisper with CTranslate2 backend (CPU-optimized).
+    Uses faster-whisper with CTranslate2 backend.
     """
     global _model
     
-    if _model is None:
-        print(f"🎙️ Loading Whisper model: {model_size}")
-        # Use CPU with int8 quantization for speed
-        _model = WhisperModel(
-            model_size, 
-            device="cpu", 
-            compute_type="int8"
-        )
-        print("✅ Whisper model loaded")
+    if _model is not None:
+        return _model
+    
+    with _model_lock:
+        if _model is None:
+            _model = _load_whisper_model(model_size)
     
     return _model
 
-def transcribeAudio(audio_path: str, model_size: str = "base") -> dict:
+def _load_whisper_model(model_size: str):
+    device, compute_type = whisper_device()
+    workers = whisper_workers()
+    print(f"🎙️ Loading Whisper model: {model_size} ({device}, {compute_type}, {workers} worker(s))")
+    # Quantized for speed; on CPU the cores are split between the workers
+    # (CTranslate2 defaults to 4 threads)
+    model = WhisperModel(
+        model_size, 
+        device=device, 
+        compute_type=compute_type,
+        cpu_threads=max(1, (os.cpu_count() or 4) // workers),
+        num_workers=workers
+    )
+    print("✅ Whisper model loaded")
+    return model
+
+def get_whisper_pipeline(model_size: str = "base"):
+    """
+    Batched pipeline over the cached model: VAD-split chunks are decoded in parallel
+    batches. Returns None when the installed faster-whisper does not provide it.
+    """
+    global _pipeline
+    
+    if _pipeline is None and BatchedInferencePipeline is not None:
+        model = get_whisper_model(model_size)
+        with _model_lock:
+            if _pipeline is None:
+                _pipeline = BatchedInferencePipeline(model=model)
+    
+    return _pipeline
+
+def preload_whisper(model_size: str = "base"):
+    """
+    Load the model (and batched pipeline) ahead of the first transcription, e.g. at
+    server startup, so the first job doesn't pay for it. Returns the model.
+    """
+    model = get_whisper_model(model_size)
+    get_whisper_pipeline(model_size)
+    return model
+
+def whisper_workers():
+    """
+    Model replicas serving transcribe() calls from concurrent jobs (WHISPER_WORKERS).
+    With one worker, a second job's transcription waits for the first to finish.
+    """
+    default = "2" if whisper_device()[0] == "cuda" else "1"
+    return max(1, int(os.getenv("WHISPER_WORKERS", default)))
+
+def whisper_batch_size():
+    """Chunks per batched forward pass (WHISPER_BATCH_SIZE); lower it on small GPUs."""
+    default = "16" if whisper_device()[0] == "cuda" else "8"
+    return max(1, int(os.getenv("WHISPER_BATCH_SIZE", default)))
+
+def transcribeAudio(audio_path: str, model_size: str = "base", beam_size: int = 1,
+                    word_timestamps: bool = False, vad_filter: bool = True) -> dict:
     """
     Transcribe audio file to text with timestamps.
     
     Args:
         audio_path: Path to audio file (mp3, wav, etc.)
         model_size: Whisper model size (tiny, base, small, medium, large)
+        beam_size: Decoder beam width (1 = greedy, several times faster than beam search)
+        word_timestamps: Also align per-word timestamps (extra pass per segment)
+        vad_filter: Skip non-speech audio before decoding
     
     Returns:
         Dictionary with transcription results
@@ -45,14 +123,22 @@ def transcribeAudio(audio_path: str, model_size: str = "base") -> dict:
     
     print(f"📝 Transcribing: {audio_path}")
     
-    # Transcribe with word-level timestamps
-    segments, info = model.transcribe(
-        audio_path,
-        beam_size=5,
-        word_timestamps=True,
-        vad_filter=True  # Voice activity detection for better accuracy
+    options = dict(
+        beam_size=beam_size,
+        word_timestamps=word_timestamps,
+        vad_filter=vad_filter,  # Voice activity detection for better accuracy
+        no_speech_threshold=0.6,
+        compression_ratio_threshold=2.4
     )
     
+    # The batched pipeline splits on VAD, so it is only used with vad_filter on
+    pipeline = get_whisper_pipeline(model_size) if vad_filter else None
+    if pipeline is not None:
+        segments, info = pipeline.transcribe(audio_path, batch_size=whisper_batch_size(), **options)
+    else:
+        # Don't feed earlier text back in; avoids runaway repetition on long files
+        segments, info = model.transcribe(audio_path, condition_on_previous_text=False, **options)
+    
     # Convert generator to list and format results
     segments_list = []
     full_text = []
@@ -1,22 +1,220 @@
 import os
 import sys
+import asyncio
+import copy
+import json
+import shutil
+import subprocess
+import time
 import yt_dlp
 import re
+import heapq
+import select
 import random
+from concurrent.futures import ThreadPoolExecutor
+from Components.Edit import ffmpeg_input
+
+# Videos fetched at once by download_youtube_videos (polite to YouTube, still overlaps the sleeps/RTTs)
+YT_BATCH_CONCURRENCY = int(os.environ.get('YT_BATCH_CONCURRENCY', '4'))
+
+# Video metadata from extract_info, cached per video ID so reruns skip the round trip
+YT_INFO_CACHE_DIR = os.path.expanduser("~/.cache/zuke/yt_info")
+# Seconds; stream URLs in the metadata expire after a few hours
+YT_INFO_CACHE_TTL = int(os.environ.get('YT_INFO_CACHE_TTL', '3600'))
+
+# Request headers for every YouTube request (yt-dlp copies them into its own header dict)
+_DEFAULT_HTTP_HEADERS = {
+    'User-Agent': 'com.google.ios.youtube/19.29.1 (iPhone16,2; U; CPU iOS 17_5_1 like Mac OS X;)',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+_DEFAULT_EXTRACTOR_ARGS = {'youtube': {'skip': ['hls', 'dash', 'translated_subs']}}
+
+_VIDEO_ID_RE = re.compile(r'(?:v=|youtu\.be/|shorts/)([\w-]{11})')
+
+# Characters that are not allowed in filenames, deleted in one C-level pass
+_BAD_FILENAME_CHARS = str.maketrans('', '', '<>:"/\\|?*')
+_WHITESPACE_RE = re.compile(r'\s+')
 
 def sanitize_filename(filename):
     """Sanitize filename to be filesystem-safe"""
-    # Remove or replace problematic characters
-    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-    filename = re.sub(r'\s+', ' ', filename).strip()
-    return filename
+    # Remove problematic characters, then collapse whitespace
+    return _WHITESPACE_RE.sub(' ', filename.translate(_BAD_FILENAME_CHARS)).strip()
+
+def _parallel_download_opts():
+    """
+    yt-dlp options that spread a download over several connections: fragments in
+    parallel (YTDLP_CONCURRENT_FRAGMENTS) and, when aria2c is installed, multi-range
+    fetches of single-file formats
+    """
+    opts = {
+        'concurrent_fragment_downloads': int(os.environ.get('YTDLP_CONCURRENT_FRAGMENTS', '5')),
+    }
+    if shutil.which('aria2c'):
+        opts['external_downloader'] = {'default': 'aria2c'}
+        opts['external_downloader_args'] = {'aria2c': ['-x', '16', '-s', '16', '-k', '1M']}
+    return opts
+
+def _use_for_download(ydl, selected_format, output_template):
+    """Point a YoutubeDL that was used for extraction at the chosen format and output file"""
+    ydl.params['format'] = selected_format
+    ydl.format_selector = ydl.build_format_selector(selected_format)
+    ydl.params['outtmpl']['default'] = output_template
+    # Extraction runs quietly; the download shows its progress
+    ydl.params['quiet'] = False
+    ydl.params['no_warnings'] = False
+
+def _select_av_formats(ydl, info):
+    """(video, audio) format dicts when ydl's format picks two streams to merge, else None"""
+    formats = info.get('formats') or []
+    if not formats:
+        return None
+    selector = ydl.build_format_selector(ydl.params['format'])
+    # Same selection context yt-dlp builds when it processes the video itself
+    selected = next(iter(selector({
+        'formats': formats,
+        'has_merged_format': any('none' not in (f.get('acodec'), f.get('vcodec')) for f in formats),
+        'incomplete_formats': (all(f.get('vcodec') == 'none' for f in formats)
+                               or all(f.get('acodec') == 'none' for f in formats)),
+    })), None)
+    requested = (selected or {}).get('requested_formats') or []
+    if len(requested) != 2:
+        return None
+    video_fmt, audio_fmt = requested
+    if video_fmt.get('vcodec') == 'none':
+        video_fmt, audio_fmt = audio_fmt, video_fmt
+    return video_fmt, audio_fmt
+
+def _download_stream(ydl_opts, info, fmt, path, on_done=None):
+    """
+    Download a single format of info to path, without merging or post-processing,
+    then call on_done(path) if given. A failing callback is reported, not raised,
+    so it never fails the download itself.
+    """
+    opts = dict(ydl_opts, format=fmt['format_id'], outtmpl=path, postprocessors=[])
+    opts.pop('merge_output_format', None)
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        ydl.process_ie_result(copy.deepcopy(info), download=True)
+    if on_done:
+        try:
+            on_done(path)
+        except Exception as e:
+            print(f"⚠️  Audio stream callback failed: {e}")
 
-def download_youtube_video(url):
+def _download_streams_in_parallel(ydl, ydl_opts, info, output_file, on_audio=None):
+    """
+    Fetch the video and audio streams of a merged format at the same time, then mux
+    them into output_file with a stream copy. Returns False when the format is a
+    single stream or the parallel download fails (caller falls back to yt-dlp).
+    
+    ydl picks the formats; each stream is downloaded by its own YoutubeDL built from
+    ydl_opts, since one instance is not safe to share between threads.
+    on_audio(path) runs on the audio thread as soon as the audio stream is on disk,
+    overlapping with the rest of the video download.
+    """
     try:
-        if not os.path.exists('videos'):
-            os.makedirs('videos')
+        av_formats = _select_av_formats(ydl, info)
+    except Exception:
+        av_formats = None
+    if not av_formats:
+        return False
+    
+    video_fmt, audio_fmt = av_formats
+    base = os.path.splitext(output_file)[0]
+    parts = [f"{base}.video.{video_fmt['ext']}", f"{base}.audio.{audio_fmt['ext']}"]
+    try:
+        print(f"Downloading video ({video_fmt['format_id']}) and audio ({audio_fmt['format_id']}) streams in parallel...")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(_download_stream, ydl_opts, info, fmt, path, on_done)
+                for fmt, path, on_done in zip(av_formats, parts, (None, on_audio))
+            ]
+            for future in futures:
+                future.result()
         
-        # Check if cookies file exists
+        subprocess.run([
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            *ffmpeg_input(parts[0]),
+            *ffmpeg_input(parts[1]),
+            "-map", "0:v",
+            "-map", "1:a",
+            "-c", "copy",
+            # No +faststart: the source is only read locally (seeks work either way),
+            # and moving the moov atom would rewrite the whole file a second time
+            output_file
+        ], check=True, capture_output=True, text=True)
+        return True
+    except Exception as e:
+        print(f"⚠️  Parallel stream download failed ({e}), falling back to a sequential download...")
+        return False
+    finally:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+
+def _video_id(url):
+    """YouTube video ID from a watch/short/youtu.be URL, or None"""
+    match = _VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
+
+def _info_cache_path(video_id):
+    return os.path.join(YT_INFO_CACHE_DIR, f"{video_id}.json")
+
+def _load_cached_info(video_id):
+    """Return the cached info dict if it is younger than YT_INFO_CACHE_TTL"""
+    cache_path = _info_cache_path(video_id)
+    try:
+        if time.time() - os.path.getmtime(cache_path) < YT_INFO_CACHE_TTL:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _save_cached_info(video_id, info):
+    """Persist the info dict atomically; failures only cost a refetch next run"""
+    cache_path = _info_cache_path(video_id)
+    try:
+        os.makedirs(YT_INFO_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        os.replace(tmp_path, cache_path)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"⚠️  Could not cache video information: {e}")
+
+def _invalidate_cached_info(video_id):
+    """Drop a cache entry whose metadata turned out to be unusable"""
+    try:
+        os.remove(_info_cache_path(video_id))
+    except OSError:
+        pass
+
+def _interactive():
+    """Only offer the resolution prompt to a human at a terminal who opted in with ZUKE_INTERACTIVE=1"""
+    return sys.stdin.isatty() and os.environ.get('ZUKE_INTERACTIVE') == '1'
+
+def download_youtube_video(url, use_cache=True, resolution=None, on_audio=None):
+    """
+    Download a YouTube video into 'videos' and return the file path (None on failure).
+    
+    Args:
+        use_cache: Reuse recently fetched video information (see YT_INFO_CACHE_TTL)
+        resolution: Maximum video height, e.g. 720 (default: the best available, or
+                    the user's pick when running interactively)
+        on_audio: Called with the audio stream's path while the video stream is still
+                  downloading. Only called when the streams are fetched separately, and
+                  the file is removed once the download finishes, so the callback must
+                  be done with it by the time it returns.
+    """
+    try:
+        os.makedirs('videos', exist_ok=True)
+        
+        # Check if cookies file exists (checked per call: refresh-cookies.sh swaps it at runtime)
         cookies_file = os.path.join(os.getcwd(), 'youtube_cookies.txt')
         use_cookies = os.path.exists(cookies_file)
         
@@ -48,137 +246,18 @@ def download_youtube_video(url):
         selected_clients = random.choice(client_combinations)
         print(f"Using player clients: {', '.join(selected_clients)}")
         
-        ydl_opts_info = {
+        ydl_opts = {
             'quiet': True,
             'no_warnings': True,
-            'extractor_args': {
-                'youtube': {
-                    'player_client': selected_clients,
-                    'skip': ['hls', 'dash', 'translated_subs']
-                }
-            },
-            'http_headers': {
-                'User-Agent': 'com.google.ios.youtube/19.29.1 (iPhone16,2; U; CPU iOS 17_5_1 like Mac OS X;)',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
-            },
-            # Age gate bypass
-            'age_limit': None,
-            # Retry settings
-            'retries': 10,
-            'fragment_retries': 10,
-            'skip_unavailable_fragments': True,
-            # Sleep between requests (be polite to YouTube)
-            'sleep_interval': 1,
-            'max_sleep_interval': 5,
-            'sleep_interval_requests': 1,
-        }
-        
-        # Add cookies configuration
-        if use_cookies:
-            ydl_opts_info['cookiefile'] = cookies_file
-        elif browser_cookies:
-            ydl_opts_info['cookiesfrombrowser'] = (browser_cookies,)
-        
-        with yt_dlp.YoutubeDL(ydl_opts_info) as ydl:
-            info = ydl.extract_info(url, download=False)
-            title = info.get('title', 'video')
-            formats = info.get('formats', [])
-            
-            # Filter and sort video formats (only those with video)
-            video_formats = [
-                f for f in formats 
-                if f.get('vcodec') != 'none' and f.get('height') is not None
-            ]
-            video_formats = sorted(video_formats, key=lambda x: x.get('height', 0), reverse=True)
-            
-            # Get unique resolutions (deduplicate)
-            seen_heights = set()
-            unique_formats = []
-            for fmt in video_formats:
-                height = fmt.get('height')
-                if height and height not in seen_heights and len(unique_formats) < 5:
-                    seen_heights.add(height)
-                    unique_formats.append(fmt)
-            
-            if not unique_formats:
-                print("No suitable video formats found, using best available...")
-                selected_format = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
-            else:
-                # Show available streams
-                print("\nAvailable video streams:")
-                for i, fmt in enumerate(unique_formats):
-                    height = fmt.get('height', 'N/A')
-                    filesize = fmt.get('filesize') or fmt.get('filesize_approx', 0)
-                    size_mb = filesize / (1024 * 1024) if filesize else 0
-                    fps = fmt.get('fps', 'N/A')
-                    ext = fmt.get('ext', 'N/A')
-                    print(f"  {i}. Resolution: {height}p, Size: ~{size_mb:.1f} MB, FPS: {fps}, Format: {ext}")
-                
-                # Interactive selection with timeout
-                print("\nSelect resolution number (0-{}) or wait 5s for auto-select...".format(len(unique_formats)-1))
-                print("Auto-selecting highest quality in 5 seconds...")
-                
-                selected_idx = None
-                try:
-                    # Platform-independent timeout input
-                    import select
-                    if hasattr(select, 'select'):
-                        ready, _, _ = select.select([sys.stdin], [], [], 5)
-                        if ready:
-                            user_input = sys.stdin.readline().strip()
-                            if user_input.isdigit():
-                                choice = int(user_input)
-                                if 0 <= choice < len(unique_formats):
-                                    selected_idx = choice
-                                    print(f"✓ User selected: {unique_formats[choice]['height']}p")
-                                else:
-                                    print("Invalid choice, using highest quality")
-                            else:
-                                print("Invalid input, using highest quality")
-                        else:
-                            print("\nTimeout - auto-selecting highest quality")
-                    else:
-                        print("\nAuto-selecting highest quality (timeout not available on this platform)")
-                except:
-                    print("\nAuto-selecting highest quality")
-                
-                # Use selected format or default to best
-                if selected_idx is not None:
-                    format_id = unique_formats[selected_idx]['format_id']
-                    selected_format = f"{format_id}+bestaudio/best"
-                    print(f"\nFinal selection: {unique_formats[selected_idx]['height']}p")
-                else:
-                    selected_format = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
-                    print(f"\nFinal selection: {unique_formats[0]['height']}p (highest quality)")
-        
-        # Download with selected format
-        safe_title = sanitize_filename(title)
-        output_template = os.path.join('videos', f"{safe_title}.%(ext)s")
-        
-        ydl_opts = {
-            'format': selected_format,
-            'outtmpl': output_template,
+            # Replaced by the chosen format once the info is in
+            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+            'outtmpl': os.path.join('videos', '%(title)s.%(ext)s'),
             'merge_output_format': 'mp4',
             'extractor_args': {
-                'youtube': {
-                    'player_client': selected_clients,
-                    'skip': ['hls', 'dash', 'translated_subs']
-                }
-            },
-            'http_headers': {
-                'User-Agent': 'com.google.ios.youtube/19.29.1 (iPhone16,2; U; CPU iOS 17_5_1 like Mac OS X;)',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
+                **_DEFAULT_EXTRACTOR_ARGS,
+                'youtube': {**_DEFAULT_EXTRACTOR_ARGS['youtube'], 'player_client': selected_clients}
             },
+            'http_headers': _DEFAULT_HTTP_HEADERS,
             'postprocessors': [{
                 'key': 'FFmpegVideoConvertor',
                 'preferedformat': 'mp4',
@@ -189,10 +268,15 @@ def download_youtube_video(url):
             'retries': 10,
             'fragment_retries': 10,
             'skip_unavailable_fragments': True,
-            # Sleep between requests
+            # Sleep between requests (be polite to YouTube)
             'sleep_interval': 1,
             'max_sleep_interval': 5,
             'sleep_interval_requests': 1,
+            # Don't resolve every entry when handed a playlist URL
+            'extract_flat': 'in_playlist',
+            # Larger ranged GETs mean fewer request/response cycles per download
+            'http_chunk_size': 10 * 1024 * 1024,
+            **_parallel_download_opts(),
         }
         
         # Add cookies configuration
@@ -201,11 +285,111 @@ def download_youtube_video(url):
         elif browser_cookies:
             ydl_opts['cookiesfrombrowser'] = (browser_cookies,)
         
-        print(f"Downloading video: {title}")
+        # One YoutubeDL for both the info fetch and the download, so the download
+        # reuses its open connections instead of handshaking from scratch
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
+            video_id = _video_id(url) if use_cache else None
+            info = _load_cached_info(video_id) if video_id else None
+            if info is not None:
+                print(f"✓ Using cached video information for {video_id}")
+            else:
+                # sanitize_info makes the dict JSON-serializable
+                info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+                if video_id:
+                    _save_cached_info(video_id, info)
+            
+            title = info.get('title', 'video')
+            if resolution:
+                # Height chosen up front - no need to list the formats
+                selected_format = (f"bestvideo[height<={resolution}][ext=mp4]+bestaudio[ext=m4a]"
+                                   f"/best[height<={resolution}][ext=mp4]/best[height<={resolution}]/best")
+                print(f"Final selection: up to {resolution}p")
+            elif not _interactive():
+                selected_format = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+                print("Final selection: highest quality")
+            else:
+                formats = info.get('formats', [])
+            
+                # Get unique resolutions (first video format listed at each height)
+                formats_by_height = {}
+                for fmt in formats:
+                    height = fmt.get('height')
+                    if height and fmt.get('vcodec') != 'none':
+                        formats_by_height.setdefault(height, fmt)
+            
+                # Top 5 heights without sorting every format
+                unique_formats = heapq.nlargest(5, formats_by_height.values(), key=lambda x: x['height'])
+            
+                if not unique_formats:
+                    print("No suitable video formats found, using best available...")
+                    selected_format = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+                else:
+                    # Show available streams
+                    print("\nAvailable video streams:")
+                    for i, fmt in enumerate(unique_formats):
+                        height = fmt.get('height', 'N/A')
+                        filesize = fmt.get('filesize') or fmt.get('filesize_approx', 0)
+                        size_mb = filesize / (1024 * 1024) if filesize else 0
+                        fps = fmt.get('fps', 'N/A')
+                        ext = fmt.get('ext', 'N/A')
+                        print(f"  {i}. Resolution: {height}p, Size: ~{size_mb:.1f} MB, FPS: {fps}, Format: {ext}")
+            
+                    # Interactive selection with timeout
+                    print("\nSelect resolution number (0-{}) or wait 5s for auto-select...".format(len(unique_formats)-1))
+                    print("Auto-selecting highest quality in 5 seconds...")
+            
+                    selected_idx = None
+                    try:
+                        # Platform-independent timeout input
+                        if hasattr(select, 'select'):
+                            ready, _, _ = select.select([sys.stdin], [], [], 5)
+                            if ready:
+                                user_input = sys.stdin.readline().strip()
+                                if user_input.isdigit():
+                                    choice = int(user_input)
+                                    if 0 <= choice < len(unique_formats):
+                                        selected_idx = choice
+                                        print(f"✓ User selected: {unique_formats[choice]['height']}p")
+                                    else:
+                                        print("Invalid choice, using highest quality")
+                                else:
+                                    print("Invalid input, using highest quality")
+                            else:
+                                print("\nTimeout - auto-selecting highest quality")
+                        else:
+                            print("\nAuto-selecting highest quality (timeout not available on this platform)")
+                    except (OSError, ValueError):
+                        # stdin closed or not selectable (e.g. Windows consoles)
+                        print("\nAuto-selecting highest quality")
+            
+                    # Use selected format or default to best
+                    if selected_idx is not None:
+                        format_id = unique_formats[selected_idx]['format_id']
+                        selected_format = f"{format_id}+bestaudio/best"
+                        print(f"\nFinal selection: {unique_formats[selected_idx]['height']}p")
+                    else:
+                        selected_format = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+                        print(f"\nFinal selection: {unique_formats[0]['height']}p (highest quality)")
+            
+            # Download with selected format
+            safe_title = sanitize_filename(title)
+            output_template = os.path.join('videos', f"{safe_title}.%(ext)s")
+            output_file = os.path.join('videos', f"{safe_title}.mp4")
+            _use_for_download(ydl, selected_format, output_template)
+            
+            print(f"Downloading video: {title}")
+            stream_opts = dict(ydl_opts, quiet=False, no_warnings=False)
+            if not _download_streams_in_parallel(ydl, stream_opts, info, output_file, on_audio):
+                # Download from the metadata resolved above instead of running the extractor again
+                try:
+                    ydl.process_ie_result(info, download=True)
+                except yt_dlp.utils.DownloadError as e:
+                    # Stream URLs in the metadata can expire; re-extract once before giving up
+                    print(f"⚠️  Download from resolved metadata failed ({e}), re-extracting...")
+                    if video_id:
+                        _invalidate_cached_info(video_id)
+                    ydl.download([url])
         
-        output_file = os.path.join('videos', f"{safe_title}.mp4")
         print(f"Downloaded: {title} to 'videos' folder")
         print(f"File path: {output_file}")
         return output_file
@@ -237,6 +421,31 @@ def download_youtube_video(url):
         print("Also, ensure that ffmpeg is installed on your system and available in your PATH.")
         return None
 
+async def download_youtube_videos(urls, max_concurrency=None, resolution=None):
+    """
+    Download several videos with up to max_concurrency (default YT_BATCH_CONCURRENCY)
+    in flight at once, so the request sleeps and round trips of one video overlap
+    with the others. Await it from the caller's event loop (e.g. a FastAPI handler);
+    from synchronous code, wrap it in asyncio.run as the CLI below does.
+    
+    Returns the output paths in the order of urls (None for failed downloads).
+    """
+    urls = list(urls)
+    semaphore = asyncio.Semaphore(max_concurrency or YT_BATCH_CONCURRENCY)
+    
+    async def download(url):
+        async with semaphore:
+            # Extraction and download block on the network (and ffmpeg), so each video
+            # runs in a worker thread while the others proceed
+            return await asyncio.to_thread(download_youtube_video, url, resolution=resolution)
+    
+    return list(await asyncio.gather(*(download(url) for url in urls)))
+
 if __name__ == "__main__":
-    youtube_url = input("Enter YouTube video URL: ")
-    download_youtube_video(youtube_url)
+    if len(sys.argv) > 1:
+        # Several URLs on the command line are downloaded concurrently
+        for path in asyncio.run(download_youtube_videos(sys.argv[1:])):
+            print(path)
+    else:
+        youtube_url = input("Enter YouTube video URL: ")
+        download_youtube_video(youtube_url)
@@ -1,4 +1,10 @@
 # Azure Storage Integration Module
-from .azure_storage import AzureBlobStorageManager, get_storage_manager
+# The Azure SDK is imported on first use (PEP 562), so importing Components.storage
+# doesn't pay for azure.storage/azure.identity when no storage call is made
+__all__ = ['AzureBlobStorageManager', 'AzureBlobStorageManagerAsync', 'get_storage_manager']
 
-__all__ = ['AzureBlobStorageManager', 'get_storage_manager']
\ No newline at end of file
+def __getattr__(name):
+    if name in __all__:
+        from . import azure_storage
+        return getattr(azure_storage, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
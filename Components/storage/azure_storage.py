@@ -1,13 +1,93 @@
 import os
+import asyncio
 import logging
-from typing import Optional, List, BinaryIO
-from azure.storage.blob import BlobServiceClient, BlobClient
-from azure.identity import DefaultAzureCredential
-from datetime import datetime, timedelta
+import functools
+from typing import Optional, List, BinaryIO, Iterator
+from azure.storage.blob import (
+    BlobServiceClient, BlobClient, BlobSasPermissions, ContentSettings, generate_blob_sas
+)
+from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+from azure.identity import DefaultAzureCredential, TokenCachePersistenceOptions
+from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
+from datetime import datetime, timedelta, timezone
 import mimetypes
 
 logger = logging.getLogger(__name__)
 
+# Parallel block uploads per file; each block is its own PUT on the pooled connections
+UPLOAD_CONCURRENCY = int(os.getenv("AZ_UPLOAD_CONCURRENCY", "8"))
+# Parallel ranged GETs per download
+DOWNLOAD_CONCURRENCY = int(os.getenv("AZ_DOWNLOAD_CONCURRENCY", "8"))
+# Most blobs the Blob Batch API deletes in one request
+DELETE_BATCH_SIZE = 256
+# Files transferred at once by AzureBlobStorageManagerAsync's *_many methods
+ASYNC_TRANSFER_CONCURRENCY = int(os.getenv("AZ_ASYNC_TRANSFER_CONCURRENCY", "16"))
+# Blobs per listing page (the service maximum), i.e. per round trip
+LIST_PAGE_SIZE = 5000
+# Blobs up to MAX_SINGLE_PUT_SIZE go up in one request, larger ones in MAX_BLOCK_SIZE blocks
+MAX_BLOCK_SIZE = 8 * 1024 * 1024
+MAX_SINGLE_PUT_SIZE = 64 * 1024 * 1024
+# Fail fast on an unreachable endpoint, but give large block transfers time to finish
+CLIENT_OPTIONS = {
+    'connection_timeout': 5,
+    'read_timeout': 300,
+    'retry_total': 5,
+}
+
+# Hand out read-only SAS URLs from get_blob_url (needed once the container is private)
+USE_SAS_URLS = os.getenv("AZURE_STORAGE_SAS_URLS") == "1"
+# New containers are private when blobs are reached through SAS URLs, anonymous-read otherwise
+CONTAINER_PUBLIC_ACCESS = None if USE_SAS_URLS else 'blob'
+SAS_BUCKET_SECONDS = 3600
+
+# Azure AD credential shared by every manager in the process (see _get_credential)
+_credential = None
+
+def _credential_options() -> dict:
+    """
+    DefaultAzureCredential options. AZURE_PERSIST_TOKEN_CACHE=1 keeps tokens in an
+    on-disk cache shared by worker processes, so each worker doesn't request its own;
+    the cache is unencrypted where no keyring is available.
+    """
+    if os.getenv("AZURE_PERSIST_TOKEN_CACHE") == "1":
+        return {
+            'cache_persistence_options': TokenCachePersistenceOptions(
+                name="zuke-video-shorts", allow_unencrypted_storage=True
+            )
+        }
+    return {}
+
+def _get_credential() -> DefaultAzureCredential:
+    """Process-wide DefaultAzureCredential, so its credential probing happens once"""
+    global _credential
+    if _credential is None:
+        _credential = DefaultAzureCredential(**_credential_options())
+    return _credential
+
+@functools.lru_cache(maxsize=4096)
+def _blob_sas(account_name: str, account_key: str, container_name: str, blob_name: str,
+              expiry_hours: int, bucket: int) -> str:
+    """
+    Read-only SAS token for a blob. The expiry is counted from the start of the
+    current hour bucket (plus one bucket), so every request in the same hour reuses
+    one signature while each token still stays valid for at least expiry_hours.
+    """
+    expiry = datetime.fromtimestamp((bucket + 1) * SAS_BUCKET_SECONDS, tz=timezone.utc) + timedelta(hours=expiry_hours)
+    return generate_blob_sas(
+        account_name=account_name,
+        container_name=container_name,
+        blob_name=blob_name,
+        account_key=account_key,
+        permission=BlobSasPermissions(read=True),
+        expiry=expiry
+    )
+
+@functools.lru_cache(maxsize=128)
+def _guess_content_type(extension: str) -> str:
+    """MIME type for a lowercase file extension such as '.mp4'"""
+    content_type, _ = mimetypes.guess_type(f"file{extension}")
+    return content_type or "application/octet-stream"
+
 class AzureBlobStorageManager:
     """
     Azure Blob Storage manager for handling media files
@@ -22,21 +102,23 @@ class AzureBlobStorageManager:
             raise ValueError("AZURE_STORAGE_ACCOUNT_NAME environment variable is required")
         
         # Initialize blob service client
+        account_url = f"https://{self.account_name}.blob.core.windows.net"
         if self.account_key:
             # Use account key authentication
-            account_url = f"https://{self.account_name}.blob.core.windows.net"
-            self.blob_service_client = BlobServiceClient(
-                account_url=account_url,
-                credential=self.account_key
-            )
+            credential = self.account_key
         else:
             # Use Azure AD authentication (managed identity or Azure CLI)
-            account_url = f"https://{self.account_name}.blob.core.windows.net"
-            credential = DefaultAzureCredential()
-            self.blob_service_client = BlobServiceClient(
-                account_url=account_url,
-                credential=credential
-            )
+            credential = _get_credential()
+        self.blob_service_client = BlobServiceClient(
+            account_url=account_url,
+            credential=credential,
+            max_block_size=MAX_BLOCK_SIZE,
+            max_single_put_size=MAX_SINGLE_PUT_SIZE,
+            **CLIENT_OPTIONS
+        )
+        
+        # Blob clients are reused per name (re-uploads and URL lookups hit the same blobs)
+        self._blob_client_for = functools.lru_cache(maxsize=128)(self._new_blob_client)
         
         # Ensure container exists
         self._ensure_container_exists()
@@ -46,12 +128,18 @@ class AzureBlobStorageManager:
         try:
             container_client = self.blob_service_client.get_container_client(self.container_name)
             if not container_client.exists():
-                container_client.create_container(public_access='blob')
+                container_client.create_container(public_access=CONTAINER_PUBLIC_ACCESS)
                 logger.info(f"Created container: {self.container_name}")
         except Exception as e:
             logger.error(f"Error ensuring container exists: {str(e)}")
             raise
     
+    def _new_blob_client(self, blob_name: str) -> BlobClient:
+        return self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=blob_name
+        )
+    
     def upload_file(self, 
                    file_path: str, 
                    blob_name: Optional[str] = None,
@@ -81,22 +169,19 @@ class AzureBlobStorageManager:
                 blob_name = f"{folder.strip('/')}/{blob_name}"
             
             # Get blob client
-            blob_client = self.blob_service_client.get_blob_client(
-                container=self.container_name,
-                blob=blob_name
-            )
+            blob_client = self._blob_client_for(blob_name)
             
             # Determine content type
-            content_type, _ = mimetypes.guess_type(file_path)
-            if content_type is None:
-                content_type = "application/octet-stream"
+            content_type = _guess_content_type(os.path.splitext(file_path)[1].lower())
             
-            # Upload file
+            # Upload file, streamed from disk in blocks sent in parallel
             with open(file_path, 'rb') as data:
                 blob_client.upload_blob(
                     data,
-                    content_settings={'content_type': content_type},
-                    overwrite=overwrite
+                    length=os.path.getsize(file_path),
+                    content_settings=ContentSettings(content_type=content_type),
+                    overwrite=overwrite,
+                    max_concurrency=UPLOAD_CONCURRENCY
                 )
             
             # Return public URL
@@ -133,16 +218,14 @@ class AzureBlobStorageManager:
                 blob_name = f"{folder.strip('/')}/{blob_name}"
             
             # Get blob client
-            blob_client = self.blob_service_client.get_blob_client(
-                container=self.container_name,
-                blob=blob_name
-            )
+            blob_client = self._blob_client_for(blob_name)
             
             # Upload stream
             blob_client.upload_blob(
                 data,
-                content_settings={'content_type': content_type},
-                overwrite=overwrite
+                content_settings=ContentSettings(content_type=content_type),
+                overwrite=overwrite,
+                max_concurrency=UPLOAD_CONCURRENCY
             )
             
             # Return public URL
@@ -166,18 +249,15 @@ class AzureBlobStorageManager:
             Path to the downloaded file
         """
         try:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            # Ensure directory exists (a bare filename goes to the working directory)
+            os.makedirs(os.path.dirname(local_path) or '.', exist_ok=True)
             
             # Get blob client
-            blob_client = self.blob_service_client.get_blob_client(
-                container=self.container_name,
-                blob=blob_name
-            )
+            blob_client = self._blob_client_for(blob_name)
             
-            # Download blob
+            # Download blob straight into the file, chunk by chunk (never held in memory whole)
             with open(local_path, 'wb') as download_file:
-                download_file.write(blob_client.download_blob().readall())
+                blob_client.download_blob(max_concurrency=DOWNLOAD_CONCURRENCY).readinto(download_file)
             
             logger.info(f"Successfully downloaded {blob_name} to {local_path}")
             return local_path
@@ -197,10 +277,7 @@ class AzureBlobStorageManager:
             True if deleted successfully, False otherwise
         """
         try:
-            blob_client = self.blob_service_client.get_blob_client(
-                container=self.container_name,
-                blob=blob_name
-            )
+            blob_client = self._blob_client_for(blob_name)
             
             blob_client.delete_blob()
             logger.info(f"Successfully deleted blob: {blob_name}")
@@ -210,16 +287,19 @@ class AzureBlobStorageManager:
             logger.error(f"Error deleting blob {blob_name}: {str(e)}")
             return False
     
-    def list_blobs(self, folder: str = "", name_starts_with: str = "") -> List[dict]:
+    def list_blobs(self, folder: str = "", name_starts_with: str = "",
+                   include_metadata: bool = False, page_size: int = LIST_PAGE_SIZE) -> Iterator[dict]:
         """
-        List blobs in the container
+        List blobs in the container, page by page as the caller iterates
         
         Args:
             folder: Filter by folder prefix
             name_starts_with: Filter by blob name prefix
+            include_metadata: Also fetch each blob's user metadata (larger listing)
+            page_size: Blobs fetched per request
             
-        Returns:
-            List of blob information dictionaries
+        Yields:
+            Blob information dictionaries
         """
         try:
             container_client = self.blob_service_client.get_container_client(self.container_name)
@@ -228,22 +308,47 @@ class AzureBlobStorageManager:
             prefix = folder.strip('/') + '/' if folder else ""
             prefix += name_starts_with
             
-            blobs = []
-            for blob in container_client.list_blobs(name_starts_with=prefix or None):
-                blobs.append({
+            for blob in container_client.list_blobs(name_starts_with=prefix or None,
+                                                    include=['metadata'] if include_metadata else None,
+                                                    results_per_page=page_size):
+                info = {
                     'name': blob.name,
                     'size': blob.size,
                     'last_modified': blob.last_modified,
                     'content_type': blob.content_settings.content_type if blob.content_settings else None,
                     'url': f"https://{self.account_name}.blob.core.windows.net/{self.container_name}/{blob.name}"
-                })
-            
-            return blobs
+                }
+                if include_metadata:
+                    info['metadata'] = blob.metadata or {}
+                yield info
             
         except Exception as e:
             logger.error(f"Error listing blobs: {str(e)}")
             raise
     
+    def list_blob_names(self, folder: str = "", name_starts_with: str = "") -> List[str]:
+        """
+        List blob names in the container, without parsing any blob properties
+        
+        Args:
+            folder: Filter by folder prefix
+            name_starts_with: Filter by blob name prefix
+            
+        Returns:
+            List of blob names
+        """
+        try:
+            container_client = self.blob_service_client.get_container_client(self.container_name)
+            
+            prefix = folder.strip('/') + '/' if folder else ""
+            prefix += name_starts_with
+            
+            return list(container_client.list_blob_names(name_starts_with=prefix or None))
+            
+        except Exception as e:
+            logger.error(f"Error listing blob names: {str(e)}")
+            raise
+    
     def get_blob_url(self, blob_name: str, expiry_hours: int = 24) -> str:
         """
         Get a public URL for a blob (with optional SAS token for private containers)
@@ -256,19 +361,43 @@ class AzureBlobStorageManager:
             Public URL or SAS URL
         """
         try:
-            blob_client = self.blob_service_client.get_blob_client(
-                container=self.container_name,
-                blob=blob_name
-            )
+            blob_client = self._blob_client_for(blob_name)
             
             # For public containers, return direct URL
-            # For private containers, you'd generate a SAS token here
-            return blob_client.url
+            if not USE_SAS_URLS:
+                return blob_client.url
+            
+            # For private containers, sign a read-only SAS token (account key authentication only)
+            if not self.account_key:
+                logger.warning("AZURE_STORAGE_SAS_URLS needs AZURE_STORAGE_ACCOUNT_KEY; returning the plain URL")
+                return blob_client.url
+            bucket = int(datetime.now(timezone.utc).timestamp()) // SAS_BUCKET_SECONDS
+            sas = _blob_sas(self.account_name, self.account_key, self.container_name, blob_name,
+                            expiry_hours, bucket)
+            return f"{blob_client.url}?{sas}"
             
         except Exception as e:
             logger.error(f"Error getting blob URL for {blob_name}: {str(e)}")
             raise
     
+    def _delete_batch(self, container_client, batch: List[str]) -> int:
+        """Delete up to DELETE_BATCH_SIZE blobs in one request, returning how many were deleted"""
+        try:
+            responses = container_client.delete_blobs(*batch, raise_on_any_failure=False)
+        except Exception as e:
+            logger.warning(f"Failed to delete batch of {len(batch)} files: {str(e)}")
+            return 0
+        
+        # One sub-response per blob, in request order
+        deleted_count = 0
+        for name, response in zip(batch, responses):
+            if response.status_code < 300:
+                deleted_count += 1
+                logger.info(f"Deleted old file: {name}")
+            else:
+                logger.warning(f"Failed to delete {name}: HTTP {response.status_code} {response.reason}")
+        return deleted_count
+    
     def cleanup_old_files(self, older_than_days: int = 7, folder: str = "temp/") -> int:
         """
         Clean up old temporary files
@@ -284,19 +413,20 @@ class AzureBlobStorageManager:
             cutoff_date = datetime.utcnow() - timedelta(days=older_than_days)
             container_client = self.blob_service_client.get_container_client(self.container_name)
             
+            # Delete in batches: one request per DELETE_BATCH_SIZE blobs instead of one per blob.
+            # Each batch goes out as soon as it is full, while later pages are still to be listed
             deleted_count = 0
-            for blob in container_client.list_blobs(name_starts_with=folder):
+            batch = []
+            # Only name and last_modified are needed, so no optional datasets are requested
+            for blob in container_client.list_blobs(name_starts_with=folder, include=None,
+                                                    results_per_page=LIST_PAGE_SIZE):
                 if blob.last_modified.replace(tzinfo=None) < cutoff_date:
-                    try:
-                        blob_client = self.blob_service_client.get_blob_client(
-                            container=self.container_name,
-                            blob=blob.name
-                        )
-                        blob_client.delete_blob()
-                        deleted_count += 1
-                        logger.info(f"Deleted old file: {blob.name}")
-                    except Exception as e:
-                        logger.warning(f"Failed to delete {blob.name}: {str(e)}")
+                    batch.append(blob.name)
+                    if len(batch) == DELETE_BATCH_SIZE:
+                        deleted_count += self._delete_batch(container_client, batch)
+                        batch = []
+            if batch:
+                deleted_count += self._delete_batch(container_client, batch)
             
             logger.info(f"Cleanup completed: {deleted_count} files deleted")
             return deleted_count
@@ -305,6 +435,168 @@ class AzureBlobStorageManager:
             logger.error(f"Error during cleanup: {str(e)}")
             return 0
 
+class AzureBlobStorageManagerAsync:
+    """
+    Asyncio counterpart of AzureBlobStorageManager for moving many files at once.
+    
+    One client (and its connection pool) is held for the manager's lifetime, so
+    concurrent transfers share connections. Use it as an async context manager,
+    or call close() when done:
+    
+        async with AzureBlobStorageManagerAsync() as storage:
+            urls = await storage.upload_file_many(paths, folder="shorts")
+    """
+    
+    def __init__(self):
+        self.account_name = os.getenv("AZURE_STORAGE_ACCOUNT_NAME")
+        self.account_key = os.getenv("AZURE_STORAGE_ACCOUNT_KEY")
+        self.container_name = os.getenv("AZURE_STORAGE_CONTAINER_NAME", "video-content")
+        
+        if not self.account_name:
+            raise ValueError("AZURE_STORAGE_ACCOUNT_NAME environment variable is required")
+        
+        account_url = f"https://{self.account_name}.blob.core.windows.net"
+        # Account key authentication, or Azure AD (managed identity or Azure CLI)
+        self._credential = self.account_key or AsyncDefaultAzureCredential(**_credential_options())
+        self.blob_service_client = AsyncBlobServiceClient(
+            account_url=account_url,
+            credential=self._credential,
+            max_block_size=MAX_BLOCK_SIZE,
+            max_single_put_size=MAX_SINGLE_PUT_SIZE,
+            **CLIENT_OPTIONS
+        )
+        self._container_checked = False
+    
+    async def __aenter__(self):
+        await self._ensure_container_exists()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    async def close(self):
+        """Close the client and, for Azure AD authentication, the credential"""
+        await self.blob_service_client.close()
+        if not isinstance(self._credential, str):
+            await self._credential.close()
+    
+    async def _ensure_container_exists(self):
+        """Create container if it doesn't exist"""
+        if self._container_checked:
+            return
+        try:
+            container_client = self.blob_service_client.get_container_client(self.container_name)
+            if not await container_client.exists():
+                await container_client.create_container(public_access=CONTAINER_PUBLIC_ACCESS)
+                logger.info(f"Created container: {self.container_name}")
+            self._container_checked = True
+        except Exception as e:
+            logger.error(f"Error ensuring container exists: {str(e)}")
+            raise
+    
+    async def upload_file(self,
+                          file_path: str,
+                          blob_name: Optional[str] = None,
+                          folder: str = "",
+                          overwrite: bool = True) -> str:
+        """
+        Upload a file to Azure Blob Storage
+        
+        Args:
+            file_path: Local path to the file
+            blob_name: Name for the blob (if None, uses filename)
+            folder: Folder structure in the container
+            overwrite: Whether to overwrite existing blob
+            
+        Returns:
+            Public URL of the uploaded blob
+        """
+        try:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"File not found: {file_path}")
+            
+            if blob_name is None:
+                blob_name = os.path.basename(file_path)
+            
+            # Add folder prefix if specified
+            if folder:
+                blob_name = f"{folder.strip('/')}/{blob_name}"
+            
+            await self._ensure_container_exists()
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.container_name,
+                blob=blob_name
+            )
+            
+            content_type = _guess_content_type(os.path.splitext(file_path)[1].lower())
+            
+            with open(file_path, 'rb') as data:
+                await blob_client.upload_blob(
+                    data,
+                    length=os.path.getsize(file_path),
+                    content_settings=ContentSettings(content_type=content_type),
+                    overwrite=overwrite,
+                    max_concurrency=UPLOAD_CONCURRENCY
+                )
+            
+            blob_url = blob_client.url
+            logger.info(f"Successfully uploaded {file_path} to {blob_url}")
+            return blob_url
+            
+        except Exception as e:
+            logger.error(f"Error uploading file {file_path}: {str(e)}")
+            raise
+    
+    async def upload_file_many(self,
+                               file_paths: List[str],
+                               folder: str = "",
+                               overwrite: bool = True,
+                               max_concurrency: Optional[int] = None) -> List[str]:
+        """
+        Upload several files concurrently (at most max_concurrency at a time,
+        default ASYNC_TRANSFER_CONCURRENCY)
+        
+        Returns:
+            Public URLs in the order of file_paths; raises if any upload fails
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or ASYNC_TRANSFER_CONCURRENCY)
+        
+        async def upload(file_path):
+            async with semaphore:
+                return await self.upload_file(file_path, folder=folder, overwrite=overwrite)
+        
+        return list(await asyncio.gather(*(upload(path) for path in file_paths)))
+    
+    async def download_file(self, blob_name: str, local_path: str) -> str:
+        """
+        Download a blob to a local file
+        
+        Args:
+            blob_name: Name of the blob to download
+            local_path: Local path where the file should be saved
+            
+        Returns:
+            Path to the downloaded file
+        """
+        try:
+            os.makedirs(os.path.dirname(local_path) or '.', exist_ok=True)
+            
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.container_name,
+                blob=blob_name
+            )
+            
+            downloader = await blob_client.download_blob(max_concurrency=DOWNLOAD_CONCURRENCY)
+            with open(local_path, 'wb') as download_file:
+                await downloader.readinto(download_file)
+            
+            logger.info(f"Successfully downloaded {blob_name} to {local_path}")
+            return local_path
+            
+        except Exception as e:
+            logger.error(f"Error downloading blob {blob_name}: {str(e)}")
+            raise
+
 # Singleton instance
 _storage_manager = None
 
@@ -3,28 +3,84 @@ Updated API Gateway
 Routes requests to the standalone video processor service
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Security
+from fastapi import FastAPI, HTTPException, Depends, Security
 from fastapi.security.api_key import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, HttpUrl, field_serializer, field_validator
 from typing import Optional, List, Dict, Any
+from collections import OrderedDict
 import uuid
 import os
 import asyncio
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+import functools
+import time
 import logging
 import aiohttp
-import json
+import orjson
+from job_store import JobStore
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One HTTP session for the gateway's lifetime, so calls to the processor and
+    # webhooks reuse keep-alive connections instead of handshaking every time.
+    # Each running job holds a processor connection for its whole /process/sync
+    # call, so the per-host limit leaves room on top of those for status lookups.
+    # The processor is a single fixed host: no global cap beyond the per-host one,
+    # DNS answers kept for 5 minutes, and idle connections kept for 2 (the
+    # processor keeps them a little longer, so we never reuse one it has closed).
+    app.state.http = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=max(128, JOB_WORKERS + PROCESSOR_SPARE_CONNECTIONS),
+            use_dns_cache=True,
+            ttl_dns_cache=300,
+            keepalive_timeout=120,
+            enable_cleanup_closed=True
+        ),
+        timeout=aiohttp.ClientTimeout(total=1800, connect=10),
+        # aiohttp wants a str back from the serializer
+        json_serialize=lambda obj: orjson.dumps(obj).decode()
+    )
+    await job_store.open()
+    # Webhooks go through a bounded queue drained by a few workers, so a slow
+    # receiver never holds up job processing
+    app.state.webhooks = asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+    workers = [asyncio.create_task(webhook_worker(app.state.webhooks)) for _ in range(WEBHOOK_WORKERS)]
+    # Jobs run on a fixed pool of workers fed by a bounded queue, which caps how
+    # many are in flight at once instead of piling up unbounded background tasks
+    app.state.jobs = asyncio.Queue(maxsize=MAX_INFLIGHT)
+    job_workers = [asyncio.create_task(job_worker(app.state.jobs)) for _ in range(JOB_WORKERS)]
+    sweeper = asyncio.create_task(job_sweeper())
+    yield
+    sweeper.cancel()
+    for worker in job_workers:
+        worker.cancel()
+    await asyncio.gather(*job_workers, return_exceptions=True)
+    try:
+        # Give queued notifications a moment to go out before shutting down
+        await asyncio.wait_for(app.state.webhooks.join(), timeout=10)
+    except asyncio.TimeoutError:
+        logger.warning("Dropping %s undelivered webhook notifications", app.state.webhooks.qsize())
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    await app.state.http.close()
+    await job_store.close()
+
 # FastAPI app initialization
 app = FastAPI(
     title="Zuke Video Shorts Creator API Gateway",
     description="API gateway for video processing service with n8n integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration
@@ -38,9 +94,53 @@ app.add_middleware(
 
 # Configuration
 PROCESSOR_URL = os.getenv("PROCESSOR_URL", "http://localhost:8001")
+WEBHOOK_QUEUE_SIZE = 10000
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 4))
+WEBHOOK_BATCH_SIZE = 50
+MAX_INFLIGHT = int(os.getenv("MAX_INFLIGHT", 32))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 8))
+# Finished jobs are kept for JOBS_TTL_SEC, and at most JOBS_MAX of them
+JOBS_TTL_SEC = int(os.getenv("JOBS_TTL_SEC", 86400))
+JOBS_MAX = int(os.getenv("JOBS_MAX", 50000))
+JOBS_SWEEP_INTERVAL = 600
+# Jobs still pending or processing after this long are failed as stuck; leaves room
+# for a full queue ahead of them on top of the 30 minute processor timeout
+JOBS_STALE_SEC = int(os.getenv("JOBS_STALE_SEC", 10800))
+PROCESSOR_SPARE_CONNECTIONS = 24
+REMOTE_MISS_TTL = 30  # seconds an unknown job ID is answered with 404 without asking the processor
+REMOTE_MISS_CACHE_SIZE = 10000
+HEALTH_PROBE_CACHE_SECONDS = 2.0
 API_KEY_NAME = os.getenv("API_KEY_HEADER", "X-API-Key")
+# Read once at startup rather than on every authenticated request
+API_KEY = os.getenv("API_KEY")
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
+@functools.lru_cache(maxsize=1)
+def iso_timestamp(second: int) -> str:
+    """UTC ISO timestamp for a whole Unix second, formatted once per second however often it's asked for"""
+    return datetime.fromtimestamp(second, timezone.utc).replace(tzinfo=None).isoformat()
+
+# (monotonic time, result) of the last processor health probe
+_last_probe = (float("-inf"), False)
+
+# Job IDs the processor recently said it doesn't know, with their expiry (monotonic time)
+_remote_missing: "OrderedDict[str, float]" = OrderedDict()
+
+def _recently_missing(job_id: str) -> bool:
+    expires = _remote_missing.get(job_id)
+    if expires is None:
+        return False
+    if expires > time.monotonic():
+        return True
+    del _remote_missing[job_id]
+    return False
+
+def _remember_missing(job_id: str):
+    _remote_missing[job_id] = time.monotonic() + REMOTE_MISS_TTL
+    _remote_missing.move_to_end(job_id)
+    if len(_remote_missing) > REMOTE_MISS_CACHE_SIZE:
+        _remote_missing.popitem(last=False)
+
 # Pydantic models
 class VideoProcessingRequest(BaseModel):
     youtube_url: Optional[HttpUrl] = None
@@ -57,11 +157,28 @@ class JobStatus(BaseModel):
     status: str
     progress: int
     message: str
-    created_at: datetime
+    created_at: float  # Unix time, serialized as an ISO string
     completed_at: Optional[datetime] = None
     output_files: List[Dict[str, Any]] = []
     error_message: Optional[str] = None
 
+    @field_validator("created_at", mode="before")
+    @classmethod
+    def _parse_created_at(cls, value):
+        # Stored documents carry the ISO form written by the serializer below
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if isinstance(value, datetime):
+            return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+        return value
+
+    @field_serializer("created_at")
+    def _serialize_created_at(self, value: float) -> str:
+        return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None).isoformat()
+
+# Fields of VideoProcessingRequest that are forwarded to the processor
+PROCESSOR_REQUEST_FIELDS = {"youtube_url", "video_file_path", "num_clips", "output_types", "auto_approve"}
+
 class ProcessorResponse(BaseModel):
     success: bool
     job_id: str
@@ -70,14 +187,13 @@ class ProcessorResponse(BaseModel):
     error_message: Optional[str] = None
     processing_time: Optional[float] = None
 
-# In-memory job tracking
-jobs: Dict[str, JobStatus] = {}
+# Job tracking, persisted in SQLite so it survives restarts and doesn't grow in memory
+job_store = JobStore(os.getenv("JOBS_DB_PATH", "jobs.db"), JobStatus)
 
 async def get_api_key(api_key: str = Security(api_key_header)):
-    expected_key = os.getenv("API_KEY")
-    if not expected_key:
+    if not API_KEY:
         return True  # No API key configured, allow all requests
-    if api_key == expected_key:
+    if api_key == API_KEY:
         return api_key
     raise HTTPException(status_code=401, detail="Invalid API key")
 
@@ -97,31 +213,364 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    try:
-        # Check processor health
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{PROCESSOR_URL}/health", timeout=5) as response:
+    global _last_probe
+    # Check processor health, at most once per HEALTH_PROBE_CACHE_SECONDS however
+    # often we get probed ourselves
+    probed_at, processor_healthy = _last_probe
+    if time.monotonic() - probed_at >= HEALTH_PROBE_CACHE_SECONDS:
+        try:
+            async with app.state.http.get(f"{PROCESSOR_URL}/health", timeout=aiohttp.ClientTimeout(total=2)) as response:
                 processor_healthy = response.status == 200
-    except Exception:
-        processor_healthy = False
+        except Exception:
+            processor_healthy = False
+        _last_probe = (time.monotonic(), processor_healthy)
     
     return {
         "status": "healthy" if processor_healthy else "degraded",
         "processor_healthy": processor_healthy,
         "processor_url": PROCESSOR_URL,
-        "timestamp": datetime.utcnow().isoformat(),
-        "active_jobs": len([j for j in jobs.values() if j.status in ["pending", "processing"]])
+        "timestamp": iso_timestamp(int(time.time())),
+        "active_jobs": await job_store.count(["pending", "processing"])
     }
 
 @app.post("/process")
 async def process_video(
     request: VideoProcessingRequest,
-    background_tasks: BackgroundTasks,
     api_key: str = Depends(get_api_key)
 ):
     """
     Process a video to generate YouTube Shorts
     Routes request to processor service and handles response
     """
+    logger.info("Request: %r", request)
+    return await _enqueue_job(request, app.state.jobs)
+
+@app.get("/status/{job_id}")
+async def get_job_status(job_id: str, api_key: str = Depends(get_api_key)):
+    """
+    Get the status of a processing job
+    """
+    # Status polls are the hot path: hand back the stored JSON as-is rather than
+    # rebuilding and re-serializing the Pydantic model on every request
+    data = await job_store.get_json(job_id)
+    if data is None:
+        # Unknown IDs that the processor just turned down don't cost another round trip
+        if _recently_missing(job_id):
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        # Check if job exists in processor
+        try:
+            async with app.state.http.get(f"{PROCESSOR_URL}/status/{job_id}") as response:
+                if response.status == 404:
+                    _remember_missing(job_id)
+                elif response.status == 200:
+                    processor_status = orjson.loads(await response.read())
+                    # Returned as a response object so FastAPI skips jsonable_encoder
+                    return ORJSONResponse({
+                        "job_id": job_id,
+                        "status": processor_status["status"],
+                        "progress": processor_status["progress"],
+                        "message": processor_status["message"],
+                        "output_files": processor_status.get("output_files", []),
+                        "error_message": processor_status.get("error_message")
+                    })
+        except Exception as e:
+            logger.error("Error checking processor status: %s", e)
+        
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return Response(content=data, media_type="application/json")
+
+@app.get("/jobs")
+async def list_jobs(
+    status: Optional[str] = None,
+    limit: int = 100,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    List all jobs with optional filtering
+    """
+    # Newest first, sorted and filtered by the store's indexes
+    rows, total = await job_store.list_json(status, limit)
+    
+    return Response(
+        content=f'{{"jobs":[{",".join(rows)}],"total":{total}}}',
+        media_type="application/json"
+    )
+
+# n8n webhook endpoint
+@app.post("/webhook/n8n")
+async def n8n_webhook(
+    request: VideoProcessingRequest
+):
+    """
+    Special endpoint for n8n integration with simplified authentication
+    """
+    logger.info("n8n webhook received: %r", request)
+    return await _enqueue_job(request, app.state.jobs)
+
+async def _enqueue_job(request: VideoProcessingRequest, job_queue: asyncio.Queue) -> dict:
+    """
+    Create a pending job for the request and hand it to the worker pool.
+    Shared by /process and the n8n webhook.
+    """
     # Generate job ID
-    job_id = request.job_id or str(uuid.uuid4())\n    \n    # Create job status\n    job_status = JobStatus(\n        job_id=job_id,\n        status=\"pending\",\n        progress=0,\n        message=\"Job queued for processing\",\n        created_at=datetime.utcnow()\n    )\n    jobs[job_id] = job_status\n    \n    logger.info(f\"Job {job_id} queued for processing\")\n    logger.info(f\"Request: {request}\")\n    \n    # Process in background\n    background_tasks.add_task(\n        process_video_background,\n        job_id,\n        request\n    )\n    \n    return {\n        \"job_id\": job_id,\n        \"status\": \"pending\",\n        \"message\": \"Job queued successfully\"\n    }\n\n@app.get(\"/status/{job_id}\")\nasync def get_job_status(job_id: str, api_key: str = Depends(get_api_key)):\n    \"\"\"\n    Get the status of a processing job\n    \"\"\"\n    if job_id not in jobs:\n        # Check if job exists in processor\n        try:\n            async with aiohttp.ClientSession() as session:\n                async with session.get(f\"{PROCESSOR_URL}/status/{job_id}\") as response:\n                    if response.status == 200:\n                        processor_status = await response.json()\n                        return {\n                            \"job_id\": job_id,\n                            \"status\": processor_status[\"status\"],\n                            \"progress\": processor_status[\"progress\"],\n                            \"message\": processor_status[\"message\"],\n                            \"output_files\": processor_status.get(\"output_files\", []),\n                            \"error_message\": processor_status.get(\"error_message\")\n                        }\n        except Exception as e:\n            logger.error(f\"Error checking processor status: {e}\")\n        \n        raise HTTPException(status_code=404, detail=\"Job not found\")\n    \n    return jobs[job_id]\n\n@app.get(\"/jobs\")\nasync def list_jobs(\n    status: Optional[str] = None,\n    limit: int = 100,\n    api_key: str = Depends(get_api_key)\n):\n    \"\"\"\n    List all jobs with optional filtering\n    \"\"\"\n    filtered_jobs = list(jobs.values())\n    \n    if status:\n        filtered_jobs = [j for j in filtered_jobs if j.status == status]\n    \n    # Sort by creation time (newest first)\n    filtered_jobs.sort(key=lambda x: x.created_at, reverse=True)\n    \n    return {\n        \"jobs\": filtered_jobs[:limit],\n        \"total\": len(filtered_jobs)\n    }\n\n# n8n webhook endpoint\n@app.post(\"/webhook/n8n\")\nasync def n8n_webhook(\n    request: VideoProcessingRequest,\n    background_tasks: BackgroundTasks\n):\n    \"\"\"\n    Special endpoint for n8n integration with simplified authentication\n    \"\"\"\n    logger.info(f\"n8n webhook received: {request}\")\n    return await process_video(request, background_tasks, api_key=None)\n\nasync def process_video_background(job_id: str, request: VideoProcessingRequest):\n    \"\"\"\n    Background task to communicate with processor service\n    \"\"\"\n    try:\n        job = jobs[job_id]\n        job.status = \"processing\"\n        job.progress = 5\n        job.message = \"Sending request to video processor...\"\n        \n        # Prepare request for processor\n        processor_request = {\n            \"youtube_url\": str(request.youtube_url) if request.youtube_url else None,\n            \"video_file_path\": request.video_file_path,\n            \"num_clips\": request.num_clips,\n            \"output_types\": request.output_types,\n            \"auto_approve\": request.auto_approve,\n            \"job_id\": job_id\n        }\n        \n        # Remove None values\n        processor_request = {k: v for k, v in processor_request.items() if v is not None}\n        \n        logger.info(f\"Sending to processor: {processor_request}\")\n        \n        # Send request to processor\n        async with aiohttp.ClientSession() as session:\n            async with session.post(\n                f\"{PROCESSOR_URL}/process/sync\",\n                json=processor_request,\n                timeout=aiohttp.ClientTimeout(total=1800)  # 30 minute timeout\n            ) as response:\n                \n                if response.status == 200:\n                    result = await response.json()\n                    logger.info(f\"Processor response: {result}\")\n                    \n                    if result[\"success\"]:\n                        # Update job with successful result\n                        job.status = \"completed\"\n                        job.progress = 100\n                        job.message = \"Processing completed successfully\"\n                        job.completed_at = datetime.utcnow()\n                        job.output_files = result.get(\"output_files\", [])\n                        \n                        # Send webhook notification if configured\n                        if request.webhook_url:\n                            await send_webhook_notification(request.webhook_url, job)\n                        \n                        logger.info(f\"Job {job_id} completed successfully\")\n                    else:\n                        # Handle processor error\n                        job.status = \"failed\"\n                        job.progress = 0\n                        job.message = \"Processing failed\"\n                        job.error_message = result.get(\"error_message\", \"Unknown error\")\n                        job.completed_at = datetime.utcnow()\n                        \n                        logger.error(f\"Processor failed for job {job_id}: {job.error_message}\")\n                else:\n                    # Handle HTTP error\n                    error_text = await response.text()\n                    job.status = \"failed\"\n                    job.progress = 0\n                    job.message = \"Processor service error\"\n                    job.error_message = f\"HTTP {response.status}: {error_text}\"\n                    job.completed_at = datetime.utcnow()\n                    \n                    logger.error(f\"Processor HTTP error for job {job_id}: {job.error_message}\")\n        \n    except asyncio.TimeoutError:\n        job = jobs[job_id]\n        job.status = \"failed\"\n        job.progress = 0\n        job.message = \"Processing timeout\"\n        job.error_message = \"Processing took too long and timed out\"\n        job.completed_at = datetime.utcnow()\n        \n        logger.error(f\"Job {job_id} timed out\")\n        \n    except Exception as e:\n        job = jobs[job_id]\n        job.status = \"failed\"\n        job.progress = 0\n        job.message = \"Processing failed\"\n        job.error_message = str(e)\n        job.completed_at = datetime.utcnow()\n        \n        logger.error(f\"Job {job_id} failed: {str(e)}\")\n        \n        # Send webhook notification for failure\n        if request.webhook_url:\n            await send_webhook_notification(request.webhook_url, job)\n\nasync def send_webhook_notification(webhook_url: str, job: JobStatus):\n    \"\"\"\n    Send webhook notification to external service (like n8n)\n    \"\"\"\n    try:\n        payload = {\n            \"job_id\": job.job_id,\n            \"status\": job.status,\n            \"progress\": job.progress,\n            \"message\": job.message,\n            \"output_files\": job.output_files,\n            \"error_message\": job.error_message\n        }\n        \n        async with aiohttp.ClientSession() as session:\n            async with session.post(\n                str(webhook_url),\n                json=payload,\n                headers={\"Content-Type\": \"application/json\"}\n            ) as response:\n                if response.status == 200:\n                    logger.info(f\"Webhook notification sent successfully for job {job.job_id}\")\n                else:\n                    logger.error(f\"Failed to send webhook notification: {response.status}\")\n                    \n    except Exception as e:\n        logger.error(f\"Error sending webhook notification: {str(e)}\")\n\n# Direct processor endpoints (for debugging)\n@app.get(\"/processor/health\")\nasync def processor_health():\n    \"\"\"Check processor service health\"\"\"\n    try:\n        async with aiohttp.ClientSession() as session:\n            async with session.get(f\"{PROCESSOR_URL}/health\") as response:\n                result = await response.json()\n                return result\n    except Exception as e:\n        raise HTTPException(status_code=503, detail=f\"Processor service unavailable: {str(e)}\")\n\nif __name__ == \"__main__\":\n    import uvicorn\n    \n    port = int(os.getenv(\"API_PORT\", 8000))\n    host = \"0.0.0.0\"\n    \n    logger.info(f\"Starting API Gateway on {host}:{port}\")\n    logger.info(f\"Processor URL: {PROCESSOR_URL}\")\n    \n    uvicorn.run(app, host=host, port=port)
\ No newline at end of file
+    job_id = request.job_id or str(uuid.uuid4())
+    
+    # Create job status
+    job_status = JobStatus(
+        job_id=job_id,
+        status="pending",
+        progress=0,
+        message="Job queued for processing",
+        created_at=time.time()
+    )
+    await job_store.save(job_status)
+    
+    # Hand the job to the worker pool, failing it with a 503 if the queue is full
+    try:
+        job_queue.put_nowait((job_id, request))
+    except asyncio.QueueFull:
+        job_status.status = "failed"
+        job_status.message = "Server busy"
+        job_status.error_message = "Too many jobs in flight, try again later"
+        job_status.completed_at = datetime.utcnow()
+        await job_store.save(job_status)
+        raise HTTPException(status_code=503, detail="Too many jobs in flight, try again later")
+    
+    logger.info("Job %s queued for processing", job_id)
+    
+    return {
+        "job_id": job_id,
+        "status": "pending",
+        "message": "Job queued successfully"
+    }
+
+async def job_sweeper():
+    """
+    Periodically purge old finished jobs so the job store doesn't grow forever
+    """
+    while True:
+        await asyncio.sleep(JOBS_SWEEP_INTERVAL)
+        try:
+            removed = await job_store.purge(JOBS_TTL_SEC, JOBS_MAX, JOBS_STALE_SEC)
+            logger.info(
+                "Purged %s finished jobs (%s active, %s stored)",
+                removed, await job_store.count(["pending", "processing"]), await job_store.count()
+            )
+        except Exception:
+            logger.exception("Job purge failed")
+
+async def job_worker(queue: asyncio.Queue):
+    """
+    Run queued jobs one at a time, for as long as the service is up
+    """
+    while True:
+        job_id, request = await queue.get()
+        try:
+            await process_video_background(job_id, request)
+        except asyncio.CancelledError:
+            # Shutting down mid-job: record it rather than leave the row in processing
+            await mark_interrupted(job_id)
+            raise
+        except Exception:
+            logger.exception("Unhandled error processing job %s", job_id)
+        finally:
+            queue.task_done()
+
+async def mark_interrupted(job_id: str):
+    """
+    Fail a job cut short by shutdown, unless it already finished
+    """
+    try:
+        job = await job_store.get(job_id)
+        if job is not None and job.status in ("pending", "processing"):
+            job.status = "failed"
+            job.message = "Interrupted by shutdown"
+            job.error_message = "The service shut down while the job was running"
+            job.completed_at = datetime.utcnow()
+            await job_store.save(job)
+    except Exception:
+        logger.exception("Could not mark job %s as interrupted", job_id)
+
+async def process_video_background(job_id: str, request: VideoProcessingRequest):
+    """
+    Background task to communicate with processor service
+    """
+    job = await job_store.get(job_id)
+    try:
+        job.status = "processing"
+        job.progress = 5
+        job.message = "Sending request to video processor..."
+        await job_store.save(job)
+        
+        # Prepare request for processor (None values dropped, URLs as strings)
+        processor_request = request.model_dump(
+            mode="json",
+            exclude_none=True,
+            include=PROCESSOR_REQUEST_FIELDS
+        ) | {"job_id": job_id}
+        
+        logger.info("Sending to processor: %s", processor_request)
+        
+        # Send request to processor
+        async with app.state.http.post(
+            f"{PROCESSOR_URL}/process/sync",
+            json=processor_request,
+            timeout=aiohttp.ClientTimeout(total=1800)  # 30 minute timeout
+        ) as response:
+            
+            if response.status == 200:
+                result = orjson.loads(await response.read())
+                logger.debug("Processor response: %s", result)
+                
+                if result["success"]:
+                    # Update job with successful result
+                    job.status = "completed"
+                    job.progress = 100
+                    job.message = "Processing completed successfully"
+                    job.completed_at = datetime.utcnow()
+                    job.output_files = result.get("output_files", [])
+                    await job_store.save(job)
+                    
+                    # Send webhook notification if configured
+                    if request.webhook_url:
+                        queue_webhook_notification(request.webhook_url, job)
+                    
+                    logger.info("Job %s completed successfully", job_id)
+                else:
+                    # Handle processor error
+                    job.status = "failed"
+                    job.progress = 0
+                    job.message = "Processing failed"
+                    job.error_message = result.get("error_message", "Unknown error")
+                    job.completed_at = datetime.utcnow()
+                    await job_store.save(job)
+                    
+                    logger.error("Processor failed for job %s: %s", job_id, job.error_message)
+            else:
+                # Handle HTTP error
+                error_text = await response.text()
+                job.status = "failed"
+                job.progress = 0
+                job.message = "Processor service error"
+                job.error_message = f"HTTP {response.status}: {error_text}"
+                job.completed_at = datetime.utcnow()
+                await job_store.save(job)
+                
+                logger.error("Processor HTTP error for job %s: %s", job_id, job.error_message)
+        
+    except asyncio.TimeoutError:
+        job.status = "failed"
+        job.progress = 0
+        job.message = "Processing timeout"
+        job.error_message = "Processing took too long and timed out"
+        job.completed_at = datetime.utcnow()
+        await job_store.save(job)
+        
+        logger.error("Job %s timed out", job_id)
+        
+    except Exception as e:
+        job.status = "failed"
+        job.progress = 0
+        job.message = "Processing failed"
+        job.error_message = str(e)
+        job.completed_at = datetime.utcnow()
+        await job_store.save(job)
+        
+        logger.error("Job %s failed: %s", job_id, e)
+        
+        # Send webhook notification for failure
+        if request.webhook_url:
+            queue_webhook_notification(request.webhook_url, job)
+
+def queue_webhook_notification(webhook_url: str, job: JobStatus):
+    """
+    Queue a webhook notification for the webhook workers, snapshotting the job as it is now
+    """
+    payload = {
+        "job_id": job.job_id,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "output_files": job.output_files,
+        "error_message": job.error_message
+    }
+    try:
+        app.state.webhooks.put_nowait((str(webhook_url), payload))
+    except asyncio.QueueFull:
+        logger.error("Webhook queue full, dropping notification for job %s", job.job_id)
+
+async def webhook_worker(queue: asyncio.Queue):
+    """
+    Send queued webhook notifications, taking whatever has piled up (up to
+    WEBHOOK_BATCH_SIZE) and posting it concurrently over the shared session
+    """
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < WEBHOOK_BATCH_SIZE:
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        try:
+            await asyncio.gather(*(send_webhook_notification(url, payload) for url, payload in batch))
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+async def send_webhook_notification(webhook_url: str, payload: Dict[str, Any]):
+    """
+    Send webhook notification to external service (like n8n)
+    """
+    try:
+        async with app.state.http.post(
+            webhook_url,
+            data=orjson.dumps(payload),
+            headers={"Content-Type": "application/json"}
+        ) as response:
+            if response.status == 200:
+                logger.info("Webhook notification sent successfully for job %s", payload['job_id'])
+            else:
+                logger.error("Failed to send webhook notification: %s", response.status)
+                    
+    except Exception as e:
+        logger.error("Error sending webhook notification: %s", e)
+
+# Direct processor endpoints (for debugging)
+@app.get("/processor/health")
+async def processor_health():
+    """Check processor service health"""
+    try:
+        async with app.state.http.get(f"{PROCESSOR_URL}/health") as response:
+            return orjson.loads(await response.read())
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Processor service unavailable: {str(e)}")
+
+if __name__ == "__main__":
+    import uvicorn
+    
+    port = int(os.getenv("API_PORT", 8000))
+    host = "0.0.0.0"
+    
+    logger.info("Starting API Gateway on %s:%s", host, port)
+    logger.info("Processor URL: %s", PROCESSOR_URL)
+    
+    # Fail the previous run's unfinished jobs once here, not in each worker's startup,
+    # where it would also fail jobs that already-running sibling workers have taken on
+    asyncio.run(job_store.recover_interrupted())
+    
+    # uvloop + httptools for a faster event loop and C HTTP parsing; several
+    # workers so Pydantic work isn't serialized on one core (job state lives in
+    # SQLite, so it's shared between them). Multiple workers need an import string.
+    uvicorn.run(
+        "gateway:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=host,
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("API_WORKERS", 4)),
+        backlog=2048,
+        timeout_keep_alive=75
+    )
@@ -0,0 +1,204 @@
+"""
+SQLite-backed job status store shared by the API services.
+Jobs survive restarts, and status lookups and listings are indexed queries
+instead of scans over an ever-growing in-memory dict. Per-status job counts are
+kept up to date by triggers, so counting active jobs is a lookup rather than a scan.
+"""
+
+from typing import Optional, List, Tuple, Type, Iterable
+from datetime import datetime, timezone
+import time
+import logging
+from pydantic import BaseModel
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    completed_at REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at DESC);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at DESC);
+
+CREATE TABLE IF NOT EXISTS job_counts (
+    status TEXT PRIMARY KEY,
+    n INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS jobs_count_insert AFTER INSERT ON jobs BEGIN
+    INSERT INTO job_counts (status, n) VALUES (NEW.status, 1)
+    ON CONFLICT(status) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_count_update AFTER UPDATE OF status ON jobs
+WHEN OLD.status != NEW.status BEGIN
+    UPDATE job_counts SET n = n - 1 WHERE status = OLD.status;
+    INSERT INTO job_counts (status, n) VALUES (NEW.status, 1)
+    ON CONFLICT(status) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_count_delete AFTER DELETE ON jobs BEGIN
+    UPDATE job_counts SET n = n - 1 WHERE status = OLD.status;
+END;
+"""
+
+# Jobs in these statuses are never deleted (purge() fails them once they are too old)
+ACTIVE_STATUSES = ("pending", "processing")
+
+# Rebuilds the counts from the jobs table, for databases written before the triggers existed
+RECOUNT = """
+BEGIN IMMEDIATE;
+DELETE FROM job_counts;
+INSERT INTO job_counts (status, n) SELECT status, COUNT(*) FROM jobs GROUP BY status;
+COMMIT;
+"""
+
+# Marks active jobs failed, in the indexed columns and in the stored document alike
+FAIL_ACTIVE = f"""
+UPDATE jobs SET status = 'failed', completed_at = :now,
+    data = json_set(data, '$.status', 'failed', '$.message', :message,
+                    '$.error_message', :message, '$.completed_at', :now_iso)
+WHERE status IN ({', '.join(f"'{s}'" for s in ACTIVE_STATUSES)})
+"""
+
+def _utc_timestamp(value) -> float:
+    # The services record completed_at as naive UTC
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+class JobStore:
+    """
+    Persists job models (any Pydantic model with job_id, status, created_at as Unix
+    time and completed_at as a datetime) as JSON rows, with status and timestamps in
+    indexed columns.
+    Call open() on startup and close() on shutdown. Workers share the database, so
+    jobs left pending or processing by the previous run are failed separately, by
+    recover_interrupted() run once before the workers start.
+    """
+
+    def __init__(self, path: str, model: Type[BaseModel]):
+        self.path = path
+        self.model = model
+        self._db: Optional[aiosqlite.Connection] = None
+
+    async def open(self):
+        self._db = await aiosqlite.connect(self.path)
+        # WAL lets status reads proceed while a job update is being written
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        await self._db.execute("PRAGMA synchronous=NORMAL")
+        await self._db.executescript(SCHEMA)
+        await self._db.commit()
+        await self._db.executescript(RECOUNT)
+
+    async def recover_interrupted(self) -> int:
+        """
+        Open the store, fail the jobs the previous run left pending or processing,
+        and close it again; returns how many. The job queues live in memory, so
+        nothing will ever pick those jobs up. Run this once per service start,
+        before any worker opens the store, as the jobs of running workers would be
+        failed too.
+        """
+        await self.open()
+        try:
+            interrupted = await self._fail_active("Interrupted by restart")
+        finally:
+            await self.close()
+        if interrupted:
+            logger.warning("Marked %s unfinished jobs as failed (interrupted by restart)", interrupted)
+        return interrupted
+
+    async def close(self):
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    async def save(self, job: BaseModel):
+        """Insert or update a job"""
+        await self._db.execute(
+            "INSERT INTO jobs (job_id, status, created_at, completed_at, data) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(job_id) DO UPDATE SET status=excluded.status, completed_at=excluded.completed_at, "
+            "data=excluded.data",
+            (
+                job.job_id,
+                job.status,
+                job.created_at,
+                _utc_timestamp(job.completed_at) if job.completed_at else None,
+                job.model_dump_json(),
+            )
+        )
+        await self._db.commit()
+
+    async def _fail_active(self, message: str, created_before: Optional[float] = None) -> int:
+        """
+        Mark active jobs (only those created before created_before, if given) as failed
+        with the given message; returns how many
+        """
+        now = datetime.now(timezone.utc)
+        cursor = await self._db.execute(
+            FAIL_ACTIVE + ("" if created_before is None else " AND created_at < :before"),
+            {"now": now.timestamp(), "now_iso": now.replace(tzinfo=None).isoformat(),
+             "message": message, "before": created_before}
+        )
+        await self._db.commit()
+        return cursor.rowcount
+
+    async def get(self, job_id: str) -> Optional[BaseModel]:
+        data = await self.get_json(job_id)
+        return self.model.model_validate_json(data) if data else None
+
+    async def get_json(self, job_id: str) -> Optional[str]:
+        """The job's stored JSON document, as written by save(); no model is built"""
+        async with self._db.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def list_json(self, status: Optional[str] = None, limit: int = 100) -> Tuple[List[str], int]:
+        """
+        JSON documents of the newest jobs first (optionally with the given status),
+        plus the total number of matches
+        """
+        where, params = ("WHERE status = ?", (status,)) if status else ("", ())
+        async with self._db.execute(
+            f"SELECT data FROM jobs {where} ORDER BY created_at DESC LIMIT ?", (*params, limit)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        total = await self.count([status] if status else None)
+        return [row[0] for row in rows], total
+
+    async def count(self, statuses: Optional[Iterable[str]] = None) -> int:
+        """Number of jobs in any of the given statuses (all jobs if None), read from the maintained counts"""
+        where, params = "", []
+        if statuses is not None:
+            params = list(statuses)
+            where = f"WHERE status IN ({', '.join('?' * len(params))})"
+        async with self._db.execute(f"SELECT COALESCE(SUM(n), 0) FROM job_counts {where}", params) as cursor:
+            (count,) = await cursor.fetchone()
+        return count
+
+    async def purge(self, max_age: float, max_jobs: int, max_active_age: Optional[float] = None) -> int:
+        """
+        Delete finished jobs that completed more than max_age seconds ago, then the
+        oldest finished jobs beyond max_jobs. Active jobs are kept, except that those
+        created more than max_active_age seconds ago are failed as stuck, so they are
+        deleted like any other finished job later on.
+        Returns the number of jobs deleted.
+        """
+        if max_active_age is not None:
+            stuck = await self._fail_active("Timed out", created_before=time.time() - max_active_age)
+            if stuck:
+                logger.warning("Marked %s stuck jobs as failed (older than %ss)", stuck, max_active_age)
+        finished = f"status NOT IN ({', '.join('?' * len(ACTIVE_STATUSES))})"
+        cursor = await self._db.execute(
+            f"DELETE FROM jobs WHERE {finished} AND COALESCE(completed_at, created_at) < ?",
+            (*ACTIVE_STATUSES, time.time() - max_age)
+        )
+        removed = cursor.rowcount
+        cursor = await self._db.execute(
+            f"DELETE FROM jobs WHERE job_id IN "
+            f"(SELECT job_id FROM jobs WHERE {finished} ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (*ACTIVE_STATUSES, max_jobs)
+        )
+        removed += cursor.rowcount
+        await self._db.commit()
+        return removed
@@ -1,23 +1,62 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Security
+from fastapi import FastAPI, HTTPException, Depends, Security, Header
 from fastapi.security.api_key import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, HttpUrl, field_serializer, field_validator
 from typing import Optional, List, Dict, Any
 import uuid
 import os
 import asyncio
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+import functools
+import hmac
+import time
 import logging
+import aiohttp
+import orjson
+from job_store import JobStore
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_store.open()
+    # Webhooks go through a bounded queue drained by a few workers sharing one
+    # HTTP session, so a slow receiver never holds up job processing
+    app.state.http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60, connect=10))
+    app.state.webhooks = asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+    workers = [asyncio.create_task(webhook_worker(app.state.webhooks)) for _ in range(WEBHOOK_WORKERS)]
+    # Jobs run on a fixed pool of workers fed by a bounded queue, which caps how
+    # many are in flight at once instead of piling up unbounded background tasks
+    app.state.jobs = asyncio.Queue(maxsize=MAX_INFLIGHT)
+    job_workers = [asyncio.create_task(job_worker(app.state.jobs)) for _ in range(JOB_WORKERS)]
+    sweeper = asyncio.create_task(job_sweeper())
+    yield
+    sweeper.cancel()
+    for worker in job_workers:
+        worker.cancel()
+    await asyncio.gather(*job_workers, return_exceptions=True)
+    try:
+        # Give queued notifications a moment to go out before shutting down
+        await asyncio.wait_for(app.state.webhooks.join(), timeout=10)
+    except asyncio.TimeoutError:
+        logger.warning("Dropping %s undelivered webhook notifications", app.state.webhooks.qsize())
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    await app.state.http.close()
+    await job_store.close()
+
 # FastAPI app initialization
 app = FastAPI(
     title="Zuke Video Shorts Creator API",
     description="AI-powered YouTube Shorts generator with Azure integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration
@@ -29,18 +68,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Webhook delivery
+WEBHOOK_QUEUE_SIZE = 10000
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 4))
+WEBHOOK_BATCH_SIZE = 50
+MAX_INFLIGHT = int(os.getenv("MAX_INFLIGHT", 32))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 8))
+# Finished jobs are kept for JOBS_TTL_SEC, and at most JOBS_MAX of them
+JOBS_TTL_SEC = int(os.getenv("JOBS_TTL_SEC", 86400))
+JOBS_MAX = int(os.getenv("JOBS_MAX", 50000))
+JOBS_SWEEP_INTERVAL = 600
+# Jobs still pending or processing after this long are failed as stuck; leaves room
+# for a full queue ahead of them on top of the 30 minute processor timeout
+JOBS_STALE_SEC = int(os.getenv("JOBS_STALE_SEC", 10800))
+
 # API Key authentication
 API_KEY_NAME = os.getenv("API_KEY_HEADER", "X-API-Key")
+# Read once at startup rather than on every authenticated request
+API_KEY = os.getenv("API_KEY")
+# n8n sends this in the WEBHOOK_SECRET_HEADER header when configured
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_SECRET_HEADER = os.getenv("WEBHOOK_SECRET_HEADER", "X-Webhook-Secret")
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
 async def get_api_key(api_key: str = Security(api_key_header)):
-    expected_key = os.getenv("API_KEY")
-    if not expected_key:
+    if not API_KEY:
         return True  # No API key configured, allow all requests
-    if api_key == expected_key:
+    if api_key == API_KEY:
         return api_key
     raise HTTPException(status_code=401, detail="Invalid API key")
 
+@functools.lru_cache(maxsize=1)
+def iso_timestamp(second: int) -> str:
+    """UTC ISO timestamp for a whole Unix second, formatted once per second however often it's asked for"""
+    return datetime.fromtimestamp(second, timezone.utc).replace(tzinfo=None).isoformat()
+
 # Pydantic models
 class VideoProcessingRequest(BaseModel):
     youtube_url: Optional[HttpUrl] = None
@@ -56,21 +118,27 @@ class JobStatus(BaseModel):
     status: str  # pending, processing, completed, failed
     progress: int  # 0-100
     message: str
-    created_at: datetime
+    created_at: float  # Unix time, serialized as an ISO string
     completed_at: Optional[datetime] = None
     output_urls: List[str] = []
     error_message: Optional[str] = None
 
-class WebhookPayload(BaseModel):
-    job_id: str
-    status: str
-    progress: int
-    message: str
-    output_urls: List[str] = []
-    error_message: Optional[str] = None
+    @field_validator("created_at", mode="before")
+    @classmethod
+    def _parse_created_at(cls, value):
+        # Stored documents carry the ISO form written by the serializer below
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if isinstance(value, datetime):
+            return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+        return value
+
+    @field_serializer("created_at")
+    def _serialize_created_at(self, value: float) -> str:
+        return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None).isoformat()
 
-# In-memory job storage (replace with database in production)
-jobs: Dict[str, JobStatus] = {}
+# Job storage, persisted in SQLite so it survives restarts and doesn't grow in memory
+job_store = JobStore(os.getenv("JOBS_DB_PATH", "jobs.db"), JobStatus)
 
 # Routes
 @app.get("/")
@@ -90,63 +158,32 @@ async def root():
 async def health_check():
     return {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
-        "active_jobs": len([j for j in jobs.values() if j.status in ["pending", "processing"]])
+        "timestamp": iso_timestamp(int(time.time())),
+        "active_jobs": await job_store.count(["pending", "processing"])
     }
 
 @app.post("/process")
 async def process_video(
     request: VideoProcessingRequest,
-    background_tasks: BackgroundTasks,
     api_key: str = Depends(get_api_key)
 ):
     """
     Process a video to generate YouTube Shorts
     """
-    # Validate input
-    if not request.youtube_url and not request.video_file_url:
-        raise HTTPException(
-            status_code=400,
-            detail="Either youtube_url or video_file_url must be provided"
-        )
-    
-    # Generate job ID
-    job_id = request.job_id or str(uuid.uuid4())
-    
-    # Create job status
-    job_status = JobStatus(
-        job_id=job_id,
-        status="pending",
-        progress=0,
-        message="Job queued for processing",
-        created_at=datetime.utcnow()
-    )
-    jobs[job_id] = job_status
-    
-    # Add job to background processing queue
-    background_tasks.add_task(
-        process_video_background,
-        job_id,
-        request
-    )
-    
-    logger.info(f"Job {job_id} queued for processing")
-    
-    return {
-        "job_id": job_id,
-        "status": "pending",
-        "message": "Job queued successfully"
-    }
+    return await _enqueue_job(request, app.state.jobs)
 
 @app.get("/status/{job_id}")
 async def get_job_status(job_id: str, api_key: str = Depends(get_api_key)):
     """
     Get the status of a processing job
     """
-    if job_id not in jobs:
+    # Status polls are the hot path: hand back the stored JSON as-is rather than
+    # rebuilding and re-serializing the Pydantic model on every request
+    data = await job_store.get_json(job_id)
+    if data is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return jobs[job_id]
+    return Response(content=data, media_type="application/json")
 
 @app.get("/jobs")
 async def list_jobs(
@@ -157,28 +194,23 @@ async def list_jobs(
     """
     List all jobs with optional filtering
     """
-    filtered_jobs = list(jobs.values())
+    # Newest first, sorted and filtered by the store's indexes
+    rows, total = await job_store.list_json(status, limit)
     
-    if status:
-        filtered_jobs = [j for j in filtered_jobs if j.status == status]
-    
-    # Sort by creation time (newest first)
-    filtered_jobs.sort(key=lambda x: x.created_at, reverse=True)
-    
-    return {
-        "jobs": filtered_jobs[:limit],
-        "total": len(filtered_jobs)
-    }
+    return Response(
+        content=f'{{"jobs":[{",".join(rows)}],"total":{total}}}',
+        media_type="application/json"
+    )
 
 @app.delete("/jobs/{job_id}")
 async def cancel_job(job_id: str, api_key: str = Depends(get_api_key)):
     """
     Cancel a processing job
     """
-    if job_id not in jobs:
+    job = await job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs[job_id]
     if job.status in ["completed", "failed"]:
         raise HTTPException(
             status_code=400,
@@ -187,6 +219,7 @@ async def cancel_job(job_id: str, api_key: str = Depends(get_api_key)):
     
     job.status = "cancelled"
     job.message = "Job cancelled by user"
+    await job_store.save(job)
     
     return {"message": f"Job {job_id} cancelled successfully"}
 
@@ -194,106 +227,185 @@ async def cancel_job(job_id: str, api_key: str = Depends(get_api_key)):
 @app.post("/webhook/n8n")
 async def n8n_webhook(
     request: VideoProcessingRequest,
-    background_tasks: BackgroundTasks
+    webhook_secret: Optional[str] = Header(None, alias=WEBHOOK_SECRET_HEADER)
 ):
     """
     Special endpoint for n8n integration with simplified authentication
     """
-    # Validate webhook secret if configured
-    webhook_secret = os.getenv("WEBHOOK_SECRET")
-    # In a real implementation, you'd validate the webhook secret from headers
+    # Validate webhook secret if configured (constant-time comparison)
+    if WEBHOOK_SECRET and not hmac.compare_digest(
+        (webhook_secret or "").encode(), WEBHOOK_SECRET.encode()
+    ):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    
+    return await _enqueue_job(request, app.state.jobs)
+
+async def _enqueue_job(request: VideoProcessingRequest, job_queue: asyncio.Queue) -> dict:
+    """
+    Create a pending job for the request and hand it to the worker pool.
+    Shared by /process and the n8n webhook.
+    """
+    # Validate input
+    if not request.youtube_url and not request.video_file_url:
+        raise HTTPException(
+            status_code=400,
+            detail="Either youtube_url or video_file_url must be provided"
+        )
+    
+    # Generate job ID
+    job_id = request.job_id or str(uuid.uuid4())
     
-    return await process_video(request, background_tasks, api_key=None)
+    # Create job status
+    job_status = JobStatus(
+        job_id=job_id,
+        status="pending",
+        progress=0,
+        message="Job queued for processing",
+        created_at=time.time()
+    )
+    await job_store.save(job_status)
+    
+    # Hand the job to the worker pool, failing it with a 503 if the queue is full
+    try:
+        job_queue.put_nowait((job_id, request))
+    except asyncio.QueueFull:
+        job_status.status = "failed"
+        job_status.message = "Server busy"
+        job_status.error_message = "Too many jobs in flight, try again later"
+        job_status.completed_at = datetime.utcnow()
+        await job_store.save(job_status)
+        raise HTTPException(status_code=503, detail="Too many jobs in flight, try again later")
+    
+    logger.info("Job %s queued for processing", job_id)
+    
+    return {
+        "job_id": job_id,
+        "status": "pending",
+        "message": "Job queued successfully"
+    }
+
+async def job_sweeper():
+    """
+    Periodically purge old finished jobs so the job store doesn't grow forever
+    """
+    while True:
+        await asyncio.sleep(JOBS_SWEEP_INTERVAL)
+        try:
+            removed = await job_store.purge(JOBS_TTL_SEC, JOBS_MAX, JOBS_STALE_SEC)
+            logger.info(
+                "Purged %s finished jobs (%s active, %s stored)",
+                removed, await job_store.count(["pending", "processing"]), await job_store.count()
+            )
+        except Exception:
+            logger.exception("Job purge failed")
+
+async def job_worker(queue: asyncio.Queue):
+    """
+    Run queued jobs one at a time, for as long as the service is up
+    """
+    while True:
+        job_id, request = await queue.get()
+        try:
+            await process_video_background(job_id, request)
+        except asyncio.CancelledError:
+            # Shutting down mid-job: record it rather than leave the row in processing
+            await mark_interrupted(job_id)
+            raise
+        except Exception:
+            logger.exception("Unhandled error processing job %s", job_id)
+        finally:
+            queue.task_done()
+
+async def mark_interrupted(job_id: str):
+    """
+    Fail a job cut short by shutdown, unless it already finished
+    """
+    try:
+        job = await job_store.get(job_id)
+        if job is not None and job.status in ("pending", "processing"):
+            job.status = "failed"
+            job.message = "Interrupted by shutdown"
+            job.error_message = "The service shut down while the job was running"
+            job.completed_at = datetime.utcnow()
+            await job_store.save(job)
+    except Exception:
+        logger.exception("Could not mark job %s as interrupted", job_id)
 
 async def process_video_background(job_id: str, request: VideoProcessingRequest):
     """
-    Background task to process video
+    Background task for a queued job.
+    This service has no video pipeline of its own (the gateway forwards jobs to the
+    processor server for that), so jobs are failed rather than reported as done.
     """
+    job = await job_store.get(job_id)
+    job.status = "failed"
+    job.progress = 0
+    job.message = "Processing failed"
+    job.error_message = (
+        "Video processing is not implemented in this service; "
+        "send jobs through the gateway to the processor server"
+    )
+    job.completed_at = datetime.utcnow()
+    await job_store.save(job)
+    
+    logger.error("Job %s failed: %s", job_id, job.error_message)
+    
+    # Send webhook notification for failure
+    if request.webhook_url:
+        queue_webhook_notification(request.webhook_url, job)
+
+def queue_webhook_notification(webhook_url: str, job: JobStatus):
+    """
+    Queue a webhook notification for the webhook workers, snapshotting the job as it is now
+    """
+    payload = {
+        "job_id": job.job_id,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "output_urls": job.output_urls,
+        "error_message": job.error_message
+    }
     try:
-        job = jobs[job_id]
-        job.status = "processing"
-        job.progress = 10
-        job.message = "Starting video processing..."
-        
-        # Import processing functions
-        from main import main as process_main
-        
-        # Update progress
-        job.progress = 30
-        job.message = "Downloading and analyzing video..."
-        
-        # Simulate processing (replace with actual processing logic)
-        await asyncio.sleep(2)  # Placeholder for actual processing
-        
-        # Update progress
-        job.progress = 60
-        job.message = "Generating clips..."
-        
-        # Here you would call the actual video processing functions
-        # For now, we'll simulate success
-        await asyncio.sleep(3)
-        
-        # Complete job
-        job.status = "completed"
-        job.progress = 100
-        job.message = "Video processing completed successfully"
-        job.completed_at = datetime.utcnow()
-        job.output_urls = [
-            "https://your-blob-storage.com/output/clip1.mp4",
-            "https://your-blob-storage.com/output/clip2.mp4",
-            "https://your-blob-storage.com/output/clip3.mp4"
-        ]
-        
-        # Send webhook notification if URL provided
-        if request.webhook_url:
-            await send_webhook_notification(request.webhook_url, job)
-        
-        logger.info(f"Job {job_id} completed successfully")
-        
-    except Exception as e:
-        # Handle errors
-        job = jobs[job_id]
-        job.status = "failed"
-        job.progress = 0
-        job.message = "Processing failed"
-        job.error_message = str(e)
-        job.completed_at = datetime.utcnow()
-        
-        logger.error(f"Job {job_id} failed: {str(e)}")
-        
-        # Send webhook notification for failure
-        if request.webhook_url:
-            await send_webhook_notification(request.webhook_url, job)
+        app.state.webhooks.put_nowait((str(webhook_url), payload))
+    except asyncio.QueueFull:
+        logger.error("Webhook queue full, dropping notification for job %s", job.job_id)
 
-async def send_webhook_notification(webhook_url: str, job: JobStatus):
+async def webhook_worker(queue: asyncio.Queue):
+    """
+    Send queued webhook notifications, taking whatever has piled up (up to
+    WEBHOOK_BATCH_SIZE) and posting it concurrently over the shared session
+    """
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < WEBHOOK_BATCH_SIZE:
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        try:
+            await asyncio.gather(*(send_webhook_notification(url, payload) for url, payload in batch))
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+async def send_webhook_notification(webhook_url: str, payload: Dict[str, Any]):
     """
     Send webhook notification to external service (like n8n)
     """
     try:
-        import aiohttp
-        
-        payload = WebhookPayload(
-            job_id=job.job_id,
-            status=job.status,
-            progress=job.progress,
-            message=job.message,
-            output_urls=job.output_urls,
-            error_message=job.error_message
-        )
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                str(webhook_url),
-                json=payload.dict(),
-                headers={"Content-Type": "application/json"}
-            ) as response:
-                if response.status == 200:
-                    logger.info(f"Webhook notification sent successfully for job {job.job_id}")
-                else:
-                    logger.error(f"Failed to send webhook notification: {response.status}")
+        async with app.state.http.post(
+            webhook_url,
+            data=orjson.dumps(payload),
+            headers={"Content-Type": "application/json"}
+        ) as response:
+            if response.status == 200:
+                logger.info("Webhook notification sent successfully for job %s", payload['job_id'])
+            else:
+                logger.error("Failed to send webhook notification: %s", response.status)
                     
     except Exception as e:
-        logger.error(f"Error sending webhook notification: {str(e)}")
+        logger.error("Error sending webhook notification: %s", e)
 
 if __name__ == "__main__":
     import uvicorn
@@ -301,4 +413,21 @@ if __name__ == "__main__":
     port = int(os.getenv("API_PORT", 8000))
     host = os.getenv("API_HOST", "0.0.0.0")
     
-    uvicorn.run(app, host=host, port=port)
\ No newline at end of file
+    # Fail the previous run's unfinished jobs once here, not in each worker's startup,
+    # where it would also fail jobs that already-running sibling workers have taken on
+    asyncio.run(job_store.recover_interrupted())
+    
+    # uvloop + httptools for a faster event loop and C HTTP parsing; several
+    # workers so Pydantic work isn't serialized on one core (job state lives in
+    # SQLite, so it's shared between them). Multiple workers need an import string.
+    uvicorn.run(
+        "main:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=host,
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("API_WORKERS", 4)),
+        backlog=2048,
+        timeout_keep_alive=75
+    )
\ No newline at end of file
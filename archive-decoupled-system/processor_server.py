@@ -5,20 +5,27 @@ Decoupled video processing service that receives instructions and returns JSON r
 """
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
-from pydantic import BaseModel, HttpUrl
+from fastapi.responses import Response
+from pydantic import BaseModel, HttpUrl, Field
 from typing import Optional, List, Dict, Any
 import os
+import sys
 import uuid
 import json
+import time
 import logging
 from datetime import datetime
 import asyncio
 
+# Job status lives in the same SQLite store the API services use
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+from job_store import JobStore
+
 # Import video processing components
 from Components.YoutubeDownloader import download_youtube_video
 from Components.Edit import extractAudio, crop_video
-from Components.Transcription import transcribeAudio
-from Components.LanguageTasks import GetHighlight, GetMultipleHighlights
+from Components.Transcription import transcribeAudio, preload_whisper
+from Components.LanguageTasks import GetMultipleHighlights
 from Components.FaceCrop import crop_to_vertical, combine_videos
 from Components.Subtitles import add_subtitles_to_video
 from Components.MultiClipProcessor import process_multiple_clips
@@ -34,6 +41,32 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Finished jobs are kept for JOBS_TTL_SEC, and at most JOBS_MAX of them
+JOBS_TTL_SEC = int(os.getenv("JOBS_TTL_SEC", 86400))
+JOBS_MAX = int(os.getenv("JOBS_MAX", 50000))
+JOBS_SWEEP_INTERVAL = 600
+# Jobs still processing after this long are failed as stuck
+JOBS_STALE_SEC = int(os.getenv("JOBS_STALE_SEC", 10800))
+
+@app.on_event("startup")
+async def open_job_store():
+    await job_store.open()
+    app.state.sweeper = asyncio.create_task(job_sweeper())
+
+@app.on_event("shutdown")
+async def close_job_store():
+    app.state.sweeper.cancel()
+    await job_store.close()
+
+@app.on_event("startup")
+async def load_whisper_model():
+    """Load Whisper once at startup so the first job doesn't pay for it"""
+    try:
+        await asyncio.to_thread(preload_whisper)
+    except Exception as e:
+        # Jobs will retry the load on first use
+        logger.warning("Whisper preload failed: %s", e)
+
 # Pydantic models for API
 class ProcessingRequest(BaseModel):
     youtube_url: Optional[str] = None
@@ -58,9 +91,29 @@ class StatusResponse(BaseModel):
     message: str
     output_files: List[Dict[str, Any]] = []
     error_message: Optional[str] = None
+    created_at: float = Field(default_factory=time.time)
+    completed_at: Optional[datetime] = None
+
+# Shared by every worker process (WAL), and survives restarts; kept apart from the gateway's jobs.db
+job_store = JobStore(os.getenv("PROCESSOR_JOBS_DB_PATH", "processor_jobs.db"), StatusResponse)
 
-# In-memory job storage
-jobs_status: Dict[str, StatusResponse] = {}
+async def job_sweeper():
+    """
+    Periodically purge old finished jobs so the job store doesn't grow forever
+    """
+    while True:
+        await asyncio.sleep(JOBS_SWEEP_INTERVAL)
+        try:
+            removed = await job_store.purge(JOBS_TTL_SEC, JOBS_MAX, JOBS_STALE_SEC)
+            logger.info("Purged %s finished jobs (%s stored)", removed, await job_store.count())
+        except Exception:
+            logger.exception("Job purge failed")
+
+async def update_job(job: StatusResponse, progress: int, message: str):
+    """Record a job's progress so status polls on any worker see it"""
+    job.progress = progress
+    job.message = message
+    await job_store.save(job)
 
 def clean_filename(filename):
     """Clean filename for safe file operations"""
@@ -87,15 +140,17 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "active_jobs": len([j for j in jobs_status.values() if j.status == "processing"])
+        "active_jobs": await job_store.count(["processing"])
     }
 
 @app.get("/status/{job_id}")
 async def get_job_status(job_id: str):
     """Get processing job status"""
-    if job_id not in jobs_status:
+    data = await job_store.get_json(job_id)
+    if data is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    return jobs_status[job_id]
+    # Stored JSON goes out as-is
+    return Response(content=data, media_type="application/json")
 
 @app.post("/process")
 async def process_video(request: ProcessingRequest, background_tasks: BackgroundTasks):
@@ -118,12 +173,12 @@ async def process_video(request: ProcessingRequest, background_tasks: Background
         )
     
     # Initialize job status
-    jobs_status[job_id] = StatusResponse(
+    await job_store.save(StatusResponse(
         job_id=job_id,
         status="processing",
         progress=0,
         message="Starting video processing..."
-    )
+    ))
     
     # Process in background for async response
     background_tasks.add_task(process_video_task, job_id, request, start_time)
@@ -136,22 +191,25 @@ async def process_video(request: ProcessingRequest, background_tasks: Background
 
 async def process_video_task(job_id: str, request: ProcessingRequest, start_time: datetime):
     """
-    Background video processing function
+    Background video processing function.
+    Blocking stages (download, ffmpeg, Whisper, LLM) run in worker threads so
+    status polling and new requests are served while a job is in progress.
     """
     try:
-        job_status = jobs_status[job_id]
+        job_status = await job_store.get(job_id)
         
         # Step 1: Download or validate video file
-        job_status.progress = 10
-        job_status.message = "Downloading video..."
+        await update_job(job_status, 10, "Downloading video...")
         
         if request.youtube_url:
             logger.info(f"Downloading YouTube video: {request.youtube_url}")
-            video_title, video_path = download_youtube_video(request.youtube_url)
+            video_path = await asyncio.to_thread(download_youtube_video, request.youtube_url)
+            if not video_path:
+                raise Exception(f"Failed to download video: {request.youtube_url}")
         else:
             logger.info(f"Using local video file: {request.video_file_path}")
             video_path = request.video_file_path
-            video_title = os.path.splitext(os.path.basename(video_path))[0]
+        video_title = os.path.splitext(os.path.basename(video_path))[0]
         
         if not os.path.exists(video_path):
             raise Exception(f"Video file not found: {video_path}")
@@ -160,17 +218,17 @@ async def process_video_task(job_id: str, request: ProcessingRequest, start_time
         logger.info(f"Video title: {video_title}")
         
         # Step 2: Extract audio
-        job_status.progress = 20
-        job_status.message = "Extracting audio..."
+        await update_job(job_status, 20, "Extracting audio...")
         
-        audio_path = extractAudio(video_path, session_id=job_id)
+        audio_path = f"audio_{job_id}.wav"
+        if not await asyncio.to_thread(extractAudio, video_path, audio_path):
+            raise Exception(f"Failed to extract audio from {video_path}")
         logger.info(f"Audio extracted: {audio_path}")
         
         # Step 3: Transcribe audio
-        job_status.progress = 30
-        job_status.message = "Transcribing audio..."
+        await update_job(job_status, 30, "Transcribing audio...")
         
-        transcriptions_result = transcribeAudio(audio_path)
+        transcriptions_result = await asyncio.to_thread(transcribeAudio, audio_path)
         
         # Handle new dict format from faster-whisper
         if isinstance(transcriptions_result, dict):
@@ -183,23 +241,22 @@ async def process_video_task(job_id: str, request: ProcessingRequest, start_time
         logger.info(f"Transcription completed: {len(transcriptions)} segments")
         
         # Step 4: Get highlights
-        job_status.progress = 50
-        job_status.message = "Analyzing content for highlights..."
+        await update_job(job_status, 50, "Analyzing content for highlights...")
         
-        if request.num_clips == 1:
-            highlight = GetHighlight(transcriptions)
-            highlights = [highlight]
-        else:
-            highlights = GetMultipleHighlights(transcriptions, request.num_clips)
+        # The LLM reads the transcript as "start - end: text" lines, as in main.run_pipeline
+        trans_text = "".join(f"{start} - {end}: {text}\n" for text, start, end in transcriptions)
+        highlights = await asyncio.to_thread(GetMultipleHighlights, trans_text, request.num_clips, True)
+        if not highlights:
+            raise Exception("Failed to get highlights from LLM")
         
         logger.info(f"Found {len(highlights)} highlights")
         
         # Step 5: Process clips
-        job_status.progress = 70
-        job_status.message = "Generating video clips..."
+        await update_job(job_status, 70, "Generating video clips...")
         
         clean_title = clean_filename(video_title) if video_title else f"output_{job_id}"
-        all_outputs = process_multiple_clips(
+        all_outputs = await asyncio.to_thread(
+            process_multiple_clips,
             video_path, highlights, transcriptions, 
             job_id, clean_title, request.output_types
         )
@@ -207,8 +264,7 @@ async def process_video_task(job_id: str, request: ProcessingRequest, start_time
         logger.info(f"Processing completed: {len(all_outputs)} clips generated")
         
         # Step 6: Prepare output response
-        job_status.progress = 90
-        job_status.message = "Preparing output files..."
+        await update_job(job_status, 90, "Preparing output files...")
         
         output_files = []
         for clip_num, clip_data in all_outputs.items():
@@ -247,6 +303,8 @@ async def process_video_task(job_id: str, request: ProcessingRequest, start_time
         job_status.progress = 100
         job_status.message = "Processing completed successfully"
         job_status.output_files = output_files
+        job_status.completed_at = datetime.utcnow()
+        await job_store.save(job_status)
         
         logger.info(f"Job {job_id} completed successfully in {processing_time:.2f}s")
         logger.info(f"Generated {len(output_files)} clips with {sum(len(clip['files']) for clip in output_files)} total files")
@@ -264,10 +322,14 @@ async def process_video_task(job_id: str, request: ProcessingRequest, start_time
         logger.error(f"Processing failed for job {job_id}: {str(e)}")
         
         # Update job status with error
-        jobs_status[job_id].status = "failed"
-        jobs_status[job_id].progress = 0
-        jobs_status[job_id].message = "Processing failed"
-        jobs_status[job_id].error_message = str(e)
+        job_status = await job_store.get(job_id)
+        if job_status is not None:
+            job_status.status = "failed"
+            job_status.progress = 0
+            job_status.message = "Processing failed"
+            job_status.error_message = str(e)
+            job_status.completed_at = datetime.utcnow()
+            await job_store.save(job_status)
 
 
 @app.post("/process/sync")
@@ -282,18 +344,18 @@ async def process_video_sync_endpoint(request: ProcessingRequest):
     
     try:
         # Initialize status
-        jobs_status[job_id] = StatusResponse(
+        await job_store.save(StatusResponse(
             job_id=job_id,
             status="processing",
             progress=0,
             message="Starting video processing..."
-        )
+        ))
         
         # Process synchronously
         await process_video_task(job_id, request, start_time)
         
         # Return final status
-        final_status = jobs_status[job_id]
+        final_status = await job_store.get(job_id)
         
         if final_status.status == "completed":
             processing_time = (datetime.utcnow() - start_time).total_seconds()
@@ -329,4 +391,18 @@ if __name__ == "__main__":
     host = "0.0.0.0"
     
     logger.info(f"Starting Zuke Video Processor on {host}:{port}")
-    uvicorn.run(app, host=host, port=port)
\ No newline at end of file
+    # Fail the previous run's unfinished jobs once here, not in each worker's startup,
+    # where it would also fail jobs that already-running sibling workers have taken on
+    asyncio.run(job_store.recover_interrupted())
+    
+    # Outlive the gateway's 120 s idle keep-alive so it never reuses a closed connection.
+    # Job state is in SQLite, so PROCESSOR_WORKERS > 1 is safe; each worker loads its
+    # own Whisper model. Multiple workers need an import string.
+    uvicorn.run(
+        "processor_server:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=host,
+        port=port,
+        workers=int(os.getenv("PROCESSOR_WORKERS", 1)),
+        timeout_keep_alive=125
+    )
\ No newline at end of file
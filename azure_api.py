@@ -16,10 +16,15 @@ import json
 import tempfile
 import time
 import sys
+import asyncio
 import threading
 from pathlib import Path
 from datetime import datetime
 
+# The shorts pipeline runs in-process, so its models and imports load once per server
+from main import run_pipeline, PipelineCancelled
+from Components.Transcription import preload_whisper
+
 # Import Azure Blob Storage
 try:
     from Components.storage import get_storage_manager
@@ -38,6 +43,15 @@ app = FastAPI(
     version="1.0.0"
 )
 
+@app.on_event("startup")
+async def load_whisper_model():
+    """Load Whisper once at startup so the first job doesn't pay for it"""
+    try:
+        await asyncio.to_thread(preload_whisper)
+    except Exception as e:
+        # Jobs will retry the load on first use
+        print(f"⚠️ Whisper preload failed: {e}")
+
 # CORS for n8n integration
 app.add_middleware(
     CORSMiddleware,
@@ -163,6 +177,98 @@ async def upload_file(file: UploadFile = File(...)):
             detail=f"Upload failed: {str(e)}"
         )
 
+# Wall-clock limits for a pipeline run: /process answers within the request, /process-async jobs get longer
+PROCESS_TIMEOUT = 1800  # 30 minutes
+BACKGROUND_TIMEOUT = 7200  # 2 hours
+
+def run_pipeline_for_request(request: VideoProcessingRequest, timeout: float) -> List[str]:
+    """
+    Run the shorts pipeline in-process for a request and return the generated file paths.
+    The worker thread can't be killed, so past the timeout the pipeline is told to stop
+    at its next stage boundary (removing this run's files) and PipelineCancelled is raised.
+    """
+    # Add video URL or path
+    if request.input_type == "youtube" and request.youtube_url:
+        source = request.youtube_url
+    elif request.input_type == "local" and request.video_file_path:
+        source = request.video_file_path
+    else:
+        raise ValueError("Invalid input: must provide youtube_url or video_file_path")
+    
+    print(f"🚀 Running pipeline for job {request.job_id}: {source}", flush=True)
+    
+    cancel = threading.Event()
+    deadline = threading.Timer(timeout, cancel.set)
+    deadline.daemon = True
+    deadline.start()
+    try:
+        outputs = run_pipeline(
+            source,
+            num_clips=request.processing_options.get("num_clips", 3),
+            output_types=request.processing_options.get("output_types", ["subtitled"]),
+            # Never prompt: the server's stdin is not a user, and waiting would hold a worker thread
+            auto_approve=True,
+            cancel_event=cancel
+        )
+    except PipelineCancelled as e:
+        raise PipelineCancelled(f"Processing timed out after {timeout // 60:.0f} minutes") from e
+    finally:
+        deadline.cancel()
+    return [file_path for clip in (outputs or {}).values() for file_path in clip['files']]
+
+def publish_output_files(job_id: str, generated_files: List[str]) -> List[Dict[str, Any]]:
+    """Upload generated clips to Azure Blob Storage (or fall back to container URLs) and describe them"""
+    output_files = []
+    
+    if generated_files:
+        # Initialize Azure Blob Storage if available
+        storage_manager = None
+        if AZURE_STORAGE_AVAILABLE:
+            try:
+                storage_manager = get_storage_manager()
+                print("✅ Azure Blob Storage initialized", flush=True)
+            except Exception as e:
+                print(f"⚠️ Failed to initialize Azure Blob Storage: {e}", flush=True)
+                storage_manager = None
+    
+        for mp4_file in map(Path, generated_files):
+            file_size = mp4_file.stat().st_size
+    
+            # Upload to Azure Blob Storage if available
+            if storage_manager:
+                try:
+                    print(f"📤 Uploading {mp4_file.name} to Azure Blob Storage...", flush=True)
+                    file_url = storage_manager.upload_file(
+                        file_path=str(mp4_file),
+                        blob_name=f"{job_id}/{mp4_file.name}",
+                        folder="videos"
+                    )
+                    print(f"✅ Upload successful: {file_url}", flush=True)
+                    storage_type = "azure_blob"
+                except Exception as upload_error:
+                    print(f"❌ Upload failed: {upload_error}", flush=True)
+                    import traceback
+                    traceback.print_exc()
+                    # Fallback to container URL
+                    file_url = f"{BASE_URL}/app/output/{mp4_file.name}"
+                    storage_type = "local"
+            else:
+                # No storage available - return container URL
+                file_url = f"{BASE_URL}/app/output/{mp4_file.name}"
+                storage_type = "local"
+                print(f"⚠️ No cloud storage - file saved locally: {file_url}", flush=True)
+    
+            output_files.append({
+                "filename": mp4_file.name,
+                "size": file_size,
+                "url": file_url,
+                "type": "video/mp4",
+                "created_at": datetime.utcnow().isoformat(),
+                "storage": storage_type
+            })
+    
+    return output_files
+
 def update_job_status(job_id: str, status: str, message: str = "", **kwargs):
     """Update job status in store (thread-safe)"""
     with job_status_lock:
@@ -194,109 +300,21 @@ def process_video_background(request: VideoProcessingRequest):
     try:
         update_job_status(job_id, "processing", "Starting video processing...", progress=5)
         
-        # Build command
-        cmd = ["python3", "main.py"]
-        
-        # Add number of clips
-        num_clips = request.processing_options.get("num_clips", 3)
-        cmd.extend(["--clips", str(num_clips)])
-        
-        # Add output types
-        output_types = request.processing_options.get("output_types", ["subtitled"])
-        cmd.extend(["--output-types"] + output_types)
-        
-        # Add auto-approve if specified
-        if request.processing_options.get("auto_approve", False):
-            cmd.append("--auto-approve")
-        
-        # Add video URL or path
-        if request.input_type == "youtube" and request.youtube_url:
-            cmd.append(request.youtube_url)
-        elif request.input_type == "local" and request.video_file_path:
-            cmd.append(request.video_file_path)
-        else:
-            raise ValueError("Invalid input: must provide youtube_url or video_file_path")
-        
         update_job_status(job_id, "processing", "Downloading and transcribing video...", progress=20)
         
-        # Execute processing
-        print(f"🚀 Executing command: {' '.join(cmd)}", flush=True)
-        
-        result = subprocess.run(
-            cmd,
-            cwd="/app",
-            capture_output=True,
-            text=True,
-            timeout=7200,  # 2 hours timeout
-            env={**os.environ}
-        )
-        
-        # Log the output
-        print(f"\n{'='*50}", flush=True)
-        print(f"=== SUBPROCESS OUTPUT ===", flush=True)
-        print(f"{'='*50}", flush=True)
-        print(f"STDOUT:\n{result.stdout}", flush=True)
-        print(f"STDERR:\n{result.stderr}", flush=True)
+        # Run the pipeline in this process, so models and imports stay warm between jobs
+        generated_files = run_pipeline_for_request(request, BACKGROUND_TIMEOUT)
         
         update_job_status(job_id, "processing", "Uploading output files...", progress=90)
         
-        # Check for output files
-        output_files = []
-        output_dir = Path("/app/output")
-        
-        if output_dir.exists():
-            # Initialize Azure Blob Storage if available
-            storage_manager = None
-            if AZURE_STORAGE_AVAILABLE:
-                try:
-                    storage_manager = get_storage_manager()
-                    print("✅ Azure Blob Storage initialized", flush=True)
-                except Exception as e:
-                    print(f"⚠️ Failed to initialize Azure Blob Storage: {e}", flush=True)
-                    storage_manager = None
-            
-            for mp4_file in output_dir.glob("**/*.mp4"):
-                file_size = mp4_file.stat().st_size
-                
-                # Upload to Azure Blob Storage if available
-                if storage_manager:
-                    try:
-                        print(f"📤 Uploading {mp4_file.name} to Azure Blob Storage...", flush=True)
-                        file_url = storage_manager.upload_file(
-                            file_path=str(mp4_file),
-                            blob_name=f"{request.job_id}/{mp4_file.name}",
-                            folder="videos"
-                        )
-                        print(f"✅ Upload successful: {file_url}", flush=True)
-                        storage_type = "azure_blob"
-                    except Exception as upload_error:
-                        print(f"❌ Upload failed: {upload_error}", flush=True)
-                        import traceback
-                        traceback.print_exc()
-                        # Fallback to container URL
-                        file_url = f"{BASE_URL}/app/output/{mp4_file.name}"
-                        storage_type = "local"
-                else:
-                    # No storage available - return container URL
-                    file_url = f"{BASE_URL}/app/output/{mp4_file.name}"
-                    storage_type = "local"
-                    print(f"⚠️ No cloud storage - file saved locally: {file_url}", flush=True)
-                
-                output_files.append({
-                    "filename": mp4_file.name,
-                    "size": file_size,
-                    "url": file_url,
-                    "type": "video/mp4",
-                    "created_at": datetime.utcnow().isoformat(),
-                    "storage": storage_type
-                })
+        output_files = publish_output_files(request.job_id, generated_files)
         
         processing_time = time.time() - start_time
         
         # Check if successful
         if len(output_files) == 0:
-            error_details = f"STDOUT:\n{result.stdout[:3000]}\n\nSTDERR:\n{result.stderr[:3000]}\n\nReturn code: {result.returncode}"
-            print(f"❌ No output files generated. Details:\n{error_details}", flush=True)
+            error_details = "The pipeline produced no clips - see the server log for details"
+            print(f"❌ No output files generated for job {job_id}", flush=True)
             update_job_status(
                 job_id, 
                 "failed", 
@@ -317,16 +335,17 @@ def process_video_background(request: VideoProcessingRequest):
                 output_files=output_files
             )
             
-    except subprocess.TimeoutExpired:
+    except PipelineCancelled as e:
         processing_time = time.time() - start_time
+        print(f"⏰ Job {job_id}: {e}", flush=True)
         update_job_status(
             job_id,
             "failed",
-            "Processing timed out after 2 hours",
+            str(e),
             progress=100,
             completed_at=datetime.utcnow().isoformat(),
             processing_time=processing_time,
-            error_message="Video processing took longer than 2 hours"
+            error_message=str(e)
         )
     except Exception as e:
         processing_time = time.time() - start_time
@@ -485,117 +504,28 @@ async def process_video(request: VideoProcessingRequest):
     start_time = time.time()
     
     try:
-        # Build command for original main.py
-        cmd = ["python3", "main.py"]
-        
-        # Add clips argument
-        num_clips = request.processing_options.get("num_clips", 3)
-        cmd.extend(["--clips", str(num_clips)])
-        
-        # Add output types
-        output_types = request.processing_options.get("output_types", ["subtitled"])
-        cmd.extend(["--output-types"] + output_types)
-        
-        # Add auto-approve if specified
-        if request.processing_options.get("auto_approve", False):
-            cmd.append("--auto-approve")
-        
-        # Add video URL or path
-        if request.input_type == "youtube" and request.youtube_url:
-            cmd.append(request.youtube_url)
-        elif request.input_type == "local" and request.video_file_path:
-            cmd.append(request.video_file_path)
-        else:
-            raise ValueError("Invalid input: must provide youtube_url or video_file_path")
+        # Run the pipeline in-process on a worker thread, keeping the event loop free.
+        # The response waits until a timed-out run has actually stopped, so a retry
+        # never overlaps it
+        generated_files = await asyncio.to_thread(run_pipeline_for_request, request, PROCESS_TIMEOUT)
         
-        # Execute processing with CRITICAL output capture
-        print(f"🚀 Executing command: {' '.join(cmd)}", flush=True)
-        
-        result = subprocess.run(
-            cmd,
-            cwd="/app",
-            capture_output=True,  # CRITICAL: Captures stdout and stderr
-            text=True,
-            timeout=1800,  # 30 minutes timeout
-            env={**os.environ}  # Pass all environment variables
-        )
-        
-        # Log the output regardless of success/failure
-        print(f"\n{'='*50}", flush=True)
-        print(f"=== SUBPROCESS OUTPUT ===", flush=True)
-        print(f"{'='*50}", flush=True)
-        print(f"STDOUT:\n{result.stdout}", flush=True)
-        print(f"STDERR:\n{result.stderr}", flush=True)
-        
-        # Check for output files
-        output_files = []
-        output_dir = Path("/app/output")
-        
-        if output_dir.exists():
-            # Initialize Azure Blob Storage if available
-            storage_manager = None
-            if AZURE_STORAGE_AVAILABLE:
-                try:
-                    storage_manager = get_storage_manager()
-                    print("✅ Azure Blob Storage initialized", flush=True)
-                except Exception as e:
-                    print(f"⚠️ Failed to initialize Azure Blob Storage: {e}", flush=True)
-                    storage_manager = None
-            
-            for mp4_file in output_dir.glob("**/*.mp4"):
-                file_size = mp4_file.stat().st_size
-                
-                # Upload to Azure Blob Storage if available
-                if storage_manager:
-                    try:
-                        print(f"📤 Uploading {mp4_file.name} to Azure Blob Storage...", flush=True)
-                        file_url = storage_manager.upload_file(
-                            file_path=str(mp4_file),
-                            blob_name=f"{request.job_id}/{mp4_file.name}",
-                            folder="videos"
-                        )
-                        print(f"✅ Upload successful: {file_url}", flush=True)
-                        storage_type = "azure_blob"
-                    except Exception as upload_error:
-                        print(f"❌ Upload failed: {upload_error}", flush=True)
-                        import traceback
-                        traceback.print_exc()
-                        # Fallback to container URL
-                        file_url = f"{BASE_URL}/app/output/{mp4_file.name}"
-                        storage_type = "local"
-                else:
-                    # No storage available - return container URL
-                    file_url = f"{BASE_URL}/app/output/{mp4_file.name}"
-                    storage_type = "local"
-                    print(f"⚠️ No cloud storage - file saved locally: {file_url}", flush=True)
-                
-                output_files.append({
-                    "filename": mp4_file.name,
-                    "size": file_size,
-                    "url": file_url,
-                    "type": "video/mp4",
-                    "created_at": datetime.utcnow().isoformat(),
-                    "storage": storage_type
-                })
+        output_files = await asyncio.to_thread(publish_output_files, request.job_id, generated_files)
         
         # Calculate processing time
         processing_time = time.time() - start_time
         
         # Return error details if no files produced
         if len(output_files) == 0:
-            error_details = f"STDOUT:\n{result.stdout[:3000]}\n\nSTDERR:\n{result.stderr[:3000]}\n\nReturn code: {result.returncode}"
-            print(f"❌ No output files generated. Details:\n{error_details}", flush=True)
+            print(f"❌ No output files generated for job {request.job_id}", flush=True)
             return VideoProcessingResponse(
                 success=False,
                 job_id=request.job_id,
                 message="No video clips generated",
                 processing_time=processing_time,
                 output_files=[],
-                error_message=error_details
+                error_message="The pipeline produced no clips - see the server log for details"
             )
         
-        # Calculate processing time
-        processing_time = time.time() - start_time
         return VideoProcessingResponse(
             success=True,
             job_id=request.job_id,
@@ -603,7 +533,7 @@ async def process_video(request: VideoProcessingRequest):
             processing_time=processing_time,
             output_files=output_files
         )
-    except subprocess.TimeoutExpired:
+    except PipelineCancelled:
         processing_time = time.time() - start_time
         return VideoProcessingResponse(
             success=False,
@@ -1,7 +1,7 @@
 from Components.YoutubeDownloader import download_youtube_video
 from Components.Edit import extractAudio, crop_video
 from Components.Transcription import transcribeAudio
-from Components.LanguageTasks import GetHighlight, GetMultipleHighlights
+from Components.LanguageTasks import GetMultipleHighlights
 from Components.FaceCrop import crop_to_vertical, combine_videos
 from Components.Subtitles import add_subtitles_to_video
 from Components.MultiClipProcessor import process_multiple_clips
@@ -9,6 +9,7 @@ import sys
 import os
 import uuid
 import re
+import select
 import argparse
 
 def upload_to_cloudinary(file_path, cloud_name, upload_preset):
@@ -50,231 +51,295 @@ def upload_to_cloudinary(file_path, cloud_name, upload_preset):
         print(f"❌ Upload failed: {str(e)}")
         return None, None
 
-# Set up argument parser
-parser = argparse.ArgumentParser(description='AI YouTube Shorts Generator')
-parser.add_argument('input', nargs='?', help='YouTube video URL or local video file path')
-parser.add_argument('--auto-approve', action='store_true', help='Auto-approve selections without user input')
-parser.add_argument('--clips', type=int, default=3, help='Number of clips to generate (default: 3)')
-parser.add_argument('--output-types', nargs='+', 
-                   choices=['original', 'subtitled', 'original-subtitled', 'original-dimension'], 
-                   default=['original', 'original-dimension', 'subtitled'],
-                   help='Types of outputs to generate (default: original, original-dimension, subtitled)')
-
-args = parser.parse_args()
-
-# Generate unique session ID for this run (for concurrent execution support)
-session_id = str(uuid.uuid4())[:8]
-print(f"Session ID: {session_id}")
-print(f"Clips to generate: {args.clips}")
-print(f"Output types: {args.output_types}")
-
-auto_approve = args.auto_approve
-num_clips = args.clips
-output_types = args.output_types
-
-# Get input URL/file
-if args.input:
-    url_or_file = args.input
-    print(f"Using input from command line: {url_or_file}")
-else:
-    url_or_file = input("Enter YouTube video URL or local video file path: ")
-
-# Check if input is a local file
-video_title = None
-if os.path.isfile(url_or_file):
-    print(f"Using local video file: {url_or_file}")
-    Vid = url_or_file
-    # Extract title from filename
-    video_title = os.path.splitext(os.path.basename(url_or_file))[0]
-else:
-    # Assume it's a YouTube URL
-    print(f"Downloading from YouTube: {url_or_file}")
-    Vid = download_youtube_video(url_or_file)
-    if Vid:
-        Vid = Vid.replace(".webm", ".mp4")
-        print(f"Downloaded video and audio files successfully! at {Vid}")
-        # Extract title from downloaded file path
-        video_title = os.path.splitext(os.path.basename(Vid))[0]
-
 # Clean and slugify title for filename
+# (invalid filename characters are deleted in one C-level pass)
+_INVALID_FILENAME_CHARS = str.maketrans('', '', '<>:"/\\|?*[]')
+# Runs of spaces, underscores and hyphens collapse into a single hyphen
+_SEPARATOR_RUN_RE = re.compile(r'[\s_-]+')
+
 def clean_filename(title):
     # Convert to lowercase
     cleaned = title.lower()
-    # Remove or replace invalid filename characters
-    cleaned = re.sub(r'[<>:"/\\|?*\[\]]', '', cleaned)
-    # Replace spaces and underscores with hyphens
-    cleaned = re.sub(r'[\s_]+', '-', cleaned)
-    # Remove multiple consecutive hyphens
-    cleaned = re.sub(r'-+', '-', cleaned)
+    # Remove invalid filename characters
+    cleaned = cleaned.translate(_INVALID_FILENAME_CHARS)
+    # Replace spaces, underscores and repeated hyphens with a single hyphen
+    cleaned = _SEPARATOR_RUN_RE.sub('-', cleaned)
     # Remove leading/trailing hyphens
     cleaned = cleaned.strip('-')
     # Limit length
     return cleaned[:80]
 
-# Process video (works for both local files and downloaded videos)
-if Vid:
+class PipelineError(RuntimeError):
+    """Raised when the pipeline can't produce clips for a reason worth failing loudly on"""
+
+class PipelineCancelled(PipelineError):
+    """Raised when run_pipeline's cancel_event is set; the run stops at the next stage boundary"""
+
+def _check_cancelled(cancel_event, stage, *cleanup_files):
+    """Raise PipelineCancelled (removing cleanup_files first) if cancel_event is set"""
+    if cancel_event is not None and cancel_event.is_set():
+        for path in cleanup_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        print(f"⏹️ Pipeline cancelled {stage}")
+        raise PipelineCancelled(f"Pipeline cancelled {stage}")
+
+DEFAULT_OUTPUT_TYPES = ['original', 'original-dimension', 'subtitled']
+
+def run_pipeline(url_or_file, num_clips=3, output_types=None, auto_approve=False,
+                 use_cache=True, resolution=None, session_id=None, cancel_event=None):
+    """
+    Generate shorts from a YouTube URL or local video file.
+
+    Used by the CLI below and called in-process by the API, so models and
+    imports stay loaded between jobs.
+
+    Args:
+        url_or_file: YouTube video URL or local video file path
+        num_clips: Number of clips to generate
+        output_types: Types of outputs to generate (default: original, original-dimension, subtitled)
+        auto_approve: Skip the interactive approval prompt
+        use_cache: Use the cached YouTube video information
+        resolution: Maximum YouTube download height (None for the highest available)
+        session_id: Unique ID used in temporary and output filenames (generated if omitted)
+        cancel_event: threading.Event checked between stages and before each clip; once
+                      set, the run stops at the next check, removing this run's files
+
+    Returns:
+        Dictionary mapping clip number to {'highlight': ..., 'files': [...]} as returned by
+        process_multiple_clips, or None if no clips were generated
+
+    Raises:
+        PipelineError: If the LLM returns no highlights
+        PipelineCancelled: If cancel_event was set
+    """
+    output_types = output_types or DEFAULT_OUTPUT_TYPES
+    # Unique session ID for this run (for concurrent execution support)
+    session_id = session_id or str(uuid.uuid4())[:8]
+    print(f"Session ID: {session_id}")
+    print(f"Clips to generate: {num_clips}")
+    print(f"Output types: {output_types}")
+
     # Create unique temporary filenames
     audio_file = f"audio_{session_id}.wav"
-    temp_clip = f"temp_clip_{session_id}.mp4"
-    temp_cropped = f"temp_cropped_{session_id}.mp4"
-    temp_subtitled = f"temp_subtitled_{session_id}.mp4"
-    
-    Audio = extractAudio(Vid, audio_file)
-    if Audio:
 
-        transcriptions_result = transcribeAudio(Audio)
-        
-        # Handle new dict format from faster-whisper
-        if isinstance(transcriptions_result, dict):
-            transcriptions = [[seg['text'], seg['start'], seg['end']] 
-                            for seg in transcriptions_result['segments']]
-        else:
-            # Backwards compatibility with old format
-            transcriptions = transcriptions_result
-            
-        if len(transcriptions) > 0:
-            print(f"\n{'='*60}")
-            print(f"TRANSCRIPTION SUMMARY: {len(transcriptions)} segments")
-            print(f"{'='*60}\n")
-            TransText = ""
+    # Transcription of a YouTube video can start on its audio stream, which usually
+    # lands well before the video stream does
+    early = {}
+    def transcribe_audio_stream(audio_stream):
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        if extractAudio(audio_stream, audio_file):
+            print("Transcribing while the video stream downloads...")
+            early['transcription'] = transcribeAudio(audio_file)
 
-            for text, start, end in transcriptions:
-                TransText += (f"{start} - {end}: {text}\n")
+    # Check if input is a local file
+    video_title = None
+    if os.path.isfile(url_or_file):
+        print(f"Using local video file: {url_or_file}")
+        Vid = url_or_file
+        # Extract title from filename
+        video_title = os.path.splitext(os.path.basename(url_or_file))[0]
+    else:
+        # Assume it's a YouTube URL
+        print(f"Downloading from YouTube: {url_or_file}")
+        Vid = download_youtube_video(url_or_file, use_cache=use_cache, resolution=resolution,
+                                     on_audio=transcribe_audio_stream)
+        if Vid:
+            Vid = Vid.replace(".webm", ".mp4")
+            print(f"Downloaded video and audio files successfully! at {Vid}")
+            # Extract title from downloaded file path
+            video_title = os.path.splitext(os.path.basename(Vid))[0]
 
-            print(f"Analyzing transcription to find {num_clips} best highlights...")
+    _check_cancelled(cancel_event, "after the download", audio_file)
+
+    # Process video (works for both local files and downloaded videos)
+    if Vid:
+        Audio = audio_file if 'transcription' in early else extractAudio(Vid, audio_file)
+        if Audio:
+
+            transcriptions_result = early.get('transcription') or transcribeAudio(Audio)
+            _check_cancelled(cancel_event, "after transcription", audio_file)
             
-            # Get multiple highlights if more than 1 clip requested
-            if num_clips > 1:
-                highlights = GetMultipleHighlights(TransText, num_clips, auto_approve)
+            # Handle new dict format from faster-whisper
+            if isinstance(transcriptions_result, dict):
+                transcriptions = [[seg['text'], seg['start'], seg['end']] 
+                                for seg in transcriptions_result['segments']]
             else:
-                # Use single highlight function for backwards compatibility
-                start, stop = GetHighlight(TransText, auto_approve)
-                if start is not None and stop is not None:
-                    highlights = [{'start': start, 'end': stop, 'content': 'Single highlight'}]
-                else:
-                    highlights = []
-            
-            # Check if we got valid highlights
-            if not highlights:
+                # Backwards compatibility with old format
+                transcriptions = transcriptions_result
+                
+            if len(transcriptions) > 0:
                 print(f"\n{'='*60}")
-                print("ERROR: Failed to get highlights from LLM")
-                print(f"{'='*60}")
-                print("This could be due to:")
-                print("  - OpenAI API issues or rate limiting")
-                print("  - Invalid API key")
-                print("  - Network connectivity problems")
-                print("  - Malformed transcription data")
-                print(f"\nTranscription summary:")
-                print(f"  Total segments: {len(transcriptions)}")
-                print(f"  Total length: {len(TransText)} characters")
+                print(f"TRANSCRIPTION SUMMARY: {len(transcriptions)} segments")
                 print(f"{'='*60}\n")
-                sys.exit(1)
-            
-            # Interactive approval loop (skip if auto-approve)
-            import select
-            
-            approved = auto_approve
-            
-            if not auto_approve:
-                while not approved:
+                TransText = ""
+
+                for text, start, end in transcriptions:
+                    TransText += (f"{start} - {end}: {text}\n")
+
+                print(f"Analyzing transcription to find {num_clips} best highlights...")
+                
+                # One LLM round-trip selects all clips (including the single-clip case)
+                highlights = GetMultipleHighlights(TransText, num_clips, auto_approve)
+                
+                # Check if we got valid highlights
+                if not highlights:
                     print(f"\n{'='*60}")
-                    print(f"SELECTED HIGHLIGHTS ({len(highlights)} clips):")
+                    print("ERROR: Failed to get highlights from LLM")
                     print(f"{'='*60}")
-                    for i, highlight in enumerate(highlights, 1):
-                        duration = highlight['end'] - highlight['start']
-                        print(f"Clip {i}: {highlight['start']}s - {highlight['end']}s ({duration}s duration)")
-                        if 'content' in highlight:
-                            preview = highlight['content'][:100] + '...' if len(highlight['content']) > 100 else highlight['content']
-                            print(f"  Content: {preview}")
-                    print(f"Output types: {output_types}")
+                    print("This could be due to:")
+                    print("  - OpenAI API issues or rate limiting")
+                    print("  - Invalid API key")
+                    print("  - Network connectivity problems")
+                    print("  - Malformed transcription data")
+                    print(f"\nTranscription summary:")
+                    print(f"  Total segments: {len(transcriptions)}")
+                    print(f"  Total length: {len(TransText)} characters")
                     print(f"{'='*60}\n")
-                    
-                    print("Options:")
-                    print("  [Enter/y] Approve and continue")
-                    print("  [r] Regenerate selections")
-                    print("  [n] Cancel")
-                    print("\nAuto-approving in 15 seconds if no input...")
-                    
-                    try:
-                        ready, _, _ = select.select([sys.stdin], [], [], 15)
-                        if ready:
-                            user_input = sys.stdin.readline().strip().lower()
-                            if user_input == 'r':
-                                print("\nRegenerating selections...")
-                                if num_clips > 1:
+                    raise PipelineError("Failed to get highlights from LLM")
+                
+                # Interactive approval loop (skip if auto-approve)
+                approved = auto_approve
+                
+                if not auto_approve:
+                    while not approved:
+                        print(f"\n{'='*60}")
+                        print(f"SELECTED HIGHLIGHTS ({len(highlights)} clips):")
+                        print(f"{'='*60}")
+                        for i, highlight in enumerate(highlights, 1):
+                            duration = highlight['end'] - highlight['start']
+                            print(f"Clip {i}: {highlight['start']}s - {highlight['end']}s ({duration}s duration)")
+                            if 'content' in highlight:
+                                preview = highlight['content'][:100] + '...' if len(highlight['content']) > 100 else highlight['content']
+                                print(f"  Content: {preview}")
+                        print(f"Output types: {output_types}")
+                        print(f"{'='*60}\n")
+                        
+                        print("Options:")
+                        print("  [Enter/y] Approve and continue")
+                        print("  [r] Regenerate selections")
+                        print("  [n] Cancel")
+                        print("\nAuto-approving in 15 seconds if no input...")
+                        
+                        try:
+                            ready, _, _ = select.select([sys.stdin], [], [], 15)
+                            if ready:
+                                user_input = sys.stdin.readline().strip().lower()
+                                if user_input == 'r':
+                                    print("\nRegenerating selections...")
                                     highlights = GetMultipleHighlights(TransText, num_clips, auto_approve)
+                                    continue
+                                elif user_input == 'n':
+                                    print("Cancelled by user")
+                                    return None
                                 else:
-                                    start, stop = GetHighlight(TransText, auto_approve)
-                                    if start is not None and stop is not None:
-                                        highlights = [{'start': start, 'end': stop, 'content': 'Single highlight'}]
-                                    else:
-                                        highlights = []
-                                continue
-                            elif user_input == 'n':
-                                print("Cancelled by user")
-                                sys.exit(0)
+                                    print("Approved by user")
+                                    approved = True
                             else:
-                                print("Approved by user")
+                                print("\nTimeout - auto-approving selections")
                                 approved = True
-                        else:
-                            print("\nTimeout - auto-approving selections")
+                        except (OSError, ValueError):
+                            # stdin closed or not selectable (e.g. Windows consoles)
+                            print("\nAuto-approving (timeout not available on this platform)")
                             approved = True
-                    except:
-                        print("\nAuto-approving (timeout not available on this platform)")
-                        approved = True
-            else:
+                else:
+                    print(f"\n{'='*60}")
+                    print(f"SELECTED HIGHLIGHTS ({len(highlights)} clips):")
+                    print(f"{'='*60}")
+                    for i, highlight in enumerate(highlights, 1):
+                        duration = highlight['end'] - highlight['start']
+                        print(f"Clip {i}: {highlight['start']}s - {highlight['end']}s ({duration}s duration)")
+                    print(f"Output types: {output_types}")
+                    print(f"{'='*60}")
+                    print("Auto-approved (batch mode)\n")
+                
+                _check_cancelled(cancel_event, "after highlight selection", audio_file)
+                
+                # Process all clips
+                clean_title = clean_filename(video_title) if video_title else "output"
+                all_outputs = process_multiple_clips(
+                    Vid, highlights, transcriptions, session_id, clean_title, output_types,
+                    cancel_event=cancel_event
+                )
+                # Clips that were already rendering when the cancel came are thrown away
+                _check_cancelled(cancel_event, "during clip rendering", audio_file,
+                                 *(f for clip in all_outputs.values() for f in clip['files']))
+                
+                # Print summary
                 print(f"\n{'='*60}")
-                print(f"SELECTED HIGHLIGHTS ({len(highlights)} clips):")
+                print(f"✅ SUCCESS: Generated {len(highlights)} clips with {len(output_types)} variations each")
                 print(f"{'='*60}")
-                for i, highlight in enumerate(highlights, 1):
+                
+                total_files = 0
+                for clip_num, clip_data in all_outputs.items():
+                    print(f"\nClip {clip_num}:")
+                    highlight = clip_data['highlight']
                     duration = highlight['end'] - highlight['start']
-                    print(f"Clip {i}: {highlight['start']}s - {highlight['end']}s ({duration}s duration)")
-                print(f"Output types: {output_types}")
-                print(f"{'='*60}")
-                print("Auto-approved (batch mode)\n")
-            
-            # Process all clips
-            clean_title = clean_filename(video_title) if video_title else "output"
-            all_outputs = process_multiple_clips(
-                Vid, highlights, transcriptions, session_id, clean_title, output_types
-            )
-            
-            # Print summary
-            print(f"\n{'='*60}")
-            print(f"✅ SUCCESS: Generated {len(highlights)} clips with {len(output_types)} variations each")
-            print(f"{'='*60}")
-            
-            total_files = 0
-            for clip_num, clip_data in all_outputs.items():
-                print(f"\nClip {clip_num}:")
-                highlight = clip_data['highlight']
-                duration = highlight['end'] - highlight['start']
-                print(f"  Time: {highlight['start']}s - {highlight['end']}s ({duration}s)")
-                print(f"  Files created:")
-                for file_path in clip_data['files']:
-                    print(f"    - {file_path}")
-                    total_files += 1
-            
-            print(f"\nTotal files created: {total_files}")
-            print(f"{'='*60}\n")
-            
-            # Upload to Cloudinary if credentials are available
-            cloudinary_cloud_name = os.getenv('CLOUDINARY_CLOUD_NAME')
-            cloudinary_upload_preset = os.getenv('CLOUDINARY_UPLOAD_PRESET')
-            
-            # Cloudinary upload disabled - future: implement Azure Storage
-            print("ℹ️  Cloud upload disabled (will be replaced with Azure Storage in future)")
-            
-            # Clean up audio file
-            try:
-                if os.path.exists(audio_file):
-                    os.remove(audio_file)
-                print(f"\n🧹 Cleaned up temporary files for session {session_id}")
-            except Exception as e:
-                print(f"Warning: Could not clean up audio file: {e}")
+                    print(f"  Time: {highlight['start']}s - {highlight['end']}s ({duration}s)")
+                    print(f"  Files created:")
+                    for file_path in clip_data['files']:
+                        print(f"    - {file_path}")
+                        total_files += 1
+                
+                print(f"\nTotal files created: {total_files}")
+                print(f"{'='*60}\n")
+                
+                # Upload to Cloudinary if credentials are available
+                cloudinary_cloud_name = os.getenv('CLOUDINARY_CLOUD_NAME')
+                cloudinary_upload_preset = os.getenv('CLOUDINARY_UPLOAD_PRESET')
+                
+                # Cloudinary upload disabled - future: implement Azure Storage
+                print("ℹ️  Cloud upload disabled (will be replaced with Azure Storage in future)")
+                
+                # Clean up audio file
+                try:
+                    if os.path.exists(audio_file):
+                        os.remove(audio_file)
+                    print(f"\n🧹 Cleaned up temporary files for session {session_id}")
+                except Exception as e:
+                    print(f"Warning: Could not clean up audio file: {e}")
+                return all_outputs
+            else:
+                print("No transcriptions found")
         else:
-            print("No transcriptions found")
+            print("No audio file found")
+    else:
+        print("Unable to process the video")
+    return None
+
+if __name__ == "__main__":
+    # Set up argument parser
+    parser = argparse.ArgumentParser(description='AI YouTube Shorts Generator')
+    parser.add_argument('input', nargs='?', help='YouTube video URL or local video file path')
+    parser.add_argument('--auto-approve', action='store_true', help='Auto-approve selections without user input')
+    parser.add_argument('--clips', type=int, default=3, help='Number of clips to generate (default: 3)')
+    parser.add_argument('--output-types', nargs='+', 
+                       choices=['original', 'subtitled', 'original-subtitled', 'original-dimension'], 
+                       default=DEFAULT_OUTPUT_TYPES,
+                       help='Types of outputs to generate (default: original, original-dimension, subtitled)')
+    parser.add_argument('--no-cache', action='store_true', help='Refetch YouTube video information instead of using the 1-hour cache')
+    parser.add_argument('--resolution', type=int, help='Maximum YouTube download height, e.g. 720 (default: highest available)')
+
+    args = parser.parse_args()
+
+    # Get input URL/file
+    if args.input:
+        url_or_file = args.input
+        print(f"Using input from command line: {url_or_file}")
     else:
-        print("No audio file found")
-else:
-    print("Unable to process the video")
\ No newline at end of file
+        url_or_file = input("Enter YouTube video URL or local video file path: ")
+
+    try:
+        run_pipeline(
+            url_or_file,
+            num_clips=args.clips,
+            output_types=args.output_types,
+            auto_approve=args.auto_approve,
+            use_cache=not args.no_cache,
+            resolution=args.resolution
+        )
+    except PipelineError:
+        sys.exit(1)